@@ -0,0 +1,161 @@
+"""Micro-benchmarks of single processing steps on synthetic columns.
+
+Each benchmark times the previous row-wise implementation of a step against
+its vectorized replacement on the same data, and checks that both give the
+same result.
+
+E.g. python -m process_report.benchmarks.micro_benchmarks --rows 1000000"""
+
+import json
+import time
+import logging
+import argparse
+from decimal import Decimal
+
+import numpy
+import pandas
+
+from process_report import util, money
+from process_report.invoices import invoice
+from process_report.processors import lenovo_processor
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+DEFAULT_NUM_ROWS = 1_000_000
+
+MICRO_BENCHMARKS = dict()
+
+
+def micro_benchmark(benchmark_func):
+    MICRO_BENCHMARKS[benchmark_func.__name__] = benchmark_func
+    return benchmark_func
+
+
+def _time(func, *args):
+    start_time = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start_time, result
+
+
+def _compare(row_wise_func, vectorized_func, *args) -> dict:
+    row_wise_seconds, expected = _time(row_wise_func, *args)
+    vectorized_seconds, result = _time(vectorized_func, *args)
+    if not (result.astype(object) == expected.astype(object)).all():
+        raise AssertionError("Vectorized result differs from the row-wise result")
+
+    return {
+        "row_wise_seconds": round(row_wise_seconds, 4),
+        "vectorized_seconds": round(vectorized_seconds, 4),
+        "speedup": round(row_wise_seconds / max(vectorized_seconds, 1e-6), 1),
+    }
+
+
+@micro_benchmark
+def project_names(num_rows, seed=0) -> dict:
+    """Deriving the project name from "Project - Allocation" in BUSubsidyProcessor"""
+    rng = numpy.random.default_rng(seed)
+    project_ids = rng.integers(0, max(num_rows // 4, 1), num_rows)
+    allocation_ids = rng.integers(0, 10_000, num_rows)
+    # Some projects have no allocation suffix, or a "-" in their name
+    names = numpy.where(
+        rng.random(num_rows) < 0.1,
+        [f"project{i}" for i in project_ids],
+        [f"project-{i}-{a}" for i, a in zip(project_ids, allocation_ids)],
+    )
+    data = pandas.DataFrame(
+        {invoice.PROJECT_FIELD: pandas.Series(names, dtype=pandas.StringDtype())}
+    )
+
+    def get_project(row):
+        project_alloc = row[invoice.PROJECT_FIELD]
+        if project_alloc.rfind("-") == -1:
+            return project_alloc
+        else:
+            return project_alloc[: project_alloc.rfind("-")]
+
+    return _compare(
+        lambda data: data.apply(get_project, axis=1),
+        lambda data: util.get_project_names(data[invoice.PROJECT_FIELD]),
+        data,
+    )
+
+
+@micro_benchmark
+def lenovo_su_charges(num_rows, seed=0) -> dict:
+    """Looking up the Lenovo charge of each row's SU type in LenovoProcessor"""
+    rng = numpy.random.default_rng(seed)
+    su_types = [
+        "OpenStack GPUA100SXM4",
+        "OpenShift GPUA100SXM4",
+        "OpenStack GPUH100",
+        "OpenShift GPUH100",
+        "OpenStack CPU",
+        "OpenShift CPU",
+        "OpenStack Storage",
+        "OpenShift Storage",
+    ]
+    data = pandas.DataFrame(
+        {
+            invoice.SU_TYPE_FIELD: pandas.Series(
+                rng.choice(su_types, num_rows), dtype=pandas.StringDtype()
+            )
+        }
+    )
+    lenovo_proc = lenovo_processor.LenovoProcessor(
+        "",
+        data,
+        su_charge_info={"GPUA100SXM4": Decimal("1.803"), "GPUH100": Decimal("2.25")},
+    )
+
+    def get_su_charge(su_type):
+        for su_name, su_charge in lenovo_proc.su_charge_info.items():
+            if su_name in su_type:
+                return money.to_internal(su_charge, money.RATE_SCALE)
+        return 0
+
+    return _compare(
+        lambda data: data[invoice.SU_TYPE_FIELD].apply(get_su_charge),
+        lambda data: money.decimals_to_internal(
+            lenovo_proc._get_su_charges(data[invoice.SU_TYPE_FIELD]),
+            data.index,
+            money.RATE_SCALE,
+        ),
+        data,
+    )
+
+
+def run_micro_benchmarks(num_rows, names=None) -> dict:
+    results = dict()
+    for name, benchmark_func in MICRO_BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        logger.info(f"Running micro-benchmark {name} on {num_rows} rows")
+        results[name] = {"rows": num_rows, **benchmark_func(num_rows)}
+    return results
+
+
+def main(arg_list: list[str] | None = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=DEFAULT_NUM_ROWS)
+    parser.add_argument(
+        "--only", nargs="+", choices=list(MICRO_BENCHMARKS), help="Benchmarks to run"
+    )
+    parser.add_argument("--output", help="JSON report path")
+    args = parser.parse_args(arg_list)
+
+    results = run_micro_benchmarks(args.rows, args.only)
+    for name, result in results.items():
+        print(
+            f"{name:<30} row-wise {result['row_wise_seconds']:>9.3f}s"
+            f"  vectorized {result['vectorized_seconds']:>9.3f}s  ({result['speedup']}x)"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Benchmarks the invoicing pipeline on synthetic months of increasing size.
+
+For each scale, a synthetic month is generated and the pipeline is run on
+it in a fresh Python process, since settings are read at import time. The
+merged input is loaded, each processor in `PROCESSING_ORDER` is run one
+after another, and each invoice is processed and exported, recording the
+time and peak RSS of every stage. PI invoice PDFs are written empty instead
+of being rendered by Chromium, so benchmarks run offline.
+
+E.g. python -m process_report.benchmarks.run_benchmark --scales 1 10 100 --output benchmark.json
+
+Reports of different commits can be compared with `--compare`"""
+
+import os
+import sys
+import json
+import time
+import types
+import logging
+import platform
+import argparse
+import datetime
+import threading
+import contextlib
+import subprocess
+import dataclasses
+import tempfile
+import resource
+from unittest import mock
+
+from process_report.benchmarks import synthetic_month
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+DEFAULT_SCALES = [1, 10, 100]
+RSS_SAMPLE_INTERVAL = 0.005
+
+
+def _get_rss_mb() -> float | None:
+    """Current resident set size, if it can be read from /proc"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _get_max_rss_mb() -> float:
+    """Peak resident set size of the process so far"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return max_rss / 2**20
+    return max_rss / 2**10
+
+
+class _PeakRSSSampler:
+    """Samples the RSS in a background thread, keeping its peak.
+
+    Where /proc is unavailable, the peak RSS of the process so far is
+    used instead"""
+
+    def __init__(self):
+        self._peak_rss = _get_rss_mb()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stopped.wait(RSS_SAMPLE_INTERVAL):
+            self._peak_rss = max(self._peak_rss, _get_rss_mb())
+
+    def start(self):
+        if self._peak_rss is not None:
+            self._thread.start()
+
+    def stop(self) -> float:
+        if self._peak_rss is None:
+            return _get_max_rss_mb()
+        self._stopped.set()
+        self._thread.join()
+        return max(self._peak_rss, _get_rss_mb())
+
+
+class StageRecorder:
+    def __init__(self):
+        self.stages = []
+
+    @contextlib.contextmanager
+    def measure(self, stage_name):
+        sampler = _PeakRSSSampler()
+        sampler.start()
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            self.stages.append(
+                {
+                    "stage": stage_name,
+                    "seconds": round(seconds, 4),
+                    "peak_rss_mb": round(sampler.stop(), 1),
+                }
+            )
+            logger.info(f"{stage_name} finished in {seconds:.2f}s")
+
+
+def _stub_pdf_rendering():
+    """PI invoice PDFs are written empty instead of being rendered by Chromium,
+    so the PI invoice export only measures splitting the data and rendering
+    the HTML"""
+
+    def _run(args, **kwargs):
+        for arg in args:
+            if arg.startswith("--print-to-pdf="):
+                open(arg.removeprefix("--print-to-pdf="), "wb").close()
+        return subprocess.CompletedProcess(args, 0)
+
+    from process_report.invoices import pi_specific_invoice
+
+    return mock.patch.multiple(
+        pi_specific_invoice,
+        CHROME_BIN_PATH=sys.executable,
+        subprocess=types.SimpleNamespace(run=_run),
+    )
+
+
+def run_stages() -> list[dict]:
+    """Runs the pipeline stage by stage on the month configured by the settings"""
+    from process_report import process_report
+    from process_report.settings import invoice_settings
+
+    invoice_month = invoice_settings.invoice_month
+    recorder = StageRecorder()
+
+    with recorder.measure("load_merged_input"):
+        data = process_report.load_merged_input(invoice_month)
+
+    for processor in process_report.PROCESSING_ORDER:
+        with recorder.measure(processor.__name__):
+            proc_instance = processor(name="", invoice_month=invoice_month, data=data)
+            proc_instance.process()
+            data = proc_instance.data
+
+    with _stub_pdf_rendering():
+        for inv_instance in process_report.create_invoices(
+            invoice_month, data, process_report.INVOICE_LIST
+        ):
+            invoice_name = type(inv_instance).__name__
+            with recorder.measure(f"{invoice_name}.process"):
+                inv_instance.process()
+            with recorder.measure(f"{invoice_name}.export"):
+                inv_instance.export()
+
+    return recorder.stages
+
+
+def _setup_workspace(workspace):
+    """The pipeline reads the institute list and templates relative to the working directory"""
+    process_report_dir = os.path.join(workspace, "process_report")
+    os.makedirs(process_report_dir, exist_ok=True)
+    for name in ["institute_list.yaml", "templates"]:
+        os.symlink(
+            os.path.join(PROJECT_ROOT, "process_report", name),
+            os.path.join(process_report_dir, name),
+        )
+
+
+def benchmark_scale(spec: synthetic_month.SyntheticMonthSpec, workdir) -> dict:
+    """Generates a month for `spec` in `workdir` and benchmarks the pipeline on it"""
+    month_files = synthetic_month.generate_month(spec, os.path.join(workdir, "input"))
+    workspace = os.path.join(workdir, "output")
+    _setup_workspace(workspace)
+
+    env = os.environ.copy()
+    env.update(month_files.get_env(spec.invoice_month))
+    env["PDF_RENDERER"] = "subprocess"
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")])
+    )
+
+    stages_filepath = os.path.join(workdir, "stages.json")
+    log_filepath = os.path.join(workdir, "benchmark.log")
+    logger.info(
+        f"Benchmarking {month_files.num_rows} rows from {spec.num_pis} PIs and {spec.num_projects} projects"
+    )
+    with open(log_filepath, "w") as log_file:
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "process_report.benchmarks.run_benchmark",
+                "--run-stages",
+                stages_filepath,
+            ],
+            cwd=workspace,
+            env=env,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark failed, see {log_filepath}")
+
+    with open(stages_filepath) as f:
+        scale_report = json.load(f)
+    scale_report.update(
+        {
+            "num_pis": spec.num_pis,
+            "num_projects": spec.num_projects,
+            "num_prepay_groups": spec.num_prepay_groups,
+            "num_rows": month_files.num_rows,
+        }
+    )
+    return scale_report
+
+
+def _get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    spec: synthetic_month.SyntheticMonthSpec, scales: list[int], workdir
+) -> dict:
+    import pandas
+    import pyarrow
+    from process_report.settings import invoice_settings
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _get_commit(),
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "pyarrow": pyarrow.__version__,
+        "money_representation": invoice_settings.money_representation,
+        "spec": dataclasses.asdict(spec),
+        "scales": {},
+    }
+    for scale in scales:
+        logger.info(f"Benchmarking scale {scale}x")
+        report["scales"][str(scale)] = benchmark_scale(
+            spec.scaled(scale), os.path.join(workdir, f"scale_{scale}")
+        )
+    return report
+
+
+def compare_reports(baseline: dict, report: dict) -> list[str]:
+    """Returns a line for each stage of each scale in both reports, comparing their times"""
+    lines = [
+        f"Comparing {baseline.get('commit')} (baseline) against {report.get('commit')}"
+    ]
+    for scale, scale_report in report["scales"].items():
+        if scale not in baseline["scales"]:
+            continue
+        baseline_stages = {
+            stage["stage"]: stage for stage in baseline["scales"][scale]["stages"]
+        }
+        lines.append(f"Scale {scale}x:")
+        for stage in scale_report["stages"]:
+            baseline_stage = baseline_stages.get(stage["stage"])
+            if baseline_stage is None:
+                continue
+            ratio = stage["seconds"] / max(baseline_stage["seconds"], 1e-4)
+            lines.append(
+                f"  {stage['stage']:<45} {baseline_stage['seconds']:>9.3f}s -> {stage['seconds']:>9.3f}s ({ratio:.2f}x)"
+                f"  peak RSS {baseline_stage['peak_rss_mb']:.0f} -> {stage['peak_rss_mb']:.0f} MB"
+            )
+    return lines
+
+
+def main(arg_list: list[str] | None = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Size factors"
+    )
+    parser.add_argument("--output", default="benchmark.json", help="JSON report path")
+    parser.add_argument(
+        "--workdir", help="Directory for generated months, a temporary one if not set"
+    )
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--num-pis", type=int, help="Number of PIs at scale 1x")
+    parser.add_argument("--num-projects", type=int, help="Number of projects at 1x")
+    parser.add_argument("--seed", type=int, default=0)
+    # Runs the stages in the current process, which is done in the child process of each scale
+    parser.add_argument("--run-stages", help=argparse.SUPPRESS)
+    args = parser.parse_args(arg_list)
+
+    if args.run_stages:
+        stages = run_stages()
+        with open(args.run_stages, "w") as f:
+            json.dump({"max_rss_mb": round(_get_max_rss_mb(), 1), "stages": stages}, f)
+        return
+
+    spec = synthetic_month.SyntheticMonthSpec(seed=args.seed)
+    if args.num_pis:
+        spec.num_pis = args.num_pis
+    if args.num_projects:
+        spec.num_projects = args.num_projects
+
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or stack.enter_context(tempfile.TemporaryDirectory())
+        report = run_benchmark(spec, args.scales, workdir)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Benchmark report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare_reports(baseline, report):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
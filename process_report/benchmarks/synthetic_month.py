@@ -0,0 +1,552 @@
+"""Generates synthetic but realistic invoicing months for benchmarking.
+
+A month consists of the service invoices for every cluster, the Coldfront
+allocation dump, and every other input file the pipeline reads: the PI
+file, alias file, nonbillable PIs and projects, and the prepay credits,
+debits, projects and contacts. The same spec and seed always generate the
+same month."""
+
+import os
+import csv
+import json
+import random
+import dataclasses
+from dataclasses import dataclass
+from decimal import Decimal
+
+import yaml
+
+from process_report.invoices import invoice
+from process_report.processors import validate_cluster_name_processor
+
+
+INSTITUTE_LIST_FILEPATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "institute_list.yaml"
+)
+
+# Domains of PIs not affiliated with any known institution
+UNKNOWN_DOMAINS = ["example.com", "gmail.com"]
+
+# SU types billed on each cluster, with their hourly rates
+COMPUTE_SU_TYPES = {
+    "stack": {
+        "OpenStack CPU": "0.013",
+        "OpenStack GPUA100": "1.803",
+        "OpenStack GPUA100SXM4": "2.078",
+        "OpenStack GPUH100": "6.04",
+        "OpenStack GPUV100": "1.214",
+    },
+    "ocp-prod": {
+        "OpenShift CPU": "0.013",
+        "OpenShift GPUA100": "1.803",
+        "OpenShift GPUA100SXM4": "2.078",
+        "OpenShift GPUH100": "6.04",
+        "OpenShift GPUV100": "1.214",
+    },
+    "academic": {
+        "OpenShift CPU": "0.013",
+        "OpenShift GPUV100": "1.214",
+    },
+    "ocp-test": {
+        "OpenShift CPU": "0.013",
+    },
+}
+STORAGE_SU_TYPES = {
+    "stack": {"OpenStack Storage": "0.000009"},
+    "ocp-prod": {"OpenShift Storage": "0.000009"},
+}
+
+# Lenovo charges of the Lenovo SU types, matched as substrings of SU types
+LENOVO_CHARGE_INFO = {"GPUA100SXM4": "1.5", "GPUH100": "2.25"}
+
+# Raw cluster names used by the service invoices and Coldfront, which
+# `ValidateClusterNameProcessor` canonicalizes
+RAW_CLUSTER_NAMES = {
+    canonical_name: raw_name
+    for raw_name, canonical_name in validate_cluster_name_processor.ValidateClusterNameProcessor.CLUSTER_NAME_MAP.items()
+}
+CLUSTERS = [*RAW_CLUSTER_NAMES, "ocp-test"]
+
+# Service invoice file name and the clusters whose usage it contains
+SERVICE_INVOICES = {
+    "NERC OpenStack {invoice_month}.csv": ("stack", COMPUTE_SU_TYPES),
+    "ocp-prod {invoice_month}.csv": ("ocp-prod", COMPUTE_SU_TYPES),
+    "academic {invoice_month}.csv": ("academic", COMPUTE_SU_TYPES),
+    "ocp-test {invoice_month}.csv": ("ocp-test", COMPUTE_SU_TYPES),
+    "NERC Storage {invoice_month}.csv": (("stack", "ocp-prod"), STORAGE_SU_TYPES),
+}
+
+INPUT_INVOICE_HEADER = [
+    invoice.INVOICE_DATE_FIELD,
+    invoice.PROJECT_FIELD,
+    invoice.PROJECT_ID_FIELD,
+    invoice.PI_FIELD,
+    invoice.CLUSTER_NAME_FIELD,
+    invoice.INVOICE_EMAIL_FIELD,
+    invoice.INVOICE_ADDRESS_FIELD,
+    invoice.INSTITUTION_FIELD,
+    invoice.INSTITUTION_ID_FIELD,
+    invoice.SU_HOURS_FIELD,
+    invoice.SU_TYPE_FIELD,
+    invoice.RATE_FIELD,
+    invoice.COST_FIELD,
+]
+
+
+@dataclass
+class SyntheticMonthSpec:
+    """Size and shape of a synthetic month"""
+
+    invoice_month: str = "2025-06"
+    num_pis: int = 100
+    num_projects: int = 250
+    num_prepay_groups: int = 5
+    # Fractions of PIs or projects with the given property
+    bu_pi_fraction: float = 0.3
+    alias_fraction: float = 0.05
+    unknown_domain_fraction: float = 0.02
+    new_pi_fraction: float = 0.2
+    nonbillable_pi_fraction: float = 0.02
+    su_type_credit_pi_fraction: float = 0.02
+    nonbillable_project_fraction: float = 0.03
+    prepay_project_fraction: float = 0.05
+    course_fraction: float = 0.05
+    seed: int = 0
+
+    def scaled(self, factor: int) -> "SyntheticMonthSpec":
+        """Returns the spec with `factor` times as many PIs, projects and prepay groups"""
+        return dataclasses.replace(
+            self,
+            num_pis=self.num_pis * factor,
+            num_projects=self.num_projects * factor,
+            num_prepay_groups=self.num_prepay_groups * factor,
+        )
+
+
+@dataclass
+class SyntheticMonthFiles:
+    """Paths of a generated month's input files"""
+
+    invoice_dir: str
+    coldfront_api_filepath: str
+    pi_filepath: str
+    alias_filepath: str
+    nonbillable_pis_filepath: str
+    nonbillable_projects_filepath: str
+    prepay_credits_filepath: str
+    prepay_debits_filepath: str
+    prepay_projects_filepath: str
+    prepay_contacts_filepath: str
+    num_rows: int
+
+    def get_env(self, invoice_month) -> dict[str, str]:
+        """Returns the environment variables configuring the pipeline to read this month"""
+        return {
+            "INVOICE_MONTH": invoice_month,
+            "FETCH_FROM_S3": "false",
+            "UPLOAD_TO_S3": "false",
+            "INVOICE_PATH_TEMPLATE": self.invoice_dir,
+            "COLDFRONT_API_FILEPATH": self.coldfront_api_filepath,
+            "PI_REMOTE_FILEPATH": self.pi_filepath,
+            "ALIAS_REMOTE_FILEPATH": self.alias_filepath,
+            "NONBILLABLE_PIS_FILEPATH": self.nonbillable_pis_filepath,
+            "NONBILLABLE_PROJECTS_FILEPATH": self.nonbillable_projects_filepath,
+            "PREPAY_CREDITS_FILEPATH": self.prepay_credits_filepath,
+            "PREPAY_DEBITS_REMOTE_FILEPATH": self.prepay_debits_filepath,
+            "PREPAY_PROJECTS_FILEPATH": self.prepay_projects_filepath,
+            "PREPAY_CONTACTS_FILEPATH": self.prepay_contacts_filepath,
+            "NEW_PI_CREDIT_AMOUNT": "1000",
+            "LIMIT_NEW_PI_CREDIT_TO_PARTNERS": "true",
+            "BU_SUBSIDY_AMOUNT": "100",
+            "LENOVO_CHARGE_INFO": json.dumps(LENOVO_CHARGE_INFO),
+        }
+
+
+@dataclass
+class _PI:
+    username: str
+    institution: str
+    institution_code: str
+    aliases: list[str]
+
+
+@dataclass
+class _Project:
+    name: str
+    pi: _PI
+    is_course: bool
+    # Raw cluster name -> allocation ID
+    allocations: dict[str, str]
+
+
+def _get_month(invoice_month, months_before) -> str:
+    year, month = map(int, invoice_month.split("-"))
+    month_ordinal = year * 12 + month - 1 - months_before
+    return f"{month_ordinal // 12:04d}-{month_ordinal % 12 + 1:02d}"
+
+
+def _write_csv(filepath, header, rows):
+    with open(filepath, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+class SyntheticMonthGenerator:
+    def __init__(self, spec: SyntheticMonthSpec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+
+        with open(INSTITUTE_LIST_FILEPATH) as f:
+            self.institutions = [
+                (institute["display_name"], institute["domains"][0])
+                for institute in yaml.safe_load(f)
+            ]
+
+        self.pis = self._generate_pis()
+        self.projects = self._generate_projects()
+
+    def _generate_pis(self) -> list[_PI]:
+        pis = []
+        for i in range(self.spec.num_pis):
+            if self.rng.random() < self.spec.unknown_domain_fraction:
+                institution, domain = "", self.rng.choice(UNKNOWN_DOMAINS)
+            elif self.rng.random() < self.spec.bu_pi_fraction:
+                institution, domain = "Boston University", "bu.edu"
+            else:
+                institution, domain = self.rng.choice(self.institutions)
+
+            username = f"pi{i}@{domain}"
+            aliases = []
+            if self.rng.random() < self.spec.alias_fraction:
+                aliases = [f"pi{i}_{j}@{domain}" for j in range(self.rng.randint(1, 2))]
+            pis.append(
+                _PI(username, institution, institution[:8].upper() or "N/A", aliases)
+            )
+        return pis
+
+    def _generate_projects(self) -> list[_Project]:
+        projects = []
+        for i in range(self.spec.num_projects):
+            # Every PI has at least one project
+            pi = self.pis[i] if i < len(self.pis) else self.rng.choice(self.pis)
+            # Allocated project names are the project name with a suffix
+            name = f"project-{i}"
+            num_clusters = self.rng.choices([1, 2, 3], weights=[6, 3, 1])[0]
+            clusters = self.rng.sample(CLUSTERS, num_clusters)
+            projects.append(
+                _Project(
+                    name,
+                    pi,
+                    self.rng.random() < self.spec.course_fraction,
+                    {
+                        RAW_CLUSTER_NAMES.get(cluster, cluster): f"{i:06x}{j}"
+                        for j, cluster in enumerate(clusters)
+                    },
+                )
+            )
+        return projects
+
+    def _get_canonical_cluster(self, raw_cluster_name):
+        return validate_cluster_name_processor.ValidateClusterNameProcessor.get_canonical_cluster_name(
+            raw_cluster_name
+        )
+
+    def _get_invoice_rows(self, clusters, su_types) -> list[list]:
+        rows = []
+        for project in self.projects:
+            for raw_cluster_name, allocation_id in project.allocations.items():
+                cluster = self._get_canonical_cluster(raw_cluster_name)
+                if cluster not in clusters or cluster not in su_types:
+                    continue
+
+                cluster_su_types = list(su_types[cluster].items())
+                num_su_types = self.rng.randint(1, len(cluster_su_types))
+                for su_type, rate in self.rng.sample(cluster_su_types, num_su_types):
+                    su_hours = self.rng.randint(1, 50_000)
+                    cost = (su_hours * Decimal(rate)).quantize(Decimal("0.01"))
+                    # Invoices may report the PI under an alias, which Coldfront overrides
+                    pi = project.pi
+                    rows.append(
+                        [
+                            self.spec.invoice_month,
+                            allocation_id,
+                            allocation_id,
+                            self.rng.choice([pi.username, *pi.aliases]),
+                            raw_cluster_name,
+                            pi.username,
+                            "|1 Main St, Boston MA 02101|",
+                            pi.institution,
+                            pi.institution_code,
+                            su_hours,
+                            su_type,
+                            rate,
+                            cost,
+                        ]
+                    )
+        return rows
+
+    def _write_service_invoices(self, invoice_dir) -> int:
+        os.makedirs(invoice_dir, exist_ok=True)
+        num_rows = 0
+        for invoice_name, (clusters, su_types) in SERVICE_INVOICES.items():
+            if isinstance(clusters, str):
+                clusters = (clusters,)
+            rows = self._get_invoice_rows(clusters, su_types)
+            num_rows += len(rows)
+
+            # Quoting is done manually, as invoices quote with "|"
+            invoice_path = os.path.join(
+                invoice_dir, invoice_name.format(invoice_month=self.spec.invoice_month)
+            )
+            with open(invoice_path, "w") as f:
+                f.write(",".join(INPUT_INVOICE_HEADER) + "\n")
+                for row in rows:
+                    f.write(",".join(str(value) for value in row) + "\n")
+        return num_rows
+
+    def _write_coldfront_api_data(self, filepath):
+        allocations = []
+        for project in self.projects:
+            for raw_cluster_name, allocation_id in project.allocations.items():
+                attributes = {
+                    "Allocated Project Name": f"{project.name}-{allocation_id}",
+                    "Allocated Project ID": allocation_id,
+                    "Is Course?": "Yes" if project.is_course else "No",
+                }
+                if project.pi.institution_code != "N/A":
+                    attributes["Institution-Specific Code"] = (
+                        project.pi.institution_code
+                    )
+                allocations.append(
+                    {
+                        "id": len(allocations) + 1,
+                        "project": {"pi": project.pi.username},
+                        "resource": {"name": raw_cluster_name},
+                        "attributes": attributes,
+                    }
+                )
+        with open(filepath, "w") as f:
+            json.dump(allocations, f)
+
+    def _write_pi_file(self, filepath):
+        """PIs that are not new have been invoiced before, some with credits still in use"""
+        rows = []
+        for pi in self.pis:
+            if self.rng.random() < self.spec.new_pi_fraction:
+                continue
+            months_before = self.rng.randint(1, 36)
+            if months_before <= 2:
+                rows.append(
+                    [
+                        pi.username,
+                        _get_month(self.spec.invoice_month, months_before),
+                        "1000.00",
+                        f"{self.rng.randint(0, 1000)}.00",
+                        "0.00",
+                    ]
+                )
+            else:
+                rows.append(
+                    [
+                        pi.username,
+                        _get_month(self.spec.invoice_month, months_before),
+                        "0.00",
+                        "0.00",
+                        "0.00",
+                    ]
+                )
+        _write_csv(
+            filepath,
+            [
+                invoice.PI_PI_FIELD,
+                invoice.PI_FIRST_MONTH,
+                invoice.PI_INITIAL_CREDITS,
+                invoice.PI_1ST_USED,
+                invoice.PI_2ND_USED,
+            ],
+            rows,
+        )
+
+    def _write_alias_file(self, filepath):
+        with open(filepath, "w") as f:
+            for pi in self.pis:
+                if pi.aliases:
+                    f.write(",".join([pi.username, *pi.aliases]) + "\n")
+
+    def _write_nonbillable_pis(self, filepath):
+        pi_list = []
+        for pi in self.pis:
+            if self.rng.random() < self.spec.nonbillable_pi_fraction:
+                pi_list.append({"username": pi.username})
+            elif self.rng.random() < self.spec.su_type_credit_pi_fraction:
+                su_types = self.rng.sample(list(COMPUTE_SU_TYPES["ocp-prod"]), 2)
+                pi_list.append(
+                    {
+                        "username": pi.username,
+                        "non_billed_su_types": [{"name": name} for name in su_types],
+                    }
+                )
+        with open(filepath, "w") as f:
+            yaml.safe_dump(pi_list, f)
+
+    def _write_nonbillable_projects(self, filepath):
+        project_list = []
+        for project in self.projects:
+            if self.rng.random() >= self.spec.nonbillable_project_fraction:
+                continue
+
+            # Nonbillable projects are listed by allocated project name
+            allocations = list(project.allocations.items())
+            raw_cluster_name, allocation_id = self.rng.choice(allocations)
+            project_name = f"{project.name}-{allocation_id}"
+            kind = self.rng.choice(["always", "timed", "cluster", "billable"])
+            if kind == "always":
+                project_list.append({"name": project_name})
+            elif kind == "timed":
+                project_list.append(
+                    {
+                        "name": project_name,
+                        "start": _get_month(self.spec.invoice_month, 6),
+                        "end": _get_month(self.spec.invoice_month, -6),
+                    }
+                )
+            elif kind == "cluster":
+                project_list.append(
+                    {
+                        "name": project_name,
+                        "clusters": [
+                            {"name": self._get_canonical_cluster(raw_cluster_name)}
+                        ],
+                    }
+                )
+            else:
+                project_list.append({"name": project_name, "is_billable": True})
+
+        with open(filepath, "w") as f:
+            yaml.safe_dump(project_list, f)
+
+    def _write_prepay_files(
+        self, credits_filepath, debits_filepath, projects_filepath, contacts_filepath
+    ):
+        group_names = [f"Group{i}" for i in range(self.spec.num_prepay_groups)]
+        contacts_rows, credits_rows, debits_rows, projects_rows = [], [], [], []
+        for group_name in group_names:
+            _, domain = self.rng.choice(self.institutions)
+            contacts_rows.append(
+                [
+                    group_name,
+                    f"{group_name.lower()}@{domain}",
+                    self.rng.choice(["Yes", "No"]),
+                ]
+            )
+
+            # Groups are credited some past months, and debited less than
+            # their credits in the months since, so no balance is negative
+            months_before = self.rng.randint(1, 24)
+            total_credits = 0
+            for month in range(months_before, -1, -self.rng.randint(3, 12)):
+                credit = self.rng.randint(1, 20) * 1000
+                total_credits += credit
+                credits_rows.append(
+                    [
+                        _get_month(self.spec.invoice_month, month),
+                        group_name,
+                        f"{credit}.00",
+                    ]
+                )
+            for month in range(months_before, 0, -1):
+                debit = self.rng.randint(0, total_credits // (2 * months_before))
+                debits_rows.append(
+                    [
+                        _get_month(self.spec.invoice_month, month),
+                        group_name,
+                        f"{debit}.00",
+                    ]
+                )
+
+        # Prepay projects are listed by project name, without the allocation suffix
+        for project in self.projects:
+            if self.rng.random() >= self.spec.prepay_project_fraction:
+                continue
+            projects_rows.append(
+                [
+                    self.rng.choice(group_names),
+                    project.name,
+                    _get_month(self.spec.invoice_month, self.rng.randint(0, 12)),
+                    _get_month(self.spec.invoice_month, self.rng.randint(-12, 1)),
+                ]
+            )
+
+        _write_csv(
+            contacts_filepath,
+            [
+                invoice.PREPAY_GROUP_NAME_FIELD,
+                invoice.PREPAY_GROUP_CONTACT_FIELD,
+                invoice.PREPAY_MANAGED_FIELD,
+            ],
+            contacts_rows,
+        )
+        _write_csv(
+            credits_filepath,
+            [
+                invoice.PREPAY_MONTH_FIELD,
+                invoice.PREPAY_GROUP_NAME_FIELD,
+                invoice.PREPAY_CREDIT_FIELD,
+            ],
+            credits_rows,
+        )
+        _write_csv(
+            debits_filepath,
+            [
+                invoice.PREPAY_MONTH_FIELD,
+                invoice.PREPAY_GROUP_NAME_FIELD,
+                invoice.PREPAY_DEBIT_FIELD,
+            ],
+            debits_rows,
+        )
+        _write_csv(
+            projects_filepath,
+            [
+                invoice.PREPAY_GROUP_NAME_FIELD,
+                invoice.PREPAY_PROJECT_FIELD,
+                invoice.PREPAY_START_DATE_FIELD,
+                invoice.PREPAY_END_DATE_FIELD,
+            ],
+            projects_rows,
+        )
+
+    def write(self, output_dir) -> SyntheticMonthFiles:
+        """Writes the month's input files to `output_dir`"""
+        os.makedirs(output_dir, exist_ok=True)
+        files = SyntheticMonthFiles(
+            invoice_dir=os.path.join(output_dir, "invoices"),
+            coldfront_api_filepath=os.path.join(output_dir, "coldfront_api_data.json"),
+            pi_filepath=os.path.join(output_dir, "PI.csv"),
+            alias_filepath=os.path.join(output_dir, "alias.csv"),
+            nonbillable_pis_filepath=os.path.join(output_dir, "pi.yaml"),
+            nonbillable_projects_filepath=os.path.join(output_dir, "projects.yaml"),
+            prepay_credits_filepath=os.path.join(output_dir, "prepay_credits.csv"),
+            prepay_debits_filepath=os.path.join(output_dir, "prepay_debits.csv"),
+            prepay_projects_filepath=os.path.join(output_dir, "prepay_projects.csv"),
+            prepay_contacts_filepath=os.path.join(output_dir, "prepay_contacts.csv"),
+            num_rows=0,
+        )
+
+        files.num_rows = self._write_service_invoices(files.invoice_dir)
+        self._write_coldfront_api_data(files.coldfront_api_filepath)
+        self._write_pi_file(files.pi_filepath)
+        self._write_alias_file(files.alias_filepath)
+        self._write_nonbillable_pis(files.nonbillable_pis_filepath)
+        self._write_nonbillable_projects(files.nonbillable_projects_filepath)
+        self._write_prepay_files(
+            files.prepay_credits_filepath,
+            files.prepay_debits_filepath,
+            files.prepay_projects_filepath,
+            files.prepay_contacts_filepath,
+        )
+        return files
+
+
+def generate_month(spec: SyntheticMonthSpec, output_dir) -> SyntheticMonthFiles:
+    return SyntheticMonthGenerator(spec).write(output_dir)
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import queue
+import fcntl
+import base64
+import select
+import signal
+import logging
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+# Chromium reads DevTools protocol messages from fd 3 and writes to fd 4
+# when launched with --remote-debugging-pipe. Messages are null-terminated JSON
+CHROMIUM_READ_FD = 3
+CHROMIUM_WRITE_FD = 4
+MESSAGE_SEPARATOR = b"\0"
+
+
+class ChromiumError(Exception):
+    """Raised when a Chromium instance fails to start, render or respond in time"""
+
+    pass
+
+
+class ChromiumInstance:
+    """A headless Chromium process with a single page, driven over the DevTools protocol"""
+
+    def __init__(self, chrome_bin_path, launch_timeout=30):
+        # Pipe ends are duplicated above fd 4 so they are not overwritten
+        # when moved to fds 3 and 4 in the child process
+        chromium_read, parent_write = self._open_pipe()
+        parent_read, chromium_write = self._open_pipe()
+
+        # The pipe ends are moved by spawn file actions rather than in a
+        # preexec_fn, which is not safe to run in a process with threads
+        try:
+            self._pid = os.posix_spawnp(
+                chrome_bin_path,
+                [
+                    chrome_bin_path,
+                    "--headless",
+                    "--no-sandbox",
+                    "--remote-debugging-pipe",
+                    "about:blank",
+                ],
+                os.environ,
+                file_actions=[
+                    (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+                    (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+                    (os.POSIX_SPAWN_DUP2, 1, 2),
+                    (os.POSIX_SPAWN_DUP2, chromium_read, CHROMIUM_READ_FD),
+                    (os.POSIX_SPAWN_DUP2, chromium_write, CHROMIUM_WRITE_FD),
+                ],
+            )
+        except OSError as e:
+            os.close(parent_read)
+            os.close(parent_write)
+            raise ChromiumError(f"Could not launch {chrome_bin_path}: {e}") from e
+        finally:
+            # Only the child process needs these ends
+            os.close(chromium_read)
+            os.close(chromium_write)
+
+        self._read_fd = parent_read
+        self._writer = os.fdopen(parent_write, "wb")
+        self._buffer = b""
+        self._message_id = 0
+
+        try:
+            deadline = time.monotonic() + launch_timeout
+            target_id = self._call(
+                "Target.createTarget", {"url": "about:blank"}, deadline=deadline
+            )["targetId"]
+            self._session_id = self._call(
+                "Target.attachToTarget",
+                {"targetId": target_id, "flatten": True},
+                deadline=deadline,
+            )["sessionId"]
+            self._frame_id = self._call(
+                "Page.getFrameTree", session=True, deadline=deadline
+            )["frameTree"]["frame"]["id"]
+        except ChromiumError:
+            self.close()
+            raise
+
+    @staticmethod
+    def _open_pipe():
+        read_fd, write_fd = os.pipe()
+        pipe_fds = tuple(
+            fcntl.fcntl(fd, fcntl.F_DUPFD_CLOEXEC, CHROMIUM_WRITE_FD + 1)
+            for fd in (read_fd, write_fd)
+        )
+        os.close(read_fd)
+        os.close(write_fd)
+        return pipe_fds
+
+    def _read_message(self, deadline) -> dict:
+        while MESSAGE_SEPARATOR not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ChromiumError("Timed out waiting for Chromium")
+            readable, _, _ = select.select([self._read_fd], [], [], remaining)
+            if not readable:
+                continue
+            chunk = os.read(self._read_fd, 1024 * 1024)
+            if not chunk:
+                raise ChromiumError("Chromium closed the DevTools pipe")
+            self._buffer += chunk
+
+        message, self._buffer = self._buffer.split(MESSAGE_SEPARATOR, 1)
+        return json.loads(message)
+
+    def _call(self, method, params=None, session=False, deadline=None) -> dict:
+        """Sends a DevTools protocol command and returns its result, ignoring events"""
+        self._message_id += 1
+        message = {"id": self._message_id, "method": method, "params": params or {}}
+        if session:
+            message["sessionId"] = self._session_id
+
+        try:
+            self._writer.write(json.dumps(message).encode() + MESSAGE_SEPARATOR)
+            self._writer.flush()
+        except OSError as e:
+            raise ChromiumError(f"Could not send {method} to Chromium: {e}") from e
+
+        while True:
+            response = self._read_message(deadline)
+            if response.get("id") != self._message_id:
+                continue
+            if "error" in response:
+                raise ChromiumError(f"{method} failed: {response['error']}")
+            return response["result"]
+
+    def print_to_pdf(self, html: str, timeout) -> bytes:
+        """Renders an HTML document and returns it printed as a PDF"""
+        deadline = time.monotonic() + timeout
+        self._call(
+            "Page.setDocumentContent",
+            {"frameId": self._frame_id, "html": html},
+            session=True,
+            deadline=deadline,
+        )
+        # Wait for web fonts, as the page is printed as soon as it is loaded
+        self._call(
+            "Runtime.evaluate",
+            {
+                "expression": "document.fonts.ready.then(() => true)",
+                "awaitPromise": True,
+            },
+            session=True,
+            deadline=deadline,
+        )
+        pdf_data = self._call(
+            "Page.printToPDF",
+            # Print background colors and images, and the page size set by
+            # the invoice's CSS @page rules
+            {
+                "displayHeaderFooter": False,
+                "printBackground": True,
+                "preferCSSPageSize": True,
+            },
+            session=True,
+            deadline=deadline,
+        )["data"]
+        return base64.b64decode(pdf_data)
+
+    def close(self):
+        os.kill(self._pid, signal.SIGKILL)
+        os.waitpid(self._pid, 0)
+        try:
+            self._writer.close()
+        except BrokenPipeError:
+            pass  # Unsent messages are discarded with the process
+        os.close(self._read_fd)
+
+
+class ChromiumPool:
+    """A pool of long-lived headless Chromium instances printing HTML to PDF.
+
+    Each instance renders one page at a time, so up to `pool_size` pages are
+    rendered concurrently. An instance that fails or times out is closed and
+    replaced by a new one the next time it is needed."""
+
+    def __init__(self, chrome_bin_path, pool_size=4, page_timeout=60):
+        self.chrome_bin_path = chrome_bin_path
+        self.pool_size = pool_size
+        self.page_timeout = page_timeout
+        self._instances = queue.Queue()
+
+    def start(self):
+        """Launches all instances, raising `ChromiumError` if any fails to start"""
+        try:
+            for _ in range(self.pool_size):
+                self._instances.put(ChromiumInstance(self.chrome_bin_path))
+        except ChromiumError:
+            self.close()
+            raise
+        logger.info(f"Started pool of {self.pool_size} Chromium instances")
+
+    def print_to_pdf(self, html: str) -> bytes:
+        instance = self._instances.get()
+        try:
+            if instance is None:
+                instance = ChromiumInstance(self.chrome_bin_path)
+            return instance.print_to_pdf(html, self.page_timeout)
+        except ChromiumError:
+            if instance is not None:
+                instance.close()
+            instance = None
+            raise
+        finally:
+            self._instances.put(instance)
+
+    def close(self):
+        while not self._instances.empty():
+            instance = self._instances.get()
+            if instance is not None:
+                instance.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,286 @@
+import os
+import re
+import json
+import time
+import codecs
+import pickle
+import logging
+import itertools
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import requests
+import requests.adapters
+import urllib3.util
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+# Bump to invalidate existing cache entries if the cached layout changes
+CACHE_FORMAT_VERSION = 1
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def get_session(max_workers=4, max_attempts=3) -> requests.Session:
+    """Returns a session pooling enough connections for `max_workers` concurrent
+    requests, which retries failed GET requests with exponential backoff"""
+    retry = urllib3.util.Retry(
+        total=max_attempts - 1,
+        backoff_factor=1,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=["GET"],
+    )
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=max_workers, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    """Parses a UTF-8 encoded JSON array incrementally, yielding each element
+    as soon as it is complete. Only one chunk and one element are held in
+    memory at a time, rather than the whole document"""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    # One of "start", "first_value", "value", "separator" or "end"
+    state = "start"
+    decode_error = None
+
+    for chunk in itertools.chain(chunks, [None]):
+        is_last_chunk = chunk is None
+        buffer += text_decoder.decode(chunk or b"", final=is_last_chunk)
+        pos = 0
+        while True:
+            pos = JSON_WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer) or state == "end":
+                break
+
+            if state == "start":
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                state = "first_value"
+                pos += 1
+            elif state == "separator" or (
+                state == "first_value" and buffer[pos] == "]"
+            ):
+                if buffer[pos] == "]":
+                    state = "end"
+                elif buffer[pos] == ",":
+                    state = "value"
+                else:
+                    raise ValueError(
+                        f"Expected ',' or ']' in JSON array, got {buffer[pos]!r}"
+                    )
+                pos += 1
+            else:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    # The value is likely incomplete until more data is read
+                    decode_error = e
+                    break
+                # A number at the end of the buffer may continue in the next chunk
+                if end == len(buffer) and not is_last_chunk:
+                    break
+                decode_error = None
+                yield value
+                state = "separator"
+                pos = end
+
+        buffer = buffer[pos:]
+
+    if state != "end":
+        if decode_error:
+            raise decode_error
+        raise ValueError("Incomplete JSON array")
+    if buffer.strip():
+        raise ValueError("Unexpected data after JSON array")
+
+
+@dataclass
+class CachedResponse:
+    """A parsed response and the validators to revalidate it with"""
+
+    etag: str | None
+    last_modified: str | None
+    data: list | dict
+
+    def get_conditional_headers(self) -> dict[str, str]:
+        headers = dict()
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass
+class ColdfrontCache:
+    """On-disk cache of the Coldfront allocations fetched for each invoice month.
+
+    Entries are stored as `{cache_dir}/{invoice_month}/allocations.pickle` and
+    hold each response already parsed, with its ETag and Last-Modified
+    validators, so a rerun neither downloads nor parses unchanged responses"""
+
+    cache_dir: str
+    invoice_month: str
+
+    @property
+    def cache_path(self) -> str:
+        return os.path.join(self.cache_dir, self.invoice_month, "allocations.pickle")
+
+    def load(self) -> dict | None:
+        """Returns the cached entry, or None on a cache miss"""
+        try:
+            with open(self.cache_path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            logger.info(f"No cached Coldfront data found for {self.invoice_month}")
+            return None
+
+        if entry.get("version") != CACHE_FORMAT_VERSION:
+            return None
+        return entry
+
+    def save(self, responses: dict[str, CachedResponse]):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        entry = {
+            "version": CACHE_FORMAT_VERSION,
+            "fetched_at": time.time(),
+            "responses": responses,
+        }
+        # Written under a temporary name so an interrupted write is never read back
+        with open(f"{self.cache_path}.tmp", "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{self.cache_path}.tmp", self.cache_path)
+        logger.info(f"Cached Coldfront data to {self.cache_path}")
+
+
+class ColdfrontClient:
+    """Fetches allocations from the Coldfront API.
+
+    If `page_size` is set, the first page is fetched to learn the number of
+    pages, and the remaining pages are then fetched concurrently. This expects
+    the paginated response format of Django REST framework, with a `count` and
+    the allocations in `results`. A server that does not paginate is handled as
+    if it returned a single page. Otherwise, all allocations are fetched in one
+    request, and its response is parsed incrementally as it is streamed.
+
+    If a cache is given, requests are made conditional on the ETag and
+    Last-Modified of the cached responses, and responses the server reports
+    as unchanged are read from the cache. Within `cache_max_age` seconds of
+    the last fetch, no requests are made at all."""
+
+    def __init__(
+        self,
+        api_url,
+        session: requests.Session,
+        page_size: int | None = None,
+        max_workers=4,
+        timeout=60,
+        cache: ColdfrontCache | None = None,
+        cache_max_age=0,
+        chunk_size=STREAM_CHUNK_SIZE,
+    ):
+        self.api_url = api_url
+        self.session = session
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = cache
+        self.cache_max_age = cache_max_age
+        self.chunk_size = chunk_size
+
+    def _get(self, params, cached_response: CachedResponse | None, stream=False):
+        """Returns the parsed response, or the cached one if it is unchanged"""
+        headers = cached_response.get_conditional_headers() if cached_response else {}
+        r = self.session.get(
+            self.api_url,
+            params=params,
+            headers=headers,
+            timeout=self.timeout,
+            stream=stream,
+        )
+        with r:
+            if r.status_code == requests.codes.not_modified and cached_response:
+                return cached_response
+            r.raise_for_status()
+
+            if stream:
+                data = list(iter_json_array(r.iter_content(self.chunk_size)))
+            else:
+                data = r.json()
+            return CachedResponse(
+                r.headers.get("ETag"), r.headers.get("Last-Modified"), data
+            )
+
+    def _fetch_pages(
+        self, cached_responses: dict[str, CachedResponse]
+    ) -> dict[str, CachedResponse]:
+        def _get_page(page):
+            return self._get(
+                {"all": "true", "page": page, "page_size": self.page_size},
+                cached_responses.get(str(page)),
+            )
+
+        first_page = _get_page(1)
+        if not isinstance(first_page.data, dict):
+            # The server does not paginate
+            return {"1": first_page}
+
+        num_pages = max(1, -(-first_page.data["count"] // self.page_size))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            other_pages = list(executor.map(_get_page, range(2, num_pages + 1)))
+
+        return {
+            str(page): response
+            for page, response in enumerate([first_page, *other_pages], start=1)
+        }
+
+    def get_allocations(self) -> list[dict]:
+        cached_entry = self.cache.load() if self.cache else None
+        cached_responses = cached_entry["responses"] if cached_entry else {}
+
+        if (
+            cached_entry
+            and time.time() - cached_entry["fetched_at"] < self.cache_max_age
+        ):
+            logger.info("Using cached Coldfront data without revalidating it")
+            responses = cached_responses
+        else:
+            start_time = time.perf_counter()
+            if self.page_size:
+                responses = self._fetch_pages(cached_responses)
+            else:
+                responses = {
+                    "all": self._get(
+                        {"all": "true"}, cached_responses.get("all"), stream=True
+                    )
+                }
+            num_cached = sum(
+                response is cached_responses.get(key)
+                for key, response in responses.items()
+            )
+            logger.info(
+                f"Fetched {len(responses)} Coldfront responses in {time.perf_counter() - start_time:.2f}s, {num_cached} unchanged since cached"
+            )
+            if self.cache:
+                self.cache.save(responses)
+
+        allocations = []
+        for response in responses.values():
+            if isinstance(response.data, dict):
+                allocations.extend(response.data["results"])
+            else:
+                allocations.extend(response.data)
+        return allocations
@@ -0,0 +1,84 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class InvoiceExportError(Exception):
+    """Raised after all invoices were exported if any of them failed"""
+
+    def __init__(self, failures: list[tuple[str, BaseException]]):
+        self.failures = failures
+        failure_lines = "\n".join(
+            f"- {invoice_name}: {type(error).__name__}: {error}"
+            for invoice_name, error in failures
+        )
+        super().__init__(
+            f"{len(failures)} invoice(s) failed to export:\n{failure_lines}"
+        )
+
+
+def _export_invoice(inv_instance, s3_bucket=None) -> dict[str, float]:
+    """Processes and exports an invoice, returning the time taken by each step"""
+    timings = dict()
+
+    start_time = time.perf_counter()
+    inv_instance.process()
+    timings["process"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    inv_instance.export()
+    timings["export"] = time.perf_counter() - start_time
+
+    if s3_bucket:
+        start_time = time.perf_counter()
+        inv_instance.export_s3(s3_bucket)
+        timings["export_s3"] = time.perf_counter() - start_time
+
+    return timings
+
+
+def export_invoices(invoices: list, s3_bucket=None, max_workers=4):
+    """Processes and exports invoices concurrently, uploading them to `s3_bucket` if given.
+
+    Invoices only read the processed data they were given, so they are
+    independent of each other. Every invoice is attempted even if others
+    fail, after which an `InvoiceExportError` listing all failures is raised.
+
+    Returns a list of the invoice name and the time taken by each step of
+    each invoice, in the order of `invoices`"""
+    invoice_timings = []
+    failures = []
+
+    # Futures are kept in a list since several invoices may share a class
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (
+                type(inv_instance).__name__,
+                executor.submit(_export_invoice, inv_instance, s3_bucket),
+            )
+            for inv_instance in invoices
+        ]
+
+    for invoice_name, future in futures:
+        try:
+            timings = future.result()
+        except (Exception, SystemExit) as e:
+            logger.error(f"{invoice_name} failed to export", exc_info=e)
+            failures.append((invoice_name, e))
+            continue
+
+        invoice_timings.append((invoice_name, timings))
+        logger.info(
+            f"{invoice_name} exported in {sum(timings.values()):.2f}s ("
+            + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items())
+            + ")"
+        )
+
+    if failures:
+        raise InvoiceExportError(failures)
+
+    return invoice_timings
@@ -0,0 +1,95 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+from dataclasses import dataclass
+
+import pyarrow
+import pyarrow.parquet
+
+from process_report import util
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+# Bump to invalidate existing cache entries if the cached table layout changes
+CACHE_FORMAT_VERSION = 1
+
+
+def get_file_hash(filepath) -> str:
+    """Returns the SHA-256 hex digest of a local file's content"""
+    file_hash = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+@dataclass
+class InputCache:
+    """On-disk Parquet cache of the merged input invoices of each month.
+
+    Entries are stored as `{cache_dir}/{invoice_month}/{cache_key}.parquet`,
+    where the cache key is derived from fingerprints (S3 ETags or content hashes)
+    of the source invoices and the schema they are parsed with. Any change to
+    the source files or to the schema therefore results in a cache miss."""
+
+    cache_dir: str
+    invoice_month: str
+
+    @staticmethod
+    def get_cache_key(source_fingerprints: dict[str, str], schema: list) -> str:
+        key_data = json.dumps(
+            {
+                "version": CACHE_FORMAT_VERSION,
+                "sources": sorted(source_fingerprints.items()),
+                "schema": [list(map(str, column)) for column in schema],
+            }
+        )
+        return hashlib.sha256(key_data.encode()).hexdigest()
+
+    @property
+    def month_dir(self) -> str:
+        return os.path.join(self.cache_dir, self.invoice_month)
+
+    def get_cache_path(self, cache_key) -> str:
+        return os.path.join(self.month_dir, f"{cache_key}.parquet")
+
+    def load(self, cache_key) -> pyarrow.Table | None:
+        """Returns the cached table, or None on a cache miss"""
+        cache_path = self.get_cache_path(cache_key)
+        if not os.path.exists(cache_path):
+            logger.info(f"No cached input found for {self.invoice_month}")
+            return None
+
+        logger.info(f"Using cached input {cache_path}")
+        return pyarrow.parquet.read_table(cache_path)
+
+    def save(self, cache_key, table: pyarrow.Table):
+        """Stores the table, replacing any other entry for the same month"""
+        os.makedirs(self.month_dir, exist_ok=True)
+        for stale_entry in os.listdir(self.month_dir):
+            os.remove(os.path.join(self.month_dir, stale_entry))
+
+        # Written under a temporary name so an interrupted write is never read back
+        cache_path = self.get_cache_path(cache_key)
+        pyarrow.parquet.write_table(table, f"{cache_path}.tmp")
+        os.replace(f"{cache_path}.tmp", cache_path)
+        logger.info(f"Cached {table.num_rows} input rows to {cache_path}")
+
+    def evict(self, retention_months: int):
+        """Removes entries for months more than `retention_months` before the invoice month"""
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        for month in os.listdir(self.cache_dir):
+            try:
+                month_age = util.get_month_diff(self.invoice_month, month)
+            except ValueError:
+                continue  # Not a month directory
+            if month_age > retention_months:
+                logger.info(f"Evicting cached input for {month}")
+                shutil.rmtree(os.path.join(self.cache_dir, month))
@@ -76,6 +76,45 @@ class InstituteList(pydantic.RootModel):
                 institute_list.append(institute_info.display_name)
         return institute_list
 
+    @functools.cached_property
+    def nonbillable_course_set(self) -> frozenset[str]:
+        return frozenset(self.nonbillable_course_list)
+
+    @functools.cached_property
+    def nerc_total_invoice_institutions(self) -> frozenset[str]:
+        """Set of institutions, by `display_name`, included in the NERC total invoice"""
+        return frozenset(
+            institute_info.display_name
+            for institute_info in self.root
+            if institute_info.include_in_nerc_total_invoice
+        )
+
+    @functools.cached_property
+    def partnership_start_months(self) -> dict[str, int]:
+        """Dict mapping institutions, by `display_name`, to the month their
+        MGHPCC partnership started, as a month ordinal"""
+        # Imported here since util imports this module
+        from process_report import util
+
+        return {
+            institute_info.display_name: util.get_month_ordinal(
+                institute_info.mghpcc_partnership_start_date
+            )
+            for institute_info in self.root
+            if institute_info.mghpcc_partnership_start_date
+        }
+
+    def get_active_partners(self, invoice_month) -> list[str]:
+        """List of institutions, by `display_name`, whose MGHPCC partnership started by `invoice_month`"""
+        from process_report import util
+
+        invoice_month_ordinal = util.get_month_ordinal(invoice_month)
+        return [
+            display_name
+            for display_name, start_month in self.partnership_start_months.items()
+            if start_month <= invoice_month_ordinal
+        ]
+
     @functools.cached_property
     def domain_institute_mapping(self) -> dict[str, str]:
         """Dict mapping web domains to institution display names"""
@@ -86,16 +125,40 @@ class InstituteList(pydantic.RootModel):
 
         return institute_map
 
-    def get_institution_from_pi(self, pi_email) -> str:
-        institution_domain = pi_email.split("@")[-1]
-        for i in range(institution_domain.count(".") + 1):
+    def _get_institution_from_domain(self, institution_domain) -> str:
+        """Returns the institution of the longest suffix of the domain, at a
+        label boundary, found in the domain mapping (i.e "a.mclean.harvard.edu"
+        matches "mclean.harvard.edu" before "harvard.edu")"""
+        labels = institution_domain.split(".")
+        for i in range(len(labels)):
             if institution_name := self.domain_institute_mapping.get(
-                institution_domain, ""
+                ".".join(labels[i:])
             ):
-                break
-            institution_domain = institution_domain[institution_domain.find(".") + 1 :]
+                return institution_name
+        return ""
 
+    def get_institution_from_pi(self, pi_email) -> str:
+        institution_name = self._get_institution_from_domain(pi_email.split("@")[-1])
         if institution_name == "":
             logger.warning(f"PI name {pi_email} does not match any institution!")
 
         return institution_name
+
+    def get_institutions_from_pis(self, pi_emails) -> dict[str, str]:
+        """Returns a dict mapping each PI to their institution, logging all PIs
+        who do not match any institution at once"""
+        institutions = {
+            pi_email: self._get_institution_from_domain(pi_email.split("@")[-1])
+            for pi_email in pi_emails
+        }
+        unmatched_pis = [
+            pi_email
+            for pi_email, institution_name in institutions.items()
+            if institution_name == ""
+        ]
+        if unmatched_pis:
+            logger.warning(
+                f"{len(unmatched_pis)} PI names do not match any institution: {unmatched_pis}"
+            )
+
+        return institutions
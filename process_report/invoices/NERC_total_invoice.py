@@ -51,11 +51,9 @@ class NERCTotalInvoice(invoice.Invoice):
         return f"Invoices/{self.invoice_month}/Archive/NERC-{self.invoice_month}-Total-Invoice {util.get_iso8601_time()}.csv"
 
     def _prepare_export(self):
-        included_institutions = list()
-        institute_list = util.load_institute_list()
-        for institute_info in institute_list.root:
-            if institute_info.include_in_nerc_total_invoice:
-                included_institutions.append(institute_info.display_name)
+        included_institutions = (
+            util.load_institute_list().nerc_total_invoice_institutions
+        )
 
         self.export_data = self.data[
             self.data[invoice.IS_BILLABLE_FIELD] & ~self.data[invoice.MISSING_PI_FIELD]
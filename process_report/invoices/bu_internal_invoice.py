@@ -1,6 +1,9 @@
 from dataclasses import dataclass
 
+import pandas
+
 import process_report.invoices.invoice as invoice
+from process_report import money
 
 
 @dataclass
@@ -41,8 +44,11 @@ class BUInternalInvoice(invoice.Invoice):
     def _sum_project_allocations(self, dataframe):
         """A project may have multiple allocations, and therefore multiple rows
         in the raw invoices. For BU-Internal invoice, we only want 1 row for
-        each unique project, summing up its allocations' costs"""
-        project_list = dataframe[invoice.PROJECT_NAME_FIELD].unique()
+        each unique project, summing up its allocations' costs.
+
+        Other fields are taken from each project's first row, and projects
+        keep the order of their first rows. The sums are computed in one
+        groupby, on int64 minor units"""
         data_no_dup = dataframe.drop_duplicates(
             invoice.PROJECT_NAME_FIELD, inplace=False
         )
@@ -52,11 +58,22 @@ class BUInternalInvoice(invoice.Invoice):
             invoice.SUBSIDY_FIELD,
             invoice.PI_BALANCE_FIELD,
         ]
-        for project in project_list:
-            project_mask = dataframe[invoice.PROJECT_NAME_FIELD] == project
-            no_dup_project_mask = data_no_dup[invoice.PROJECT_NAME_FIELD] == project
+        minor_units = pandas.DataFrame(
+            {
+                field: money.to_minor_units(dataframe[field].fillna(0))
+                for field in sum_fields
+            },
+            index=dataframe.index,
+        )
+        project_sums = minor_units.groupby(
+            dataframe[invoice.PROJECT_NAME_FIELD], sort=False
+        ).sum()
 
-            sum_fields_sums = dataframe[project_mask][sum_fields].sum().values
-            data_no_dup.loc[no_dup_project_mask, sum_fields] = sum_fields_sums
+        # Groups are in order of first appearance, as are the rows with a project name
+        has_project = data_no_dup[invoice.PROJECT_NAME_FIELD].notna().to_numpy()
+        for field in sum_fields:
+            data_no_dup.loc[has_project, field] = money.from_minor_units(
+                project_sums[field].to_numpy(), data_no_dup.index[has_project]
+            ).array
 
         return data_no_dup
@@ -6,6 +6,7 @@ import pyarrow
 import logging
 
 import process_report.util as util
+from process_report import money
 
 
 logger = logging.getLogger(__name__)
@@ -20,13 +21,19 @@ class InvoiceColumn:
 
 
 # Field type definitions
-BALANCE_FIELD_TYPE = pandas.ArrowDtype(pyarrow.decimal128(21, 2))
-RATE_FIELD_TYPE = pandas.ArrowDtype(pyarrow.decimal128(21, 13))
+# Money columns are decimals, or int64 minor units if enabled in settings
+BALANCE_FIELD_TYPE = money.get_field_type(money.BALANCE_SCALE)
+RATE_FIELD_TYPE = money.get_field_type(money.RATE_SCALE)
 INTEGER_FIELD_TYPE = pandas.ArrowDtype(pyarrow.int64())
 STRING_FIELD_TYPE = pandas.StringDtype()
 BOOL_FIELD_TYPE = pandas.BooleanDtype()
 
 
+# Canonical cluster names. Validated cluster names are categorical, with these
+# as their first categories, so clusters are compared by their integer codes
+CLUSTER_NAMES = ["stack", "ocp-prod", "academic", "ocp-test", "barcelona"]
+
+
 ### PI file field names
 PI_PI_FIELD = "PI"
 PI_FIRST_MONTH = "First Invoice Month"
@@ -111,8 +118,8 @@ GROUP_BALANCE_USED_COLUMN = InvoiceColumn(
 )
 SU_HOURS_COLUMN = InvoiceColumn(name=SU_HOURS_FIELD, dtype=INTEGER_FIELD_TYPE)
 SU_TYPE_COLUMN = InvoiceColumn(name=SU_TYPE_FIELD, dtype=STRING_FIELD_TYPE)
-SU_CHARGE_COLUMN = InvoiceColumn(name=SU_CHARGE_FIELD, dtype=BALANCE_FIELD_TYPE)
-LENOVO_CHARGE_COLUMN = InvoiceColumn(name=LENOVO_CHARGE_FIELD, dtype=BALANCE_FIELD_TYPE)
+SU_CHARGE_COLUMN = InvoiceColumn(name=SU_CHARGE_FIELD, dtype=RATE_FIELD_TYPE)
+LENOVO_CHARGE_COLUMN = InvoiceColumn(name=LENOVO_CHARGE_FIELD, dtype=RATE_FIELD_TYPE)
 RATE_COLUMN = InvoiceColumn(
     name=RATE_FIELD, dtype=RATE_FIELD_TYPE
 )  # Using decimal to suppress scientific notation in export
@@ -144,6 +151,20 @@ IS_COURSE_COLUMN = InvoiceColumn(
 )
 ###
 
+# Decimal scale of each money field, used to convert them from and to minor units
+MONEY_FIELD_SCALES = {
+    GROUP_BALANCE_FIELD: money.BALANCE_SCALE,
+    GROUP_BALANCE_USED_FIELD: money.BALANCE_SCALE,
+    SU_CHARGE_FIELD: money.RATE_SCALE,
+    LENOVO_CHARGE_FIELD: money.RATE_SCALE,
+    RATE_FIELD: money.RATE_SCALE,
+    COST_FIELD: money.BALANCE_SCALE,
+    CREDIT_FIELD: money.BALANCE_SCALE,
+    SUBSIDY_FIELD: money.BALANCE_SCALE,
+    BALANCE_FIELD: money.BALANCE_SCALE,
+    PI_BALANCE_FIELD: money.BALANCE_SCALE,
+}
+
 
 @dataclass
 class Invoice:
@@ -218,10 +239,10 @@ class Invoice:
         pass
 
     def _filter_columns(self):
-        """Filters and renames columns before exporting"""
-        self.export_data = self.export_data[self.export_columns_list].rename(
-            columns=self.exported_columns_map
-        )
+        """Filters and renames columns before exporting, converting money columns to decimals"""
+        self.export_data = money.dataframe_to_decimal(
+            self.export_data[self.export_columns_list], MONEY_FIELD_SCALES
+        ).rename(columns=self.exported_columns_map)
 
     def export(self):
         self._filter_columns()
@@ -1,4 +1,7 @@
 from dataclasses import dataclass
+from decimal import Decimal
+
+import pandas
 
 import process_report.invoices.invoice as invoice
 
@@ -29,3 +32,41 @@ class LenovoInvoice(invoice.Invoice):
         self.export_data = self.data[
             self.data[invoice.SU_TYPE_FIELD].isin(self.LENOVO_SU_TYPES)
         ]
+
+    @staticmethod
+    def _get_charge_exponent(su_charge: Decimal) -> int:
+        """Exponent of an SU charge written without trailing zeros"""
+        return min(su_charge.normalize().as_tuple().exponent, 0)
+
+    def _filter_columns(self):
+        """Writes SU charges without the trailing zeros of their scale, and
+        each charge with as many decimals as its SU charge, which is how the
+        product of the SU hours and the configured SU charge is written"""
+        super()._filter_columns()
+        su_charges = self.export_data[invoice.SU_CHARGE_FIELD]
+        charges = self.export_data[invoice.LENOVO_CHARGE_FIELD]
+        exponents = {
+            su_charge: self._get_charge_exponent(su_charge)
+            for su_charge in su_charges.dropna().unique()
+        }
+
+        self.export_data[invoice.SU_CHARGE_FIELD] = pandas.Series(
+            [
+                su_charge
+                if pandas.isna(su_charge)
+                else su_charge.quantize(Decimal(1).scaleb(exponents[su_charge]))
+                for su_charge in su_charges
+            ],
+            index=su_charges.index,
+            dtype=object,
+        )
+        self.export_data[invoice.LENOVO_CHARGE_FIELD] = pandas.Series(
+            [
+                charge
+                if pandas.isna(charge) or pandas.isna(su_charge)
+                else charge.quantize(Decimal(1).scaleb(exponents[su_charge]))
+                for charge, su_charge in zip(charges, su_charges)
+            ],
+            index=charges.index,
+            dtype=object,
+        )
@@ -1,15 +1,18 @@
 import os
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import subprocess
 import tempfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas
 from jinja2 import Environment, FileSystemLoader
 
 import process_report.invoices.invoice as invoice
 import process_report.util as util
+from process_report import chromium_pool
+from process_report.settings import invoice_settings
 
 
 TEMPLATE_DIR_PATH = "process_report/templates"
@@ -44,6 +47,10 @@ class PIInvoice(invoice.Invoice):
     ]
 
     name: str = "pi_invoices"
+    # Number of PI invoices rendered or uploaded concurrently
+    export_workers: int = 1
+    # Either "chromium_pool" or "subprocess"
+    pdf_renderer: str = field(default_factory=lambda: invoice_settings.pdf_renderer)
 
     export_columns_list = [
         invoice.INVOICE_DATE_FIELD,
@@ -71,77 +78,121 @@ class PIInvoice(invoice.Invoice):
         self.export_data = self.data[
             self.data[invoice.IS_BILLABLE_FIELD] & ~self.data[invoice.MISSING_PI_FIELD]
         ]
-        self.pi_list = self.export_data[invoice.PI_FIELD].unique()
 
-    def _get_pi_dataframe(self, data, pi):
-        pi_projects = data[data[invoice.PI_FIELD] == pi].copy().reset_index(drop=True)
+    GROUP_COLUMN_LIST = [
+        invoice.GROUP_NAME_FIELD,
+        invoice.GROUP_INSTITUTION_FIELD,
+        invoice.GROUP_BALANCE_FIELD,
+        invoice.GROUP_BALANCE_USED_FIELD,
+    ]
 
-        # Remove prepay group data if it's empty
-        if pandas.isna(pi_projects[invoice.GROUP_NAME_FIELD]).all():
-            pi_projects = pi_projects.drop(
-                [
-                    invoice.GROUP_NAME_FIELD,
-                    invoice.GROUP_INSTITUTION_FIELD,
-                    invoice.GROUP_BALANCE_FIELD,
-                    invoice.GROUP_BALANCE_USED_FIELD,
-                ],
-                axis=1,
-            )
+    @staticmethod
+    def _format_dollars(column: pandas.Series) -> pandas.Series:
+        return "$" + column.astype(pandas.StringDtype())
 
-        # Add a row containing sums for certain columns
-        column_sums = []
-        sum_columns_list = []
-        for column_name in self.TOTAL_COLUMN_LIST:
-            if column_name in pi_projects.columns:
-                column_sums.append(pi_projects[column_name].sum())
-                sum_columns_list.append(column_name)
+    def _get_totals_rows(self, data, pi_keys) -> pandas.DataFrame:
+        """Returns a totals row for every PI, indexed by PI, formatted like the rows of `_get_pi_dataframes`"""
+        sum_columns_list = [
+            column_name
+            for column_name in self.TOTAL_COLUMN_LIST
+            if column_name in data.columns
+        ]
+        column_sums = data[sum_columns_list].groupby(pi_keys, sort=False).sum()
 
-        # Copy the first row and modify values to keep row formatting
-        totals_row = pi_projects.iloc[[0]].copy()
         # Clear all values to empty strings
-        for col in totals_row.columns:
-            totals_row[col] = ""
+        totals_rows = pandas.DataFrame(
+            "",
+            index=column_sums.index,
+            columns=data.columns,
+            dtype=pandas.StringDtype(),
+        )
+        totals_rows[invoice.INVOICE_DATE_FIELD] = "Total"
+        for column_name in sum_columns_list:
+            totals_rows[column_name] = column_sums[column_name].astype(
+                pandas.StringDtype()
+            )
+
+        # Add dollar sign to certain columns, including the empty ones
+        for column_name in self.DOLLAR_COLUMN_LIST:
+            if column_name in totals_rows.columns:
+                totals_rows[column_name] = "$" + totals_rows[column_name]
+
+        return totals_rows
 
-        totals_row[invoice.INVOICE_DATE_FIELD] = "Total"
-        for col, sum_val in zip(sum_columns_list, column_sums):
-            totals_row[col] = sum_val
+    def _get_pi_dataframes(self, data):
+        """Yields the PI and formatted dataframe of each PI's invoice, in order of appearance.
 
-        pi_projects = pandas.concat([pi_projects, totals_row], ignore_index=True)
+        Data is split by PI in a single pass, and formatting is applied once to
+        all rows. A row containing sums for certain columns is added to each PI,
+        and prepay group columns are removed for PIs without prepay group data"""
+        pi_keys = data[invoice.PI_FIELD]
+        has_group_data = (
+            data[invoice.GROUP_NAME_FIELD].notna().groupby(pi_keys, sort=False).any()
+        )
+
+        formatted_data = data.copy()
+        if invoice.INVOICE_DATE_FIELD not in formatted_data.columns:
+            formatted_data[invoice.INVOICE_DATE_FIELD] = pandas.NA
+        totals_rows = self._get_totals_rows(formatted_data, pi_keys)
 
         # Add dollar sign to certain columns
         for column_name in self.DOLLAR_COLUMN_LIST:
-            if column_name in pi_projects.columns:
-                pi_projects[column_name] = pi_projects[column_name].apply(
-                    lambda data: data if pandas.isna(data) else f"${data}"
+            if column_name in formatted_data.columns:
+                formatted_data[column_name] = self._format_dollars(
+                    formatted_data[column_name]
                 )
 
         # Convert to StringDtype for template compatibility before filling NA values
-        pi_projects = pi_projects.astype(pandas.StringDtype())
+        formatted_data = formatted_data.astype(pandas.StringDtype()).fillna("")
 
-        # Convert any remaining pandas NA values to empty strings for template compatibility
-        pi_projects = pi_projects.fillna("")
+        for pi, pi_projects in formatted_data.groupby(pi_keys, sort=False):
+            pi_projects = pandas.concat(
+                [pi_projects, totals_rows.loc[[pi]]], ignore_index=True
+            )
+            if not has_group_data[pi]:
+                pi_projects = pi_projects.drop(self.GROUP_COLUMN_LIST, axis=1)
+            yield pi, pi_projects
 
-        return pi_projects
+    def _get_pi_dataframe(self, data, pi):
+        pi_projects = data[data[invoice.PI_FIELD] == pi]
+        return next(self._get_pi_dataframes(pi_projects))[1]
+
+    def _start_chromium_pool(self) -> chromium_pool.ChromiumPool | None:
+        """Starts a Chromium pool if it is the configured renderer.
+
+        Returns None, so that PDFs are rendered by the subprocess path,
+        if another renderer is configured or the pool fails to start"""
+        if self.pdf_renderer != "chromium_pool":
+            return None
+
+        pool = chromium_pool.ChromiumPool(
+            CHROME_BIN_PATH,
+            pool_size=invoice_settings.chromium_pool_size,
+            page_timeout=invoice_settings.chromium_page_timeout,
+        )
+        try:
+            pool.start()
+        except chromium_pool.ChromiumError as e:
+            logger.warning(
+                f"Could not start Chromium pool, rendering PDFs with subprocesses instead: {e}"
+            )
+            return None
+        return pool
 
     def export(self):
-        def _create_html_invoice(temp_fd):
-            environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR_PATH))
-            template = environment.get_template("pi_invoice.html")
-            content = template.render(
-                data=pi_dataframe,
-            )
-            temp_fd.write(content)
+        environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR_PATH))
+        template = environment.get_template("pi_invoice.html")
+
+        def _create_html_invoice(temp_fd, html):
+            temp_fd.write(html)
             temp_fd.flush()
 
-        def _create_pdf_invoice(temp_fd_name):
+        def _create_pdf_invoice(temp_fd_name, invoice_pdf_path):
             if not os.path.exists(CHROME_BIN_PATH):
                 sys.exit(
                     f"Chrome binary does not exist at {CHROME_BIN_PATH}. Make sure the env var CHROME_BIN_PATH is set correctly and that Google Chrome is installed"
                 )
 
-            invoice_pdf_path = (
-                f"{self.name}/{pi_instituition}_{pi}_{self.invoice_month}.pdf"
-            )
             subprocess.run(
                 [
                     CHROME_BIN_PATH,
@@ -154,21 +205,53 @@ class PIInvoice(invoice.Invoice):
                 capture_output=True,
             )
 
+        def _export_pi_invoice(pi_dataframe, invoice_pdf_path):
+            html = template.render(
+                data=pi_dataframe,
+            )
+
+            if pool:
+                try:
+                    pdf = pool.print_to_pdf(html)
+                    with open(invoice_pdf_path, "wb") as f:
+                        f.write(pdf)
+                    return
+                except chromium_pool.ChromiumError as e:
+                    logger.warning(
+                        f"Chromium pool failed to render {invoice_pdf_path}, rendering with a subprocess instead: {e}"
+                    )
+
+            with tempfile.NamedTemporaryFile(mode="w", suffix=".html") as temp_fd:
+                _create_html_invoice(temp_fd, html)
+                _create_pdf_invoice(temp_fd.name, invoice_pdf_path)
+
         self._filter_columns()
 
         # self.name is name of folder storing invoices
         os.makedirs(self.name, exist_ok=True)
 
-        for pi in self.pi_list:
-            if pandas.isna(pi):
-                continue
-
-            pi_dataframe = self._get_pi_dataframe(self.export_data, pi)
-            pi_instituition = pi_dataframe[invoice.INSTITUTION_FIELD].iat[0]
-
-            with tempfile.NamedTemporaryFile(mode="w", suffix=".html") as temp_fd:
-                _create_html_invoice(temp_fd)
-                _create_pdf_invoice(temp_fd.name)
+        # PDFs are rendered by separate Chromium processes, so they can be
+        # rendered concurrently while the next dataframes are prepared
+        pool = self._start_chromium_pool()
+        try:
+            with ThreadPoolExecutor(max_workers=self.export_workers) as executor:
+                futures = []
+                for pi, pi_dataframe in self._get_pi_dataframes(self.export_data):
+                    pi_instituition = pi_dataframe[invoice.INSTITUTION_FIELD].iat[0]
+                    invoice_pdf_path = (
+                        f"{self.name}/{pi_instituition}_{pi}_{self.invoice_month}.pdf"
+                    )
+                    futures.append(
+                        executor.submit(
+                            _export_pi_invoice, pi_dataframe, invoice_pdf_path
+                        )
+                    )
+        finally:
+            if pool:
+                pool.close()
+
+        for future in futures:
+            future.result()
 
     def export_s3(self, s3_bucket):
         def _export_s3_pi_invoice(pi_invoice):
@@ -179,5 +262,6 @@ class PIInvoice(invoice.Invoice):
             s3_bucket.upload_file(pi_invoice_path, output_s3_path)
             s3_bucket.upload_file(pi_invoice_path, output_s3_archive_path)
 
-        for pi_invoice in os.listdir(self.name):
-            _export_s3_pi_invoice(pi_invoice)
+        with ThreadPoolExecutor(max_workers=self.export_workers) as executor:
+            # list() so upload errors are raised here
+            list(executor.map(_export_s3_pi_invoice, os.listdir(self.name)))
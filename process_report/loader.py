@@ -1,3 +1,4 @@
+import csv
 from decimal import Decimal
 import functools
 import os
@@ -6,9 +7,10 @@ import yaml
 import pandas
 from nerc_rates import load_from_url
 
-from process_report import util
+from process_report import util, input_cache
 from process_report.settings import invoice_settings
 from process_report.invoices import invoice
+from process_report.nonbillable_matcher import NonbillableProjectMatcher
 
 # List of service invoices processed by pipeline. Change if new services are added.
 # Cannot simply filter by suffix because S3 can't do it
@@ -28,22 +30,66 @@ def get_rates_info():
 
 
 class Loader:
+    def __init__(self):
+        # S3 keys of files already downloaded, mapped to their local paths
+        self._fetched_s3_filepaths = dict()
+
+    def _get_s3_invoice_filepaths(self) -> dict[str, str]:
+        """Returns a mapping of service invoice S3 keys to their local paths"""
+        s3_invoice_filepaths = dict()
+        for invoice_name_template in S3_SERVICE_INVOICE_LIST:
+            local_name = invoice_name_template.format(
+                invoice_month=invoice_settings.invoice_month
+            )
+            s3_name = (invoice_settings.invoice_path_template + local_name).format(
+                invoice_month=invoice_settings.invoice_month
+            )
+            s3_invoice_filepaths[s3_name] = local_name
+
+        return s3_invoice_filepaths
+
+    def _fetch_s3_files(self, s3_local_filepaths: dict[str, str]):
+        """Downloads the given files concurrently, skipping those already downloaded"""
+        s3_local_filepaths = {
+            s3_filepath: local_path
+            for s3_filepath, local_path in s3_local_filepaths.items()
+            if s3_filepath not in self._fetched_s3_filepaths
+        }
+        if s3_local_filepaths:
+            self._fetched_s3_filepaths.update(
+                util.download_s3_files(
+                    util.get_invoice_bucket(),
+                    s3_local_filepaths,
+                    max_workers=invoice_settings.s3_download_workers,
+                    max_attempts=invoice_settings.s3_download_max_attempts,
+                )
+            )
+
+    def prefetch_s3_files(self, include_service_invoices=True):
+        """Downloads all service invoices and remote input files from S3 at once.
+
+        Later calls to `get_csv_invoice_filepath_list` and `get_remote_filepath`
+        reuse the downloaded files instead of fetching them one after another."""
+        s3_local_filepaths = dict()
+        if include_service_invoices:
+            s3_local_filepaths = self._get_s3_invoice_filepaths()
+        for remote_filepath in [
+            invoice_settings.pi_remote_filepath,
+            invoice_settings.alias_remote_filepath,
+            invoice_settings.prepay_debits_remote_filepath,
+        ]:
+            s3_local_filepaths[remote_filepath] = os.path.basename(remote_filepath)
+
+        self._fetch_s3_files(s3_local_filepaths)
+
     @functools.lru_cache
     def get_csv_invoice_filepath_list(self) -> list[str]:
         """Fetch invoice CSV files from S3 if fetch_from_s3 is True. Returns local paths of files."""
         csv_invoice_filepath_list = []
         if invoice_settings.fetch_from_s3:
-            s3_bucket = util.get_invoice_bucket()
-
-            for invoice_name_template in S3_SERVICE_INVOICE_LIST:
-                local_name = invoice_name_template.format(
-                    invoice_month=invoice_settings.invoice_month
-                )
-                s3_name = (invoice_settings.invoice_path_template + local_name).format(
-                    invoice_month=invoice_settings.invoice_month
-                )
-                csv_invoice_filepath_list.append(local_name)
-                s3_bucket.download_file(s3_name, local_name)
+            s3_invoice_filepaths = self._get_s3_invoice_filepaths()
+            self._fetch_s3_files(s3_invoice_filepaths)
+            csv_invoice_filepath_list = list(s3_invoice_filepaths.values())
         else:
             invoice_dir_path = invoice_settings.invoice_path_template.format(
                 invoice_month=invoice_settings.invoice_month
@@ -54,11 +100,28 @@ class Loader:
 
         return csv_invoice_filepath_list
 
+    def get_csv_invoice_fingerprints(self) -> dict[str, str]:
+        """Returns a fingerprint of each service invoice without downloading it.
+
+        These are the S3 ETags if fetch_from_s3 is True, otherwise the hashes of the local files."""
+        if invoice_settings.fetch_from_s3:
+            return util.get_s3_etags(
+                util.get_invoice_bucket(),
+                list(self._get_s3_invoice_filepaths()),
+                max_workers=invoice_settings.s3_download_workers,
+            )
+
+        return {
+            os.path.basename(filepath): input_cache.get_file_hash(filepath)
+            for filepath in self.get_csv_invoice_filepath_list()
+        }
+
     @functools.lru_cache
     def get_remote_filepath(self, remote_filepath: str) -> str:
         """Fetch a file from S3 if fetch_from_s3 is True. Returns local path of file."""
         if invoice_settings.fetch_from_s3:
-            return util.fetch_s3(remote_filepath)
+            self._fetch_s3_files({remote_filepath: os.path.basename(remote_filepath)})
+            return self._fetched_s3_filepaths[remote_filepath]
         return remote_filepath
 
     @functools.lru_cache
@@ -102,10 +165,12 @@ class Loader:
         with open(
             self.get_remote_filepath(invoice_settings.alias_remote_filepath)
         ) as f:
-            for line in f:
-                pi_alias_info = line.strip().split(",")
-                alias_dict[pi_alias_info[0]] = pi_alias_info[1:]
+            for pi_alias_info in csv.reader(f):
+                if pi_alias_info:
+                    alias_dict[pi_alias_info[0]] = pi_alias_info[1:]
 
+        # Conflicting aliases are caught when the file is loaded
+        util.invert_alias_map(alias_dict)
         return alias_dict
 
     @functools.lru_cache
@@ -206,6 +271,11 @@ class Loader:
             ],
         )
 
+    @functools.lru_cache
+    def get_nonbillable_project_matcher(self) -> NonbillableProjectMatcher:
+        """Returns a matcher of invoice rows against `get_nonbillable_projects()`"""
+        return NonbillableProjectMatcher(self.get_nonbillable_projects())
+
     def get_nonbillable_timed_projects(self) -> list[tuple[str, str]]:
         """Returns list of projects that should be excluded based on dates"""
         nonbilable_projects = self.get_nonbillable_projects()
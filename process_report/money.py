@@ -0,0 +1,181 @@
+"""Representation of money columns.
+
+Money columns are decimals with a fixed scale, 2 for balances (i.e cents)
+and 13 for rates. If the `money_representation` setting is "minor_units",
+they are instead stored internally as int64 counts of their smallest unit,
+so that processors run on native integer kernels. Input invoices are
+converted to this representation when they are merged, and exported
+invoices are converted back to decimals.
+
+Scalar amounts (e.g credits, subsidies, prepay balances) are always
+Decimal dollars, and must be converted with `to_internal` before being
+written to a money column."""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy
+import pandas
+import pyarrow
+import pyarrow.compute
+
+from process_report.settings import invoice_settings
+
+
+BALANCE_SCALE = 2
+RATE_SCALE = 13
+PRECISION = 21
+
+DECIMAL_BALANCE_FIELD_TYPE = pandas.ArrowDtype(
+    pyarrow.decimal128(PRECISION, BALANCE_SCALE)
+)
+MINOR_UNITS_FIELD_TYPE = pandas.ArrowDtype(pyarrow.int64())
+
+USE_MINOR_UNITS = invoice_settings.money_representation == "minor_units"
+
+
+def get_decimal_type(scale) -> pyarrow.DataType:
+    return pyarrow.decimal128(PRECISION, scale)
+
+
+def get_field_type(scale):
+    """Returns the internal dtype of money columns with the given decimal scale"""
+    if USE_MINOR_UNITS:
+        return MINOR_UNITS_FIELD_TYPE
+    return pandas.ArrowDtype(get_decimal_type(scale))
+
+
+def _get_scale_factor(scale) -> pyarrow.Scalar:
+    return pyarrow.scalar(Decimal(10**scale), pyarrow.decimal128(scale + 1, 0))
+
+
+def decimals_to_minor_units(decimals: pyarrow.Array, scale) -> pyarrow.Array:
+    decimals = decimals.cast(get_decimal_type(scale))
+    minor_units = pyarrow.compute.multiply(decimals, _get_scale_factor(scale))
+    return minor_units.cast(pyarrow.int64())
+
+
+def minor_units_to_decimals(minor_units: pyarrow.Array, scale) -> pyarrow.Array:
+    # Any int64 fits 19 digits
+    decimals = pyarrow.compute.divide(
+        minor_units.cast(pyarrow.decimal128(19, 0)), _get_scale_factor(scale)
+    )
+    return decimals.cast(get_decimal_type(scale))
+
+
+def to_minor_units(values: pandas.Series, scale=BALANCE_SCALE) -> numpy.ndarray:
+    """Converts a money series in its internal dtype to an int64 array of minor units"""
+    if USE_MINOR_UNITS:
+        return values.astype(MINOR_UNITS_FIELD_TYPE).to_numpy(dtype="int64")
+
+    decimal_dtype = pandas.ArrowDtype(get_decimal_type(scale))
+    decimals = pyarrow.array(values.astype(decimal_dtype).array)
+    return decimals_to_minor_units(decimals, scale).to_numpy()
+
+
+def from_minor_units(
+    values: numpy.ndarray, index, scale=BALANCE_SCALE
+) -> pandas.Series:
+    """Converts an int64 array of minor units to a money series in its internal dtype"""
+    if USE_MINOR_UNITS:
+        return pandas.Series(values, index=index, dtype=MINOR_UNITS_FIELD_TYPE)
+    return minor_units_to_decimal(values, index, scale)
+
+
+def minor_units_to_decimal(
+    values: numpy.ndarray, index, scale=BALANCE_SCALE
+) -> pandas.Series:
+    decimals = minor_units_to_decimals(pyarrow.array(values, pyarrow.int64()), scale)
+    return pandas.Series(
+        decimals, index=index, dtype=pandas.ArrowDtype(decimals.type), copy=False
+    )
+
+
+def decimals_to_internal(
+    decimals: pyarrow.Array, index, scale=BALANCE_SCALE
+) -> pandas.Series:
+    """Converts a decimal Arrow array to a money series in its internal dtype,
+    rounding half up any precision finer than the scale"""
+    decimals = pyarrow.compute.round(
+        decimals, ndigits=scale, round_mode="half_towards_infinity"
+    ).cast(get_decimal_type(scale))
+    if USE_MINOR_UNITS:
+        return pandas.Series(
+            decimals_to_minor_units(decimals, scale),
+            index=index,
+            dtype=MINOR_UNITS_FIELD_TYPE,
+        )
+    return pandas.Series(
+        decimals, index=index, dtype=pandas.ArrowDtype(decimals.type), copy=False
+    )
+
+
+def amount_to_minor_units(amount, scale=BALANCE_SCALE) -> int:
+    """Converts an amount to minor units, rounding half up any precision
+    finer than the scale"""
+    return int(
+        Decimal(str(amount)).scaleb(scale).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    )
+
+
+def to_internal(amount, scale=BALANCE_SCALE):
+    """Converts a Decimal dollar amount to the internal representation"""
+    if USE_MINOR_UNITS:
+        return amount_to_minor_units(amount, scale)
+    return amount
+
+
+def table_to_internal(table: pyarrow.Table, scales: dict[str, int]) -> pyarrow.Table:
+    """Converts decimal money columns of an Arrow table to the internal representation"""
+    if not USE_MINOR_UNITS:
+        return table
+
+    for i, name in enumerate(table.column_names):
+        if name in scales:
+            table = table.set_column(
+                i,
+                name,
+                decimals_to_minor_units(table.column(i), scales[name]),
+            )
+    return table
+
+
+def dataframe_to_internal(
+    dataframe: pandas.DataFrame, scales: dict[str, int]
+) -> pandas.DataFrame:
+    """Converts decimal money columns of a dataframe to the internal representation"""
+    if not USE_MINOR_UNITS:
+        return dataframe
+
+    dataframe = dataframe.copy()
+    for name in dataframe.columns.intersection(list(scales)):
+        decimals = pyarrow.array(
+            dataframe[name]
+            .astype(pandas.ArrowDtype(get_decimal_type(scales[name])))
+            .array
+        )
+        dataframe[name] = pandas.Series(
+            decimals_to_minor_units(decimals, scales[name]),
+            index=dataframe.index,
+            dtype=MINOR_UNITS_FIELD_TYPE,
+        )
+    return dataframe
+
+
+def dataframe_to_decimal(
+    dataframe: pandas.DataFrame, scales: dict[str, int]
+) -> pandas.DataFrame:
+    """Converts money columns of a dataframe from the internal representation to decimals"""
+    if not USE_MINOR_UNITS:
+        return dataframe
+
+    dataframe = dataframe.copy()
+    for name in dataframe.columns.intersection(list(scales)):
+        minor_units = pyarrow.array(
+            dataframe[name].astype(MINOR_UNITS_FIELD_TYPE).array
+        )
+        dataframe[name] = pandas.Series(
+            minor_units_to_decimals(minor_units, scales[name]),
+            index=dataframe.index,
+            dtype=pandas.ArrowDtype(get_decimal_type(scales[name])),
+        )
+    return dataframe
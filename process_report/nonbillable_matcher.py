@@ -0,0 +1,72 @@
+import numpy
+import pandas
+
+from process_report.invoices import invoice
+
+
+class NonbillableProjectMatcher:
+    """Matches invoice rows against the nonbillable projects returned by
+    `Loader.get_nonbillable_projects`.
+
+    It is built once from the nonbillable projects, and holds the casefolded
+    names of cluster-agnostic projects, an index of the (casefolded name,
+    cluster) pairs of cluster-specific projects, and the billable override
+    of each pair. Rows are then matched on their project and cluster columns
+    alone, without copying or merging the invoice."""
+
+    def __init__(self, nonbillable_projects: pandas.DataFrame):
+        project_names = nonbillable_projects[
+            invoice.NONBILLABLE_PROJECT_NAME
+        ].str.casefold()
+        clusters = nonbillable_projects[invoice.NONBILLABLE_CLUSTER_NAME]
+        is_cluster_agnostic = clusters.isna()
+
+        self.cluster_agnostic_projects = set(project_names[is_cluster_agnostic])
+
+        # A pair listed more than once is overridden if any of its entries is
+        cluster_projects = (
+            pandas.DataFrame(
+                {
+                    invoice.NONBILLABLE_PROJECT_NAME: project_names,
+                    invoice.NONBILLABLE_CLUSTER_NAME: clusters,
+                    invoice.NONBILLABLE_IS_BILLABLE_OVERRIDE: nonbillable_projects[
+                        invoice.NONBILLABLE_IS_BILLABLE_OVERRIDE
+                    ]
+                    .fillna(False)
+                    .astype(bool),
+                }
+            )[~is_cluster_agnostic]
+            .groupby(
+                [invoice.NONBILLABLE_PROJECT_NAME, invoice.NONBILLABLE_CLUSTER_NAME],
+                sort=False,
+            )[invoice.NONBILLABLE_IS_BILLABLE_OVERRIDE]
+            .any()
+        )
+        self.project_clusters = cluster_projects.index
+        # Unmatched rows have index -1, which takes the appended False
+        self.is_billable_override = numpy.append(cluster_projects.to_numpy(), False)
+
+    def match(
+        self, projects: pandas.Series, clusters: pandas.Series
+    ) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """Returns, for each row, whether its project is nonbillable, and
+        whether it is overridden as billable. Project names are compared
+        case-insensitively"""
+        # Only the distinct project names are casefolded. Missing names have
+        # code -1, which takes the appended values
+        codes, project_names = pandas.factorize(projects)
+        project_names = project_names.str.casefold()
+        is_cluster_agnostic = numpy.append(
+            project_names.isin(self.cluster_agnostic_projects), False
+        )[codes]
+        project_cluster_rows = self.project_clusters.get_indexer(
+            pandas.MultiIndex.from_arrays(
+                [
+                    numpy.append(project_names.to_numpy(dtype=object), None)[codes],
+                    clusters,
+                ]
+            )
+        )
+
+        is_nonbillable = is_cluster_agnostic | (project_cluster_rows != -1)
+        return is_nonbillable, self.is_billable_override[project_cluster_rows]
@@ -0,0 +1,207 @@
+import csv
+import json
+import sqlite3
+import logging
+from decimal import Decimal
+
+import pandas
+
+from process_report import money, input_cache, util
+from process_report.invoices import invoice
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+# Bump to rebuild existing ledgers if the table layout changes
+LEDGER_FORMAT_VERSION = 2
+
+_DEBIT_COLUMNS = [
+    invoice.PREPAY_MONTH_FIELD,
+    invoice.PREPAY_GROUP_NAME_FIELD,
+    invoice.PREPAY_DEBIT_FIELD,
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prepay_debits (
+    month TEXT NOT NULL,
+    month_ordinal INTEGER NOT NULL,
+    group_name TEXT NOT NULL,
+    debit INTEGER NOT NULL,
+    extra_values TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (month, group_name)
+);
+CREATE INDEX IF NOT EXISTS prepay_debits_by_month
+    ON prepay_debits (month_ordinal, group_name);
+CREATE TABLE IF NOT EXISTS ledger_info (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class PrepayDebitLedger:
+    """The history of prepay debits, keyed by (month, group name).
+
+    Debits are held in a SQLite table, in minor units (i.e cents), so each
+    group's debits before a month are summed by an indexed query, and this
+    month's debits are upserted in one transaction. Rows keep the order of
+    the debits CSV, with new debits appended, so that the CSV written by
+    `export_csv` only differs from the loaded one by this month's debits.
+    Other columns of the CSV are kept, and left empty for new debits. A
+    month and group with several debits in the CSV keeps the last one.
+
+    The database is in memory unless `db_filepath` is given. A database on
+    disk remembers the hash of the CSV it was last loaded from or exported
+    to, and is only reloaded from the CSV when the CSV changes.
+
+    Debits must be whole minor units. The ledger should be closed when no
+    longer needed, or used as a context manager."""
+
+    def __init__(self, db_filepath=":memory:"):
+        # Processors may be prepared and processed in different threads
+        self.connection = sqlite3.connect(db_filepath, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            if self._get_info("version") != str(LEDGER_FORMAT_VERSION):
+                self.connection.execute("DELETE FROM prepay_debits")
+                self.connection.execute("DELETE FROM ledger_info")
+                self._set_info("version", str(LEDGER_FORMAT_VERSION))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _debit_to_minor_units(debit) -> int:
+        """Converts a debit to minor units, raising a `ValueError` for debits
+        finer than the minor unit rather than rounding them"""
+        minor_units = Decimal(str(debit)).scaleb(money.BALANCE_SCALE)
+        if minor_units != minor_units.to_integral_value():
+            raise ValueError(f"Prepay debit {debit} is not a whole number of cents")
+        return int(minor_units)
+
+    def _get_info(self, key) -> str | None:
+        row = self.connection.execute(
+            "SELECT value FROM ledger_info WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_info(self, key, value):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO ledger_info (key, value) VALUES (?, ?)",
+            (key, value),
+        )
+
+    @classmethod
+    def from_csv(cls, csv_filepath, db_filepath=":memory:") -> "PrepayDebitLedger":
+        ledger = cls(db_filepath)
+        csv_hash = input_cache.get_file_hash(csv_filepath)
+        if ledger._get_info("csv_hash") == csv_hash:
+            logger.info(f"Prepay debit ledger {db_filepath} is up to date")
+            return ledger
+
+        debits = pandas.read_csv(csv_filepath, dtype=str)
+        duplicates = debits[
+            debits.duplicated(
+                [invoice.PREPAY_MONTH_FIELD, invoice.PREPAY_GROUP_NAME_FIELD]
+            )
+        ]
+        if not duplicates.empty:
+            logger.warning(
+                f"Prepay debits file {csv_filepath} has more than one debit for the same month and group, keeping the last of {duplicates[_DEBIT_COLUMNS[:2]].values.tolist()}"
+            )
+
+        extra_columns = debits.columns.difference(_DEBIT_COLUMNS, sort=False)
+        with ledger.connection:
+            ledger.connection.execute("DELETE FROM prepay_debits")
+            ledger.connection.executemany(
+                "INSERT INTO prepay_debits VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (month, group_name) DO UPDATE"
+                " SET debit = excluded.debit, extra_values = excluded.extra_values",
+                zip(
+                    debits[invoice.PREPAY_MONTH_FIELD],
+                    map(util.get_month_ordinal, debits[invoice.PREPAY_MONTH_FIELD]),
+                    debits[invoice.PREPAY_GROUP_NAME_FIELD],
+                    map(
+                        ledger._debit_to_minor_units, debits[invoice.PREPAY_DEBIT_FIELD]
+                    ),
+                    # Listed by row, since a frame of no columns has no records
+                    (
+                        json.dumps(dict(zip(extra_columns, values)))
+                        for values in debits[extra_columns].fillna("").values.tolist()
+                    ),
+                ),
+            )
+            ledger._set_info("columns", json.dumps(list(debits.columns)))
+            ledger._set_info("csv_hash", csv_hash)
+        return ledger
+
+    def get_group_debits_before(self, month) -> pandas.Series:
+        """Returns the sum of each group's debits before `month`, in minor units"""
+        rows = self.connection.execute(
+            "SELECT group_name, SUM(debit) FROM prepay_debits"
+            " WHERE month_ordinal < ? GROUP BY group_name",
+            (util.get_month_ordinal(month),),
+        ).fetchall()
+        return pandas.Series(dict(rows), dtype="int64")
+
+    def upsert_debits(self, month, group_debits: dict[str, Decimal]):
+        """Sets the debit of each group for `month`, overwriting the debits
+        of a previous run for the same month"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO prepay_debits (month, month_ordinal, group_name, debit)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (month, group_name) DO UPDATE SET debit = excluded.debit",
+                [
+                    (
+                        month,
+                        util.get_month_ordinal(month),
+                        group_name,
+                        self._debit_to_minor_units(debit),
+                    )
+                    for group_name, debit in group_debits.items()
+                ],
+            )
+            # The ledger differs from the CSV it was loaded from until exported
+            self.connection.execute("DELETE FROM ledger_info WHERE key = 'csv_hash'")
+
+    def _get_columns(self) -> list[str]:
+        """Returns the columns of the debits CSV, in order"""
+        columns = self._get_info("columns")
+        return json.loads(columns) if columns else _DEBIT_COLUMNS
+
+    def _iter_debits(self, columns):
+        for month, group_name, debit, extra_values in self.connection.execute(
+            "SELECT month, group_name, debit, extra_values FROM prepay_debits"
+            " ORDER BY rowid"
+        ):
+            values = json.loads(extra_values) | {
+                invoice.PREPAY_MONTH_FIELD: month,
+                invoice.PREPAY_GROUP_NAME_FIELD: group_name,
+                invoice.PREPAY_DEBIT_FIELD: Decimal(debit).scaleb(-money.BALANCE_SCALE),
+            }
+            yield [values.get(column, "") for column in columns]
+
+    def to_dataframe(self) -> pandas.DataFrame:
+        columns = self._get_columns()
+        return pandas.DataFrame(
+            list(self._iter_debits(columns)), columns=columns
+        ).astype({invoice.PREPAY_DEBIT_FIELD: money.DECIMAL_BALANCE_FIELD_TYPE})
+
+    def export_csv(self, csv_filepath):
+        """Writes a snapshot of the ledger as a debits CSV"""
+        columns = self._get_columns()
+        with open(csv_filepath, "w", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(columns)
+            writer.writerows(self._iter_debits(columns))
+        with self.connection:
+            self._set_info("csv_hash", input_cache.get_file_hash(csv_filepath))
@@ -1,12 +1,16 @@
 import sys
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas
+import pyarrow
+import pyarrow.csv
 
 from process_report.settings import invoice_settings
 from process_report.loader import loader
-from process_report import util
+from process_report import util, input_cache, scheduler, export_executor, money
 from process_report.invoices import (
     invoice,
     lenovo_invoice,
@@ -47,6 +51,38 @@ PROCESSING_ORDER = [
     prepayment_processor.PrepaymentProcessor,
 ]
 
+INVOICE_LIST = [
+    lenovo_invoice.LenovoInvoice,
+    nonbillable_invoice.NonbillableInvoice,
+    billable_invoice.BillableInvoice,
+    NERC_total_invoice.NERCTotalInvoice,
+    bu_internal_invoice.BUInternalInvoice,
+    pi_specific_invoice.PIInvoice,
+    MOCA_prepaid_invoice.MOCAPrepaidInvoice,
+    prepay_credits_snapshot.PrepayCreditsSnapshot,
+    ocp_test_invoice.OcpTestInvoice,
+]
+
+# Columns of the input invoices and their types
+INPUT_INVOICE_COLUMNS = [
+    invoice.INVOICE_DATE_COLUMN,
+    invoice.PROJECT_COLUMN,
+    invoice.PROJECT_ID_COLUMN,
+    invoice.PI_COLUMN,
+    invoice.CLUSTER_NAME_COLUMN,
+    invoice.INVOICE_EMAIL_COLUMN,
+    invoice.INVOICE_ADDRESS_COLUMN,
+    invoice.INSTITUTION_COLUMN,
+    invoice.INSTITUTION_ID_COLUMN,
+    invoice.SU_HOURS_COLUMN,
+    invoice.SU_TYPE_COLUMN,
+    invoice.RATE_COLUMN,
+    invoice.COST_COLUMN,
+]
+
+# Same missing value markers `pandas.read_csv` uses
+CSV_NULL_VALUES = pyarrow.csv.ConvertOptions().null_values + ["<NA>", "None"]
+
 
 PI_S3_FILEPATH = "PIs/PI.csv"
 ALIAS_S3_FILEPATH = "PIs/alias.csv"
@@ -72,7 +108,7 @@ def main():
 
     invoice_month = invoice_settings.invoice_month
 
-    merged_dataframe = merge_csv(loader.get_csv_invoice_filepath_list())
+    merged_dataframe = load_merged_input(invoice_month)
 
     logger.info("Invoice date: " + str(invoice_month))
     logger.info("The following timed-projects will not be billed for this period: ")
@@ -87,72 +123,163 @@ def main():
     process_and_export_invoices(
         invoice_month,
         processed_data,
-        [
-            lenovo_invoice.LenovoInvoice,
-            nonbillable_invoice.NonbillableInvoice,
-            billable_invoice.BillableInvoice,
-            NERC_total_invoice.NERCTotalInvoice,
-            bu_internal_invoice.BUInternalInvoice,
-            pi_specific_invoice.PIInvoice,
-            MOCA_prepaid_invoice.MOCAPrepaidInvoice,
-            prepay_credits_snapshot.PrepayCreditsSnapshot,
-            ocp_test_invoice.OcpTestInvoice,
-        ],
+        INVOICE_LIST,
         invoice_settings.upload_to_s3,
     )
 
 
-def merge_csv(files):
-    """Merge multiple CSV files and return a single pandas dataframe"""
-    dataframes = []
-    for file in files:
-        dataframe = pandas.read_csv(
-            file,
-            engine="pyarrow",
-            dtype={
-                invoice.INVOICE_DATE_COLUMN.name: invoice.INVOICE_DATE_COLUMN.dtype,
-                invoice.PROJECT_COLUMN.name: invoice.PROJECT_COLUMN.dtype,
-                invoice.PROJECT_ID_COLUMN.name: invoice.PROJECT_ID_COLUMN.dtype,
-                invoice.PI_COLUMN.name: invoice.PI_COLUMN.dtype,
-                invoice.CLUSTER_NAME_COLUMN.name: invoice.CLUSTER_NAME_COLUMN.dtype,
-                invoice.INVOICE_EMAIL_COLUMN.name: invoice.INVOICE_EMAIL_COLUMN.dtype,
-                invoice.INVOICE_ADDRESS_COLUMN.name: invoice.INVOICE_ADDRESS_COLUMN.dtype,
-                invoice.INSTITUTION_COLUMN.name: invoice.INSTITUTION_COLUMN.dtype,
-                invoice.INSTITUTION_ID_COLUMN.name: invoice.INSTITUTION_ID_COLUMN.dtype,
-                invoice.SU_HOURS_COLUMN.name: invoice.SU_HOURS_COLUMN.dtype,
-                invoice.SU_TYPE_COLUMN.name: invoice.SU_TYPE_COLUMN.dtype,
-                invoice.RATE_COLUMN.name: invoice.RATE_COLUMN.dtype,
-                invoice.COST_COLUMN.name: invoice.COST_COLUMN.dtype,
+def _read_csv_invoice(file) -> pyarrow.Table:
+    """Parse a CSV invoice into an Arrow table, with columns cast to their `InvoiceColumn` types.
+
+    String columns are read as text, while numeric columns are inferred
+    first and cast afterwards, which accepts values such as "1.0" for
+    integer columns or costs with more than 2 decimal places"""
+    start_time = time.perf_counter()
+    table = pyarrow.csv.read_csv(
+        file,
+        parse_options=pyarrow.csv.ParseOptions(quote_char="|"),
+        convert_options=pyarrow.csv.ConvertOptions(
+            column_types={
+                column.name: pyarrow.string()
+                for column in INPUT_INVOICE_COLUMNS
+                if column.dtype == invoice.STRING_FIELD_TYPE
             },
-            quotechar="|",
+            null_values=CSV_NULL_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+
+    # Money columns are parsed as decimals, and converted to their internal
+    # representation once the invoices are merged
+    input_column_types = {
+        column.name: money.get_decimal_type(invoice.MONEY_FIELD_SCALES[column.name])
+        if column.name in invoice.MONEY_FIELD_SCALES
+        else _get_arrow_type(column.dtype)
+        for column in INPUT_INVOICE_COLUMNS
+    }
+    schema = table.schema
+    for i, field in enumerate(schema):
+        if field.name in input_column_types:
+            schema = schema.set(i, field.with_type(input_column_types[field.name]))
+        elif pyarrow.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pyarrow.float64()))
+    table = table.cast(schema)
+
+    logger.info(
+        f"Parsed {table.num_rows} rows from {file} in {time.perf_counter() - start_time:.2f}s"
+    )
+    return table
+
+
+def _get_arrow_type(dtype) -> pyarrow.DataType:
+    if isinstance(dtype, pandas.ArrowDtype):
+        return dtype.pyarrow_dtype
+    return pyarrow.string()
+
+
+def _arrow_table_to_dataframe(table: pyarrow.Table) -> pandas.DataFrame:
+    """Converts the merged table to a dataframe. Arrow-backed columns are
+    wrapped without copying"""
+    input_column_dtypes = {
+        column.name: column.dtype for column in INPUT_INVOICE_COLUMNS
+    }
+    columns = dict()
+    for name, column in zip(table.column_names, table.columns):
+        dtype = input_column_dtypes.get(name)
+        if isinstance(dtype, pandas.ArrowDtype):
+            columns[name] = pandas.Series(
+                pandas.arrays.ArrowExtensionArray(column), copy=False
+            )
+        elif dtype is not None:
+            columns[name] = column.to_pandas(types_mapper={column.type: dtype}.get)
+        else:
+            columns[name] = column.to_pandas()
+
+    return pandas.DataFrame(columns)
+
+
+def _merge_csv_tables(files) -> pyarrow.Table:
+    with ThreadPoolExecutor() as executor:
+        tables = list(executor.map(_read_csv_invoice, files))
+
+    merged_table = pyarrow.concat_tables(tables, promote_options="permissive")
+    merged_table = money.table_to_internal(merged_table, invoice.MONEY_FIELD_SCALES)
+    logger.info(f"Merged {merged_table.num_rows} rows from {len(tables)} invoices")
+    return merged_table
+
+
+def merge_csv(files):
+    """Merge multiple CSV files and return a single pandas dataframe
+
+    Files are parsed concurrently and concatenated as Arrow tables, so the
+    data is only converted to pandas once"""
+    return _arrow_table_to_dataframe(_merge_csv_tables(files))
+
+
+def load_merged_input(invoice_month) -> pandas.DataFrame:
+    """Fetch and merge the input invoices.
+
+    If the input cache is enabled and the source invoices are unchanged since
+    they were last merged, both the download and parsing are skipped"""
+    cache = None
+    if invoice_settings.input_cache_enabled:
+        cache = input_cache.InputCache(invoice_settings.input_cache_dir, invoice_month)
+        cache.evict(invoice_settings.input_cache_retention_months)
+        cache_key = cache.get_cache_key(
+            loader.get_csv_invoice_fingerprints(),
+            [(column.name, column.dtype) for column in INPUT_INVOICE_COLUMNS],
         )
-        dataframes.append(dataframe)
+        merged_table = cache.load(cache_key)
+        if merged_table is not None:
+            if invoice_settings.fetch_from_s3:
+                loader.prefetch_s3_files(include_service_invoices=False)
+            return _arrow_table_to_dataframe(merged_table)
 
-    merged_dataframe = pandas.concat(dataframes, ignore_index=True)
-    merged_dataframe.reset_index(drop=True, inplace=True)
-    return merged_dataframe
+    if invoice_settings.fetch_from_s3:
+        loader.prefetch_s3_files()
+    merged_table = _merge_csv_tables(loader.get_csv_invoice_filepath_list())
+    if cache:
+        cache.save(cache_key, merged_table)
+    return _arrow_table_to_dataframe(merged_table)
 
 
 def process_merged_dataframe(
     invoice_month, dataframe: pandas.DataFrame, processors: list
 ) -> pandas.DataFrame:
-    for processor in processors:
-        proc_instance = processor(name="", invoice_month=invoice_month, data=dataframe)
-        proc_instance.process()
-        dataframe = proc_instance.data
-    return dataframe
+    processor_scheduler = scheduler.ProcessorScheduler(
+        processors,
+        max_workers=invoice_settings.processor_workers,
+        debug=invoice_settings.processor_debug,
+    )
+    return processor_scheduler.run(invoice_month, dataframe)
+
+
+def create_invoices(invoice_month, processed_data, invoice_list) -> list:
+    """Creates an instance of each invoice class, each with its own copy of the data"""
+    # Invoices with their own internal export concurrency
+    invoice_export_workers = {
+        pi_specific_invoice.PIInvoice: invoice_settings.pi_invoice_export_workers,
+    }
+
+    invoices = []
+    for inv in invoice_list:
+        inv_kwargs = dict()
+        if inv in invoice_export_workers:
+            inv_kwargs["export_workers"] = invoice_export_workers[inv]
+        invoices.append(
+            inv(invoice_month=invoice_month, data=processed_data.copy(), **inv_kwargs)
+        )
+    return invoices
 
 
 def process_and_export_invoices(
     invoice_month, processed_data, invoice_list, upload_to_s3
 ):
-    for inv in invoice_list:
-        inv_instance = inv(invoice_month=invoice_month, data=processed_data)
-        inv_instance.process()
-        inv_instance.export()
-        if upload_to_s3:
-            bucket = util.get_invoice_bucket()
-            inv_instance.export_s3(bucket)
+    invoices = create_invoices(invoice_month, processed_data, invoice_list)
+    bucket = util.get_invoice_bucket() if upload_to_s3 else None
+    export_executor.export_invoices(
+        invoices, bucket, max_workers=invoice_settings.invoice_export_workers
+    )
 
 
 def backup_to_s3_old_pi_file(old_pi_file):
@@ -1,8 +1,6 @@
 from dataclasses import dataclass
 import logging
 
-import pandas
-
 from process_report.invoices import invoice
 from process_report.processors import processor
 from process_report import util
@@ -22,7 +20,7 @@ class AddInstitutionProcessor(processor.Processor):
 
     def _add_institution(self):
         """Determine every PI's institution name, logging any PI whose institution cannot be determined
-        This is performed by `get_institution_from_pi()`, which tries to match the PI's username to
+        This is performed by `get_institutions_from_pis()` for each unique PI, which tries to match the PI's username to
         a list of known institution email domains (i.e bu.edu), or to several edge cases (i.e rudolph) if
         the username is not an email address.
 
@@ -34,14 +32,21 @@ class AddInstitutionProcessor(processor.Processor):
         """
         institute_list = util.load_institute_list()
         self.data = self.data.astype({invoice.INSTITUTION_FIELD: "str"})
-        for i, row in self.data.iterrows():
-            pi_name = row[invoice.PI_FIELD]
-            if pandas.isna(pi_name):
-                logger.info(f"Project {row[invoice.PROJECT_FIELD]} has no PI")
-            else:
-                self.data.at[i, invoice.INSTITUTION_FIELD] = (
-                    institute_list.get_institution_from_pi(pi_name)
-                )
+
+        # PIs appear on many rows, so each PI is only resolved once
+        pi_names = self.data[invoice.PI_FIELD]
+        has_pi = pi_names.notna()
+        if not has_pi.all():
+            logger.info(
+                f"Projects {list(self.data.loc[~has_pi, invoice.PROJECT_FIELD].unique())} have no PI"
+            )
+
+        institutions = institute_list.get_institutions_from_pis(
+            pi_names[has_pi].unique()
+        )
+        self.data.loc[has_pi, invoice.INSTITUTION_FIELD] = pi_names[has_pi].map(
+            institutions
+        )
 
     def _process(self):
         self._add_institution()
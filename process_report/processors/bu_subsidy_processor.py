@@ -1,5 +1,6 @@
 from dataclasses import dataclass, field
 
+from process_report import util
 from process_report.loader import loader
 from process_report.invoices import invoice
 from process_report.processors import discount_processor
@@ -24,14 +25,9 @@ class BUSubsidyProcessor(discount_processor.DiscountProcessor):
     subsidy_amount: int = field(default_factory=loader.get_bu_subsidy_amount)
 
     def _prepare(self):
-        def get_project(row):
-            project_alloc = row[invoice.PROJECT_FIELD]
-            if project_alloc.rfind("-") == -1:
-                return project_alloc
-            else:
-                return project_alloc[: project_alloc.rfind("-")]
-
-        self.data[invoice.PROJECT_NAME_FIELD] = self.data.apply(get_project, axis=1)
+        self.data[invoice.PROJECT_NAME_FIELD] = util.get_project_names(
+            self.data[invoice.PROJECT_FIELD]
+        )
 
     def _process(self):
         self.data = self._apply_subsidy(self.data, self.subsidy_amount)
@@ -51,17 +47,14 @@ class BUSubsidyProcessor(discount_processor.DiscountProcessor):
         subsidy_eligible_projects = self._get_subsidy_eligible_projects(dataframe)
         pi_list = subsidy_eligible_projects[invoice.PI_FIELD].unique()
 
-        for pi in pi_list:
-            pi_projects = subsidy_eligible_projects[
-                subsidy_eligible_projects[invoice.PI_FIELD] == pi
-            ]
-            self.apply_flat_discount(
-                dataframe,
-                pi_projects,
-                invoice.PI_BALANCE_FIELD,
-                subsidy_amount,
-                invoice.SUBSIDY_FIELD,
-                invoice.BALANCE_FIELD,
-            )
+        self.apply_grouped_flat_discount(
+            dataframe,
+            subsidy_eligible_projects,
+            invoice.PI_FIELD,
+            {pi: subsidy_amount for pi in pi_list},
+            invoice.PI_BALANCE_FIELD,
+            invoice.SUBSIDY_FIELD,
+            invoice.BALANCE_FIELD,
+        )
 
         return dataframe
@@ -8,7 +8,9 @@ from dataclasses import dataclass, field
 import requests
 import pandas
 
+from process_report import coldfront_api
 from process_report.loader import loader
+from process_report.nonbillable_matcher import NonbillableProjectMatcher
 from process_report.settings import invoice_settings
 from process_report.invoices import invoice
 from process_report.processors import (
@@ -29,8 +31,8 @@ CF_ATTR_IS_COURSE = "Is Course?"
 
 @dataclass
 class ColdfrontFetchProcessor(processor.Processor):
-    nonbillable_projects: pandas.DataFrame = field(
-        default_factory=loader.get_nonbillable_projects
+    nonbillable_project_matcher: NonbillableProjectMatcher = field(
+        default_factory=loader.get_nonbillable_project_matcher
     )
     coldfront_data_filepath: str = invoice_settings.coldfront_api_filepath
 
@@ -45,7 +47,7 @@ class ColdfrontFetchProcessor(processor.Processor):
     )
 
     @functools.cached_property
-    def coldfront_client(self):
+    def coldfront_client(self) -> coldfront_api.ColdfrontClient:
         keycloak_url = os.environ.get("KEYCLOAK_URL", "https://keycloak.mss.mghpcc.org")
 
         # Authenticate with Keycloak
@@ -57,6 +59,7 @@ class ColdfrontFetchProcessor(processor.Processor):
                 os.environ["KEYCLOAK_CLIENT_ID"],
                 os.environ["KEYCLOAK_CLIENT_SECRET"],
             ),
+            timeout=invoice_settings.coldfront_timeout,
         )
         try:
             r.raise_for_status()
@@ -65,18 +68,39 @@ class ColdfrontFetchProcessor(processor.Processor):
 
         client_token = r.json()["access_token"]
 
-        session = requests.session()
+        session = coldfront_api.get_session(
+            max_workers=invoice_settings.coldfront_fetch_workers,
+            max_attempts=invoice_settings.coldfront_max_attempts,
+        )
         headers = {
             "Authorization": f"Bearer {client_token}",
             "Content-Type": "application/json",
         }
         session.headers.update(headers)
-        return session
+
+        cache = None
+        if invoice_settings.coldfront_cache_enabled:
+            cache = coldfront_api.ColdfrontCache(
+                invoice_settings.coldfront_cache_dir, self.invoice_month
+            )
+
+        coldfront_api_url = os.environ.get(
+            "COLDFRONT_URL", "https://coldfront.mss.mghpcc.org/api/allocations"
+        )
+        return coldfront_api.ColdfrontClient(
+            coldfront_api_url,
+            session,
+            page_size=invoice_settings.coldfront_page_size,
+            max_workers=invoice_settings.coldfront_fetch_workers,
+            timeout=invoice_settings.coldfront_timeout,
+            cache=cache,
+            cache_max_age=invoice_settings.coldfront_cache_max_age,
+        )
 
     def _get_billable_projects_clusters(self) -> set[str]:
         """Returns set of billable project and cluster name tuples."""
         project_mask = validate_billable_pi_processor.find_billable_projects(
-            self.data, self.nonbillable_projects
+            self.data, self.nonbillable_project_matcher
         )
 
         return set(
@@ -86,12 +110,7 @@ class ColdfrontFetchProcessor(processor.Processor):
         )
 
     def _fetch_coldfront_allocation_api(self):
-        coldfront_api_url = os.environ.get(
-            "COLDFRONT_URL", "https://coldfront.mss.mghpcc.org/api/allocations"
-        )
-        r = self.coldfront_client.get(f"{coldfront_api_url}?all=true")
-
-        return r.json()
+        return self.coldfront_client.get_allocations()
 
     def _get_coldfront_api_data(self):
         if self.coldfront_data_filepath:
@@ -118,8 +137,8 @@ class ColdfrontFetchProcessor(processor.Processor):
                     CF_ATTR_INSTITUTION_SPECIFIC_CODE, "N/A"
                 )
                 cluster_name = project_dict["resource"]["name"]
-                cluster_name = validate_cluster_name_processor.ValidateClusterNameProcessor.CLUSTER_NAME_MAP.get(
-                    cluster_name, cluster_name
+                cluster_name = validate_cluster_name_processor.ValidateClusterNameProcessor.get_canonical_cluster_name(
+                    cluster_name
                 )
                 is_course = (
                     project_dict["attributes"].get(CF_ATTR_IS_COURSE, "No").lower()
@@ -153,17 +172,58 @@ class ColdfrontFetchProcessor(processor.Processor):
             )
 
     def _apply_allocation_data(self, allocation_data):
-        for project_cluster_tuple, data in allocation_data.items():
-            project_id, cluster_name = project_cluster_tuple
-            mask = (self.data[invoice.PROJECT_ID_FIELD] == project_id) & (
-                self.data[invoice.CLUSTER_NAME_FIELD] == cluster_name
+        """Joins the allocation data onto the invoice rows by (project ID, cluster name).
+
+        Rows without a matching allocation keep their values"""
+        allocation_columns = [
+            invoice.PROJECT_FIELD,
+            invoice.PI_FIELD,
+            invoice.INSTITUTION_ID_FIELD,
+            invoice.IS_COURSE_FIELD,
+        ]
+        allocations = pandas.DataFrame(
+            list(allocation_data.values()), columns=allocation_columns
+        )
+
+        # Clusters are joined on the codes of the invoice's cluster categories.
+        # Allocations in clusters absent from the invoice cannot match any row
+        clusters = self.data[invoice.CLUSTER_NAME_FIELD].astype("category")
+        allocation_cluster_codes = clusters.cat.categories.get_indexer(
+            [cluster_name for _, cluster_name in allocation_data]
+        )
+        in_invoice_clusters = allocation_cluster_codes != -1
+        allocations = allocations[in_invoice_clusters]
+        allocation_keys = pandas.MultiIndex.from_arrays(
+            [
+                [project_id for project_id, _ in allocation_data],
+                allocation_cluster_codes,
+            ]
+        )[in_invoice_clusters]
+
+        row_allocations = allocation_keys.get_indexer(
+            pandas.MultiIndex.from_arrays(
+                [self.data[invoice.PROJECT_ID_FIELD], clusters.cat.codes]
             )
-            self.data.loc[mask, invoice.PROJECT_FIELD] = data[invoice.PROJECT_FIELD]
-            self.data.loc[mask, invoice.PI_FIELD] = data[invoice.PI_FIELD]
-            self.data.loc[mask, invoice.INSTITUTION_ID_FIELD] = data[
-                invoice.INSTITUTION_ID_FIELD
+        )
+        matched_rows = row_allocations != -1
+        for column in allocation_columns:
+            self.data.loc[matched_rows, column] = allocations[column].to_numpy()[
+                row_allocations[matched_rows]
             ]
-            self.data.loc[mask, invoice.IS_COURSE_FIELD] = data[invoice.IS_COURSE_FIELD]
+
+        if not matched_rows.all():
+            unmatched_allocations = sorted(
+                set(
+                    self.data.loc[
+                        ~matched_rows,
+                        [invoice.PROJECT_ID_FIELD, invoice.CLUSTER_NAME_FIELD],
+                    ].itertuples(index=False, name=None)
+                ),
+                key=str,
+            )
+            logger.info(
+                f"{(~matched_rows).sum()} rows of {len(unmatched_allocations)} project allocations not found in Coldfront: {unmatched_allocations}"
+            )
 
     def _process(self):
         api_data = self._get_coldfront_api_data()
@@ -1,5 +1,7 @@
+import numpy
 import pandas
 
+from process_report import money
 from process_report.processors import processor
 
 
@@ -28,6 +30,58 @@ class DiscountProcessor(processor.Processor):
         will change the provided `invoice` Dataframe directly. Therefore, it does
         not return the changed invoice.
 
+        This is a single-group convenience wrapper around `apply_grouped_flat_discount`.
+        Processors applying the same kind of discount to many PIs or groups
+        should call `apply_grouped_flat_discount` once instead.
+
+        Returns the amount of discount used.
+
+        :param invoice: Dataframe containing all projects
+        :param pi_projects: A subset of `invoice`, containing all projects for a PI you want to apply the discount
+        :param pi_balance_field: Name of the field of the PI balance
+        :param discount_amount: The discount given to the PI
+        :param discount_field: Name of the field to put the discount amount applied to each project
+        :param balance_field: Name of the NERC balance field
+        :param code_field: Name of the discount code field
+        :param discount_code: Code of the discount
+        """
+        discount_used = self.apply_grouped_flat_discount(
+            invoice,
+            pi_projects,
+            pandas.Series(0, index=pi_projects.index),
+            {0: discount_amount},
+            pi_balance_field,
+            discount_field,
+            balance_field,
+            code_field,
+            discount_code,
+        )
+        return discount_used.iat[0]
+
+    def apply_grouped_flat_discount(
+        self,
+        invoice: pandas.DataFrame,
+        eligible_projects: pandas.DataFrame,
+        group_keys: pandas.Series | str,
+        discount_amounts: dict | pandas.Series,
+        pi_balance_field: str,
+        discount_field: str,
+        balance_field: str,
+        code_field: str = None,
+        discount_code: str = None,
+    ) -> pandas.Series:
+        """
+        Takes in an invoice and a subset of its projects, split into groups (i.e PIs
+        or prepay groups), and applies each group's flat discount to that group's
+        projects. Note that this function will change the provided `invoice`
+        Dataframe directly.
+
+        Within a group, projects are discounted in the order they appear in
+        `eligible_projects`, each project receiving as much of the remaining
+        discount as its PI balance allows, until the discount runs out. This is
+        computed for every project at once as a per-group cumulative sum of the
+        PI balances, clipped against the group's discount amount.
+
         This function assumes that the balance field shows the remaining cost of the project,
         or what the PI would pay before the flat discount is applied.
 
@@ -35,51 +89,89 @@ class DiscountProcessor(processor.Processor):
         `discount_code` will be comma-APPENDED to the `code_field` of projects where
         the discount is applied
 
-        Returns the amount of discount used.
+        Returns a decimal Series, indexed by group, of the amount of discount
+        used by every group in `discount_amounts`.
+
+        Amounts are computed on int64 minor units (i.e cents), so that grouped
+        cumulative sums stay exact and run on native integer kernels.
 
         :param invoice: Dataframe containing all projects
-        :param pi_projects: A subset of `invoice`, containing all projects for a PI you want to apply the discount
+        :param eligible_projects: A subset of `invoice`, containing all projects you want to apply the discounts to
+        :param group_keys: Series aligned with `eligible_projects`, or name of its column, identifying each project's group
+        :param discount_amounts: Mapping of group to the discount given to the group, in dollars, or a Series of them in the invoice's money dtype
         :param pi_balance_field: Name of the field of the PI balance
-        :param discount_amount: The discount given to the PI
         :param discount_field: Name of the field to put the discount amount applied to each project
         :param balance_field: Name of the NERC balance field
         :param code_field: Name of the discount code field
         :param discount_code: Code of the discount
         """
+        if isinstance(group_keys, str):
+            group_keys = eligible_projects[group_keys]
+        if isinstance(discount_amounts, pandas.Series) and (
+            discount_amounts.dtype != object
+        ):
+            budgets = pandas.Series(
+                money.to_minor_units(discount_amounts), index=discount_amounts.index
+            )
+        else:
+            discount_amounts = pandas.Series(discount_amounts, dtype=object)
+            budgets = pandas.Series(
+                [money.amount_to_minor_units(amount) for amount in discount_amounts],
+                index=discount_amounts.index,
+                dtype="int64",
+            )
+        group_budgets = group_keys.map(budgets)
+        has_budget = group_budgets.notna().to_numpy()
+        eligible_projects = eligible_projects[has_budget]
+        group_keys = group_keys[has_budget]
+        group_budgets = group_budgets[has_budget].to_numpy(dtype="int64")
+
+        group_codes, group_uniques = pandas.factorize(group_keys)
+        balances = pandas.Series(
+            money.to_minor_units(eligible_projects[pi_balance_field]),
+            index=eligible_projects.index,
+        )
+        cumulative_balances = balances.groupby(group_codes).cumsum()
+        previous_balances = (cumulative_balances - balances).to_numpy()
+
+        # A project is reached if the discount has not run out on any previous
+        # project of its group. The running maximum is needed since negative
+        # balances can make the cumulative sum decrease
+        previous_max_balances = (
+            cumulative_balances.groupby(group_codes)
+            .cummax()
+            .groupby(group_codes)
+            .shift(1, fill_value=numpy.iinfo(numpy.int64).min)
+            .to_numpy()
+        )
+        is_reached = (group_budgets > 0) & (previous_max_balances < group_budgets)
+        applied_discounts = numpy.where(
+            is_reached,
+            numpy.minimum(balances.to_numpy(), group_budgets - previous_balances),
+            0,
+        )
+
+        reached_index = eligible_projects.index[is_reached]
+        reached_discounts = applied_discounts[is_reached]
+
+        def _add_to_field(field, amounts):
+            current = money.to_minor_units(invoice.loc[reached_index, field].fillna(0))
+            invoice.loc[reached_index, field] = money.from_minor_units(
+                current + amounts, reached_index
+            ).astype(invoice[field].dtype)
+
+        _add_to_field(discount_field, reached_discounts)
+        _add_to_field(pi_balance_field, -reached_discounts)
+        if self.IS_DISCOUNT_BY_NERC:
+            _add_to_field(balance_field, -reached_discounts)
+
+        if code_field and discount_code:
+            codes = invoice.loc[reached_index, code_field]
+            invoice.loc[reached_index, code_field] = (
+                codes + "," + discount_code
+            ).fillna(discount_code)
 
-        def apply_discount_on_project(remaining_discount_amount, project_i, project):
-            remaining_project_balance = project[pi_balance_field]
-            applied_discount = min(remaining_project_balance, remaining_discount_amount)
-
-            if pandas.isna(invoice.at[project_i, discount_field]):
-                invoice.at[project_i, discount_field] = applied_discount
-            else:
-                invoice.at[project_i, discount_field] += applied_discount
-
-            invoice.at[project_i, pi_balance_field] -= applied_discount
-            if self.IS_DISCOUNT_BY_NERC:
-                invoice.at[project_i, balance_field] -= applied_discount
-            remaining_discount_amount -= applied_discount
-            return remaining_discount_amount
-
-        def apply_credit_code_on_project(project_i):
-            if code_field and discount_code:
-                if pandas.isna(invoice.at[project_i, code_field]):
-                    invoice.at[project_i, code_field] = discount_code
-                else:
-                    invoice.at[project_i, code_field] = (
-                        invoice.at[project_i, code_field] + "," + discount_code
-                    )
-
-        remaining_discount_amount = discount_amount
-        for i, row in pi_projects.iterrows():
-            if remaining_discount_amount == 0:
-                break
-            else:
-                remaining_discount_amount = apply_discount_on_project(
-                    remaining_discount_amount, i, row
-                )
-                apply_credit_code_on_project(i)
-
-        discount_used = discount_amount - remaining_discount_amount
-        return discount_used
+        discount_used = pandas.Series(applied_discounts).groupby(group_codes).sum()
+        discount_used.index = group_uniques[discount_used.index]
+        discount_used = discount_used.reindex(budgets.index, fill_value=0)
+        return money.minor_units_to_decimal(discount_used.to_numpy(), budgets.index)
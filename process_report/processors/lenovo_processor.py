@@ -1,5 +1,12 @@
 from dataclasses import dataclass, field
+from decimal import Decimal
 
+import numpy
+import pandas
+import pyarrow
+import pyarrow.compute
+
+from process_report import money
 from process_report.loader import loader
 from process_report.invoices import invoice
 from process_report.processors import processor
@@ -16,16 +23,43 @@ class LenovoProcessor(processor.Processor):
         invoice.SU_HOURS_COLUMN,
     )
 
-    def _apply_su_charge(self, data):
+    def _get_su_charge(self, su_type) -> Decimal:
         for su_name, su_charge in self.su_charge_info.items():
-            if su_name in data:
-                return su_charge
-        return 0
+            if su_name in su_type:
+                return Decimal(str(su_charge))
+        return Decimal(0)
+
+    def _get_su_charges(self, su_types: pandas.Series) -> pyarrow.Array:
+        """Returns the exact charge of each row's SU type, as decimals at the rate scale.
+
+        Charges are looked up once per distinct SU type, and broadcast back
+        to the rows by their factorized codes"""
+        codes, distinct_su_types = pandas.factorize(su_types)
+        # Rows without an SU type take the appended 0
+        distinct_su_charges = pyarrow.array(
+            [self._get_su_charge(su_type) for su_type in distinct_su_types]
+            + [Decimal(0)],
+            money.get_decimal_type(money.RATE_SCALE),
+        )
+        return distinct_su_charges.take(
+            numpy.where(codes == -1, len(distinct_su_types), codes)
+        )
 
     def _process(self):
-        self.data[invoice.SU_CHARGE_FIELD] = self.data[invoice.SU_TYPE_FIELD].apply(
-            self._apply_su_charge
+        su_charges = self._get_su_charges(self.data[invoice.SU_TYPE_FIELD])
+        # Any int64 fits 19 digits, and the product needs more than decimal128
+        # holds. Charges are exact, at the scale of the SU charges
+        su_hours = pyarrow.array(
+            self.data[invoice.SU_HOURS_FIELD].astype(money.MINOR_UNITS_FIELD_TYPE).array
+        ).cast(pyarrow.decimal256(19, 0))
+        lenovo_charges = pyarrow.compute.multiply(
+            su_hours,
+            su_charges.cast(pyarrow.decimal256(money.PRECISION, money.RATE_SCALE)),
+        )
+
+        self.data[invoice.SU_CHARGE_FIELD] = money.decimals_to_internal(
+            su_charges, self.data.index, money.RATE_SCALE
         )
-        self.data[invoice.LENOVO_CHARGE_FIELD] = (
-            self.data[invoice.SU_HOURS_FIELD] * self.data[invoice.SU_CHARGE_FIELD]
+        self.data[invoice.LENOVO_CHARGE_FIELD] = money.decimals_to_internal(
+            lenovo_charges, self.data.index, money.RATE_SCALE
         )
@@ -7,7 +7,7 @@ import pyarrow
 
 from process_report.settings import invoice_settings
 from process_report.loader import loader
-from process_report import util
+from process_report import money, util
 from process_report.invoices import invoice
 from process_report.processors import discount_processor
 
@@ -78,68 +78,77 @@ class NewPICreditProcessor(discount_processor.DiscountProcessor):
         return old_pi_df
 
     @staticmethod
-    def _get_pi_age(old_pi_df: pandas.DataFrame, pi, invoice_month):
-        """Returns time difference between current invoice month and PI's first invoice month
-        I.e 0 for new PIs
-        Will raise an error if the PI'a age is negative, which suggests a faulty invoice, or a program bug"""
-        first_invoice_month = old_pi_df.loc[
-            old_pi_df[invoice.PI_PI_FIELD] == pi, invoice.PI_FIRST_MONTH
-        ]
-        if first_invoice_month.empty:
-            return 0
+    def _get_pi_ledger(old_pi_df: pandas.DataFrame) -> pandas.DataFrame:
+        """Returns the old PI entries indexed by PI, keeping the first entry of each PI"""
+        return old_pi_df.drop_duplicates(invoice.PI_PI_FIELD).set_index(
+            invoice.PI_PI_FIELD
+        )
 
-        month_diff = util.get_month_diff(invoice_month, first_invoice_month.iat[0])
-        if month_diff < 0:
+    @staticmethod
+    def _get_pi_ages(
+        pi_ledger: pandas.DataFrame, pis: pandas.Index, invoice_month
+    ) -> pandas.Series:
+        """Returns time difference between current invoice month and each PI's first invoice month
+        I.e 0 for new PIs
+        Will raise an error if a PI's age is negative, which suggests a faulty invoice, or a program bug"""
+        first_invoice_months = pi_ledger[invoice.PI_FIRST_MONTH].reindex(pis)
+        pi_ages = (
+            util.get_month_ordinal(invoice_month)
+            - util.get_month_ordinals(first_invoice_months)
+        ).fillna(0)
+
+        if (pi_ages < 0).any():
+            pi = pi_ages.index[pi_ages < 0][0]
             sys.exit(
-                f"PI {pi} from {first_invoice_month} found in {invoice_month} invoice!"
+                f"PI {pi} from {first_invoice_months[pi]} found in {invoice_month} invoice!"
             )
-        else:
-            return month_diff
+        return pi_ages.astype(int)
 
     @staticmethod
-    def _upsert_pi_entry(
-        old_pi_df,
-        pi_name,
-        invoice_month,
-        initial_credits,
-        first_month_used,
-        second_month_used,
+    def _upsert_pi_entries(
+        old_pi_df, pi_entries: list[list], pi_ledger: pandas.DataFrame
     ) -> pandas.DataFrame:
         """
-        Upserts PI entry in old PI dataframe.
+        Upserts PI entries in old PI dataframe.
 
-        If the PI already has an entry, overwrites the entry with new values, otherwise creates a new entry.
+        PIs that already have an entry have it overwritten with the new values.
+        Entries of the remaining PIs are inserted in one batch, at the top of
+        the file, in reverse order of `pi_entries`, which is where inserting
+        them one at a time would place them.
 
         This returns the updated old_pi_df
         """
-        pi_entry = [
-            pi_name,
-            invoice_month,
-            initial_credits,
-            first_month_used,
-            second_month_used,
+        existing_entries = [
+            entry for entry in pi_entries if entry[0] in pi_ledger.index
         ]
-        if old_pi_df.loc[old_pi_df[invoice.PI_PI_FIELD] == pi_name].empty:
+        new_entries = [entry for entry in pi_entries if entry[0] not in pi_ledger.index]
+
+        if existing_entries:
+            existing_entries = pandas.DataFrame(
+                existing_entries, columns=old_pi_df.columns
+            ).set_index(invoice.PI_PI_FIELD)
+            rows = old_pi_df[invoice.PI_PI_FIELD].isin(existing_entries.index)
+            row_pis = old_pi_df.loc[rows, invoice.PI_PI_FIELD]
+            for column in existing_entries.columns:
+                old_pi_df.loc[rows, column] = (
+                    existing_entries[column].reindex(row_pis).to_numpy()
+                )
+
+        if new_entries:
             old_pi_df = pandas.concat(
                 [
-                    pandas.DataFrame([pi_entry], columns=old_pi_df.columns),
+                    pandas.DataFrame(new_entries[::-1], columns=old_pi_df.columns),
                     old_pi_df,
                 ],
                 ignore_index=True,
             )
-        else:
-            old_pi_df.loc[old_pi_df[invoice.PI_PI_FIELD] == pi_name] = pi_entry
 
         return old_pi_df
 
     def _filter_partners(self, data):
-        active_partnerships = list()
-        institute_list = util.load_institute_list()
-        for institute_info in institute_list.root:
-            if partnership_start_date := institute_info.mghpcc_partnership_start_date:
-                if util.get_month_diff(self.invoice_month, partnership_start_date) >= 0:
-                    active_partnerships.append(institute_info.display_name)
-
+        active_partnerships = util.load_institute_list().get_active_partners(
+            self.invoice_month
+        )
         return data[data[invoice.INSTITUTION_FIELD].isin(active_partnerships)]
 
     def _filter_excluded_su_types(self, data):
@@ -168,70 +177,101 @@ class NewPICreditProcessor(discount_processor.DiscountProcessor):
         )
 
         credit_eligible_projects = self._get_credit_eligible_projects(data)
-        all_pi_set = set(data[~data[invoice.MISSING_PI_FIELD]][invoice.PI_FIELD])
+        all_pis = pandas.Index(
+            list(set(data[~data[invoice.MISSING_PI_FIELD]][invoice.PI_FIELD])),
+            dtype=object,
+        )
         eligible_pi_set = set(credit_eligible_projects[invoice.PI_FIELD])
-        for pi in all_pi_set:
-            pi_age = self._get_pi_age(old_pi_df, pi, self.invoice_month)
-            pi_old_pi_entry = old_pi_df.loc[
-                old_pi_df[invoice.PI_PI_FIELD] == pi
-            ].squeeze()
-
-            # If the pi is not eligible, their initial credit amount is set to 0,
-            # but we still want to keep track of them in case they become eligible in the future
-            # More detail: https://github.com/CCI-MOC/invoicing/issues/280
-            if pi not in eligible_pi_set and pi_age == 0:
-                old_pi_df = self._upsert_pi_entry(
-                    old_pi_df, pi, self.invoice_month, 0, 0, 0
-                )
-                continue
 
-            pi_projects = credit_eligible_projects[
-                credit_eligible_projects[invoice.PI_FIELD] == pi
-            ]
-
-            if pi_age <= 1:
-                if pi_age == 0:
-                    old_pi_df = self._upsert_pi_entry(
-                        old_pi_df,
-                        pi,
-                        self.invoice_month,
-                        self.initial_credit_amount,
-                        0,
-                        0,
-                    )
-                    pi_old_pi_entry = old_pi_df.loc[
-                        old_pi_df[invoice.PI_PI_FIELD] == pi
-                    ].squeeze()
-
-                    remaining_credit = self.initial_credit_amount
-                    credit_used_field = invoice.PI_1ST_USED
-                elif pi_age == 1:
-                    remaining_credit = (
-                        pi_old_pi_entry[invoice.PI_INITIAL_CREDITS]
-                        - pi_old_pi_entry[invoice.PI_1ST_USED]
-                    )
-                    credit_used_field = invoice.PI_2ND_USED
-
-                credits_used = self.apply_flat_discount(
-                    data,
-                    pi_projects,
-                    invoice.PI_BALANCE_FIELD,
-                    remaining_credit,
-                    invoice.CREDIT_FIELD,
-                    invoice.BALANCE_FIELD,
-                    invoice.CREDIT_CODE_FIELD,
-                    self.NEW_PI_CREDIT_CODE,
+        pi_ledger = self._get_pi_ledger(old_pi_df)
+        pi_ages = self._get_pi_ages(pi_ledger, all_pis, self.invoice_month)
+        is_new = (pi_ages == 0).to_numpy()
+        is_eligible = all_pis.isin(eligible_pi_set)
+        new_pis = all_pis[is_new]
+        eligible_new_pis = all_pis[is_new & is_eligible]
+        second_month_pis = all_pis[(pi_ages == 1).to_numpy()]
+
+        # If the pi is not eligible, their initial credit amount is set to 0,
+        # but we still want to keep track of them in case they become eligible in the future
+        # More detail: https://github.com/CCI-MOC/invoicing/issues/280
+        old_pi_df = self._upsert_pi_entries(
+            old_pi_df,
+            [
+                [
+                    pi,
+                    self.invoice_month,
+                    self.initial_credit_amount if eligible else 0,
+                    0,
+                    0,
+                ]
+                for pi, eligible in zip(new_pis, is_eligible[is_new])
+            ],
+            pi_ledger,
+        )
+
+        # Credits for all PIs are applied at once after their remaining credits are determined
+        second_month_entries = pi_ledger.loc[second_month_pis]
+        pi_remaining_credits = dict.fromkeys(
+            eligible_new_pis, self.initial_credit_amount
+        )
+        pi_remaining_credits.update(
+            (
+                second_month_entries[invoice.PI_INITIAL_CREDITS]
+                - second_month_entries[invoice.PI_1ST_USED]
+            ).to_dict()
+        )
+
+        # A credit used up whole by the PI's first project is written to the
+        # PI file as given (i.e 1000), other credits used are written in cents
+        first_balances = credit_eligible_projects.groupby(invoice.PI_FIELD, sort=False)[
+            invoice.PI_BALANCE_FIELD
+        ].first()
+        whole_credit_pis = {
+            pi
+            for pi, balance in zip(
+                first_balances.index, money.to_minor_units(first_balances)
+            )
+            if pi in pi_remaining_credits
+            and balance > money.amount_to_minor_units(pi_remaining_credits[pi])
+        }
+
+        pi_credits_used = self.apply_grouped_flat_discount(
+            data,
+            credit_eligible_projects,
+            invoice.PI_FIELD,
+            pi_remaining_credits,
+            invoice.PI_BALANCE_FIELD,
+            invoice.CREDIT_FIELD,
+            invoice.BALANCE_FIELD,
+            invoice.CREDIT_CODE_FIELD,
+            self.NEW_PI_CREDIT_CODE,
+        )
+
+        pi_ledger = self._get_pi_ledger(old_pi_df)
+        for credit_used_field, pis in [
+            (invoice.PI_1ST_USED, eligible_new_pis),
+            (invoice.PI_2ND_USED, second_month_pis),
+        ]:
+            if pis.empty:
+                continue
+            credits_used = pi_credits_used[pis]
+            previous_credits_used = pi_ledger.loc[pis, credit_used_field]
+            is_overwritten = (
+                (previous_credits_used != 0) & (previous_credits_used != credits_used)
+            ).fillna(True)
+            for pi in pis[is_overwritten.to_numpy(dtype=bool)]:
+                logger.warning(
+                    f"PI file overwritten. PI {pi} previously used ${previous_credits_used[pi]} of New PI credits, now uses ${credits_used[pi]}"
                 )
 
-                if (pi_old_pi_entry[credit_used_field] != 0) and (
-                    credits_used != pi_old_pi_entry[credit_used_field]
-                ):
-                    logger.warning(
-                        f"PI file overwritten. PI {pi} previously used ${pi_old_pi_entry[credit_used_field]} of New PI credits, now uses ${credits_used}"
-                    )
-                old_pi_df.loc[
-                    old_pi_df[invoice.PI_PI_FIELD] == pi, credit_used_field
-                ] = credits_used
+            credits_written = {
+                pi: pi_remaining_credits[pi] if pi in whole_credit_pis else used
+                for pi, used in credits_used.items()
+            }
+            rows = old_pi_df[invoice.PI_PI_FIELD].isin(pis)
+            old_pi_df.loc[rows, credit_used_field] = (
+                old_pi_df.loc[rows, invoice.PI_PI_FIELD].map(credits_written).to_numpy()
+            )
 
         return (data, old_pi_df)
 
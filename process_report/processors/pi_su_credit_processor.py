@@ -2,6 +2,9 @@ import logging
 
 from dataclasses import dataclass, field
 
+import numpy
+import pandas
+
 from process_report.loader import loader
 from process_report.invoices import invoice
 from process_report.processors import discount_processor
@@ -42,21 +45,35 @@ class PISUCreditProcessor(discount_processor.DiscountProcessor):
         default_factory=loader.get_pi_non_billed_su_types
     )
 
+    def _get_credit_eligible_mask(self) -> numpy.ndarray:
+        """Returns whether each row's (PI, SU type) pair receives the credit,
+        matching all rows against the pairs of `pi_su_mapping` in one pass"""
+        pi_su_pairs = pandas.DataFrame(
+            [
+                (pi, su_type)
+                for pi, su_types in self.pi_su_mapping.items()
+                for su_type in su_types
+            ],
+            columns=[invoice.PI_FIELD, invoice.SU_TYPE_FIELD],
+        )
+        return pandas.MultiIndex.from_frame(
+            self.data[[invoice.PI_FIELD, invoice.SU_TYPE_FIELD]]
+        ).isin(pandas.MultiIndex.from_frame(pi_su_pairs))
+
     def _process(self):
-        for pi, su_types in self.pi_su_mapping.items():
-            credit_eligible_rows = self.data[
-                self.data[invoice.SU_TYPE_FIELD].isin(su_types)
-                & (self.data[invoice.PI_FIELD] == pi)
-            ]
-            self.apply_flat_discount(
-                invoice=self.data,
-                pi_projects=credit_eligible_rows,
-                pi_balance_field=invoice.PI_BALANCE_FIELD,
-                discount_amount=credit_eligible_rows[
-                    invoice.COST_FIELD
-                ].sum(),  # Discount the entire cost of eligible SUs
-                discount_field=invoice.CREDIT_FIELD,
-                balance_field=invoice.BALANCE_FIELD,
-                code_field=invoice.CREDIT_CODE_FIELD,
-                discount_code=self.PI_SU_CREDIT_CODE,
-            )
+        credit_eligible_rows = self.data[self._get_credit_eligible_mask()]
+
+        self.apply_grouped_flat_discount(
+            invoice=self.data,
+            eligible_projects=credit_eligible_rows,
+            group_keys=invoice.PI_FIELD,
+            # Discount the entire cost of eligible SUs
+            discount_amounts=credit_eligible_rows.groupby(invoice.PI_FIELD)[
+                invoice.COST_FIELD
+            ].sum(),
+            pi_balance_field=invoice.PI_BALANCE_FIELD,
+            discount_field=invoice.CREDIT_FIELD,
+            balance_field=invoice.BALANCE_FIELD,
+            code_field=invoice.CREDIT_CODE_FIELD,
+            discount_code=self.PI_SU_CREDIT_CODE,
+        )
@@ -3,10 +3,11 @@ import logging
 from dataclasses import dataclass, field
 
 import pandas
+import pyarrow
 
 from process_report.settings import invoice_settings
 from process_report.loader import loader
-from process_report import util
+from process_report import util, money, prepay_debit_ledger
 from process_report.invoices import invoice
 from process_report.processors import discount_processor
 
@@ -58,174 +59,248 @@ class PrepaymentProcessor(discount_processor.DiscountProcessor):
         )
     )
     upload_to_s3: bool = invoice_settings.upload_to_s3
+    prepay_debits_ledger_filepath: str | None = (
+        invoice_settings.prepay_debits_ledger_filepath
+    )
 
-    @staticmethod
-    def _load_prepay_debits(prepay_debits_filepath):
+    def _load_prepay_debit_ledger(self) -> prepay_debit_ledger.PrepayDebitLedger:
         try:
-            prepay_debits = pandas.read_csv(prepay_debits_filepath).astype(
-                {invoice.PREPAY_DEBIT_FIELD: invoice.BALANCE_FIELD_TYPE}
+            return prepay_debit_ledger.PrepayDebitLedger.from_csv(
+                self.prepay_debits_filepath,
+                self.prepay_debits_ledger_filepath or ":memory:",
             )
         except FileNotFoundError:
             sys.exit("Applying prepayments failed. prepay debits file does not exist")
 
-        return prepay_debits
-
     def _prepare(self):
-        self.prepay_debits = self._load_prepay_debits(self.prepay_debits_filepath)
-        self.group_info_dict = self._get_prepay_group_dict()
+        self.prepay_debit_ledger = self._load_prepay_debit_ledger()
+        try:
+            self.group_info_dict = self._get_prepay_group_dict()
+        except BaseException:
+            # Including the SystemExit of invalid prepay info
+            self.prepay_debit_ledger.close()
+            raise
         if self.upload_to_s3:
             self._backup_s3_prepay_debits()
 
     def _process(self):
-        self._add_prepay_info()
-        self._apply_prepayments()
+        with self.prepay_debit_ledger:
+            self._add_prepay_info()
+            self._apply_prepayments()
 
-        self._export_prepay_debits()
+            self._export_prepay_debits()
         if self.upload_to_s3:
             self._export_s3_prepay_debits()
 
-    def _get_prepay_group_dict(self):
-        """Loads prepay info into a dict for simpler indexing
-        during processing step"""
-        prepay_group_dict = dict()
-
-        # Load each group's contact info, and initialize $0 balance and empty project list
-        for _, group_info in self.prepay_contacts.iterrows():
-            group_name = group_info[invoice.PREPAY_GROUP_NAME_FIELD]
-            prepay_group_dict[group_name] = dict()
-            prepay_group_dict[group_name][invoice.PREPAY_GROUP_CONTACT_FIELD] = (
-                group_info[invoice.PREPAY_GROUP_CONTACT_FIELD]
-            )
-            prepay_group_dict[group_name][invoice.PREPAY_MANAGED_FIELD] = (
-                group_info[invoice.PREPAY_MANAGED_FIELD].lower() == "yes"
+    def _check_prepay_groups_exist(self, group_names: pandas.Series):
+        unknown_groups = set(group_names) - set(
+            self.prepay_contacts[invoice.PREPAY_GROUP_NAME_FIELD]
+        )
+        if unknown_groups:
+            logger.error(
+                f"Prepay groups {sorted(unknown_groups)} are missing from the prepay contacts!"
             )
-            prepay_group_dict[group_name][invoice.GROUP_BALANCE_FIELD] = 0
-            prepay_group_dict[group_name][invoice.PREPAY_PROJECT_FIELD] = []
+            sys.exit(1)
 
-        # Sum up each group's credits from current and past months
-        for _, group_credit in self.prepay_credits.iterrows():
-            if (
-                util.get_month_diff(
-                    self.invoice_month, group_credit[invoice.PREPAY_MONTH_FIELD]
-                )
-                >= 0
-            ):
-                prepay_group_dict[group_credit[invoice.PREPAY_GROUP_NAME_FIELD]][
-                    invoice.GROUP_BALANCE_FIELD
-                ] += group_credit[invoice.PREPAY_CREDIT_FIELD]
+    @staticmethod
+    def _sum_by_group(
+        amounts: pandas.DataFrame, amount_field, group_names
+    ) -> pandas.Series:
+        """Returns the sum of each group's amounts, in int64 minor units, since
+        grouped sums of decimals are not run on native kernels"""
+        minor_units = money.decimals_to_minor_units(
+            pyarrow.array(
+                amounts[amount_field].astype(money.DECIMAL_BALANCE_FIELD_TYPE).array
+            ),
+            money.BALANCE_SCALE,
+        ).to_numpy()
+        return (
+            pandas.Series(minor_units, index=amounts[invoice.PREPAY_GROUP_NAME_FIELD])
+            .groupby(level=0)
+            .sum()
+            .reindex(group_names, fill_value=0)
+        )
+
+    def _get_prepay_group_balances(self, group_names) -> pandas.Series:
+        """Returns each group's balance, as its credits up to and including the
+        invoice month, minus its debits before the invoice month"""
+        invoice_month_ordinal = util.get_month_ordinal(self.invoice_month)
+        credit_months = util.get_month_ordinals(
+            self.prepay_credits[invoice.PREPAY_MONTH_FIELD]
+        )
 
+        # Sum up each group's credits from current and past months
+        group_credits = self.prepay_credits[
+            (credit_months <= invoice_month_ordinal).to_numpy(dtype=bool)
+        ]
         # Sum up each group's debits from past months. DOES NOT INCLUDE CURRENT MONTH
-        for _, group_debit in self.prepay_debits.iterrows():
-            if (
-                util.get_month_diff(
-                    self.invoice_month, group_debit[invoice.PREPAY_MONTH_FIELD]
-                )
-                > 0
-            ):
-                prepay_group_dict[group_debit[invoice.PREPAY_GROUP_NAME_FIELD]][
-                    invoice.GROUP_BALANCE_FIELD
-                ] -= group_debit[invoice.PREPAY_DEBIT_FIELD]
-
-                if (
-                    prepay_group_dict[group_debit[invoice.PREPAY_GROUP_NAME_FIELD]][
-                        invoice.GROUP_BALANCE_FIELD
-                    ]
-                    < 0
-                ):
-                    logger.error(
-                        f"Balance for prepay group {group_credit[invoice.PREPAY_GROUP_NAME_FIELD]} is negative!"
-                    )
-                    sys.exit(1)
-
-        # Populate each group's list of "active" prepay projects
-        # Projects' "active" period includes their start and end dates
-        for _, group_project in self.prepay_projects.iterrows():
-            if (
-                util.get_month_diff(
-                    self.invoice_month, group_project[invoice.PREPAY_START_DATE_FIELD]
-                )
-                >= 0
-                and util.get_month_diff(
-                    group_project[invoice.PREPAY_END_DATE_FIELD], self.invoice_month
-                )
-                >= 0
-            ):
-                prepay_group_dict[group_project[invoice.PREPAY_GROUP_NAME_FIELD]][
-                    invoice.PREPAY_PROJECT_FIELD
-                ].append(group_project[invoice.PREPAY_PROJECT_FIELD])
+        group_debits = self.prepay_debit_ledger.get_group_debits_before(
+            self.invoice_month
+        )
+        self._check_prepay_groups_exist(
+            pandas.concat(
+                [
+                    group_credits[invoice.PREPAY_GROUP_NAME_FIELD],
+                    group_debits.index.to_series(),
+                ]
+            )
+        )
 
-        return prepay_group_dict
+        group_balances = self._sum_by_group(
+            group_credits, invoice.PREPAY_CREDIT_FIELD, group_names
+        ) - group_debits.reindex(group_names, fill_value=0)
 
-    def _add_prepay_info(self):
-        """Populate prepaid group name, institute, and MGHPCC managed field"""
-        institute_list = util.load_institute_list()
+        negative_balances = group_balances[group_balances < 0]
+        if not negative_balances.empty:
+            for group_name in negative_balances.index.unique():
+                logger.error(f"Balance for prepay group {group_name} is negative!")
+            sys.exit(1)
 
-        for group_name, group_dict in self.group_info_dict.items():
-            group_institute = institute_list.get_institution_from_pi(
-                group_dict[invoice.PREPAY_GROUP_CONTACT_FIELD]
-            )
+        return money.minor_units_to_decimal(
+            group_balances.to_numpy(), group_balances.index
+        )
 
-            # Prepay projects are identified by project name, not project - allocation name
-            row_mask = self.data[invoice.PROJECT_NAME_FIELD].isin(
-                group_dict[invoice.PREPAY_PROJECT_FIELD]
+    def _get_active_prepay_projects(self) -> pandas.DataFrame:
+        """Returns the prepay projects that are "active" in the invoice month.
+        Projects' "active" period includes their start and end dates"""
+        invoice_month_ordinal = util.get_month_ordinal(self.invoice_month)
+        is_active = (
+            util.get_month_ordinals(
+                self.prepay_projects[invoice.PREPAY_START_DATE_FIELD]
             )
-            col_mask = [
-                invoice.INVOICE_EMAIL_FIELD,
-                invoice.GROUP_NAME_FIELD,
-                invoice.GROUP_INSTITUTION_FIELD,
-                invoice.GROUP_MANAGED_FIELD,
-            ]
-            self.data.loc[row_mask, col_mask] = [
-                group_dict[invoice.PREPAY_GROUP_CONTACT_FIELD],
-                group_name,
-                group_institute,
-                group_dict[invoice.PREPAY_MANAGED_FIELD],
-            ]
+            <= invoice_month_ordinal
+        ) & (
+            util.get_month_ordinals(self.prepay_projects[invoice.PREPAY_END_DATE_FIELD])
+            >= invoice_month_ordinal
+        )
+        active_projects = self.prepay_projects[is_active.to_numpy(dtype=bool)]
+        self._check_prepay_groups_exist(
+            active_projects[invoice.PREPAY_GROUP_NAME_FIELD]
+        )
+        return active_projects
 
-    def _apply_prepayments(self):
-        for group_name, group_dict in self.group_info_dict.items():
-            group_projects = self.data[
-                self.data[invoice.GROUP_NAME_FIELD] == group_name
+    def _get_prepay_group_dict(self):
+        """Loads prepay info into a dict for simpler indexing
+        during processing step"""
+        group_names = self.prepay_contacts[invoice.PREPAY_GROUP_NAME_FIELD]
+        group_balances = self._get_prepay_group_balances(group_names)
+        group_projects = (
+            self._get_active_prepay_projects()
+            .groupby(invoice.PREPAY_GROUP_NAME_FIELD, sort=False)[
+                invoice.PREPAY_PROJECT_FIELD
             ]
-            prepay_amount_used = self.apply_flat_discount(
-                self.data,
-                group_projects,
-                invoice.PI_BALANCE_FIELD,
-                group_dict[invoice.GROUP_BALANCE_FIELD],
-                invoice.GROUP_BALANCE_USED_FIELD,
-                invoice.BALANCE_FIELD,
-            )
+            .agg(list)
+        )
+        is_managed = (
+            self.prepay_contacts[invoice.PREPAY_MANAGED_FIELD].str.lower() == "yes"
+        )
 
-            remaining_prepay_balance = (
-                group_dict[invoice.GROUP_BALANCE_FIELD] - prepay_amount_used
+        return {
+            group_name: {
+                invoice.PREPAY_GROUP_CONTACT_FIELD: contact,
+                invoice.PREPAY_MANAGED_FIELD: bool(managed),
+                invoice.GROUP_BALANCE_FIELD: balance,
+                invoice.PREPAY_PROJECT_FIELD: group_projects.get(group_name, []),
+            }
+            for group_name, contact, managed, balance in zip(
+                group_names,
+                self.prepay_contacts[invoice.PREPAY_GROUP_CONTACT_FIELD],
+                is_managed,
+                group_balances,
             )
-            self.data.loc[
-                self.data[invoice.GROUP_NAME_FIELD] == group_name,
+        }
+
+    def _get_prepay_project_groups(self) -> pandas.DataFrame:
+        """Returns the info of each active prepay project's group, indexed by
+        project name. A project active in several groups is attributed to the
+        last of them"""
+        # Columns are given explicitly since there may be no prepay groups
+        groups = pandas.DataFrame.from_dict(
+            self.group_info_dict,
+            orient="index",
+            columns=[
+                invoice.PREPAY_GROUP_CONTACT_FIELD,
+                invoice.PREPAY_MANAGED_FIELD,
                 invoice.GROUP_BALANCE_FIELD,
-            ] = remaining_prepay_balance
-
-            # If the group has used some prepay money, check if the group
-            # already has a debit entry for the current month to decide
-            # whether to append a new debit entry, or overwrite the old one
-            if prepay_amount_used > 0:
-                debit_entry_mask = (
-                    self.prepay_debits[invoice.PREPAY_MONTH_FIELD] == self.invoice_month
-                ) & (self.prepay_debits[invoice.PREPAY_GROUP_NAME_FIELD] == group_name)
-                if self.prepay_debits[debit_entry_mask].empty:
-                    self.prepay_debits = pandas.concat(
-                        [
-                            self.prepay_debits,
-                            pandas.DataFrame(
-                                [[self.invoice_month, group_name, prepay_amount_used]],
-                                columns=self.prepay_debits.columns,
-                            ),
-                        ],
-                        ignore_index=True,
-                    )
-                else:
-                    self.prepay_debits.loc[
-                        debit_entry_mask, invoice.PREPAY_DEBIT_FIELD
-                    ] = prepay_amount_used
+                invoice.PREPAY_PROJECT_FIELD,
+            ],
+        )
+        groups[invoice.GROUP_NAME_FIELD] = groups.index
+        group_institutions = util.load_institute_list().get_institutions_from_pis(
+            groups[invoice.PREPAY_GROUP_CONTACT_FIELD]
+        )
+        groups[invoice.GROUP_INSTITUTION_FIELD] = groups[
+            invoice.PREPAY_GROUP_CONTACT_FIELD
+        ].map(group_institutions)
+
+        return (
+            groups.explode(invoice.PREPAY_PROJECT_FIELD)
+            .dropna(subset=[invoice.PREPAY_PROJECT_FIELD])
+            .drop_duplicates(invoice.PREPAY_PROJECT_FIELD, keep="last")
+            .set_index(invoice.PREPAY_PROJECT_FIELD)
+        )
+
+    def _add_prepay_info(self):
+        """Populate prepaid group name, institute, and MGHPCC managed field"""
+        project_groups = self._get_prepay_project_groups()
+
+        # Prepay projects are identified by project name, not project - allocation name
+        row_groups = project_groups.index.get_indexer(
+            self.data[invoice.PROJECT_NAME_FIELD]
+        )
+        matched_rows = row_groups != -1
+        for column, group_column in {
+            invoice.INVOICE_EMAIL_FIELD: invoice.PREPAY_GROUP_CONTACT_FIELD,
+            invoice.GROUP_NAME_FIELD: invoice.GROUP_NAME_FIELD,
+            invoice.GROUP_INSTITUTION_FIELD: invoice.GROUP_INSTITUTION_FIELD,
+            invoice.GROUP_MANAGED_FIELD: invoice.PREPAY_MANAGED_FIELD,
+        }.items():
+            self.data.loc[matched_rows, column] = project_groups[
+                group_column
+            ].to_numpy()[row_groups[matched_rows]]
+
+    def _apply_prepayments(self):
+        group_prepay_amounts_used = self.apply_grouped_flat_discount(
+            self.data,
+            self.data[self.data[invoice.GROUP_NAME_FIELD].notna()],
+            invoice.GROUP_NAME_FIELD,
+            {
+                group_name: group_dict[invoice.GROUP_BALANCE_FIELD]
+                for group_name, group_dict in self.group_info_dict.items()
+            },
+            invoice.PI_BALANCE_FIELD,
+            invoice.GROUP_BALANCE_USED_FIELD,
+            invoice.BALANCE_FIELD,
+        )
+
+        remaining_prepay_balances = pandas.Series(
+            {
+                group_name: money.to_internal(
+                    group_dict[invoice.GROUP_BALANCE_FIELD]
+                    - group_prepay_amounts_used[group_name]
+                )
+                for group_name, group_dict in self.group_info_dict.items()
+            },
+            dtype=object,
+        )
+        row_groups = remaining_prepay_balances.index.get_indexer(
+            self.data[invoice.GROUP_NAME_FIELD]
+        )
+        grouped_rows = row_groups != -1
+        self.data.loc[grouped_rows, invoice.GROUP_BALANCE_FIELD] = (
+            remaining_prepay_balances.to_numpy()[row_groups[grouped_rows]]
+        )
+
+        # Groups that used some prepay money have their debit entry for the
+        # current month added, or overwritten if the month is processed again
+        self.prepay_debit_ledger.upsert_debits(
+            self.invoice_month,
+            {
+                group_name: group_prepay_amounts_used[group_name]
+                for group_name in self.group_info_dict
+                if group_prepay_amounts_used[group_name] > 0
+            },
+        )
 
     def _backup_s3_prepay_debits(self):
         invoice_bucket = util.get_invoice_bucket()
@@ -234,7 +309,9 @@ class PrepaymentProcessor(discount_processor.DiscountProcessor):
         )
 
     def _export_prepay_debits(self):
-        self.prepay_debits.to_csv(self.prepay_debits_filepath, index=False)
+        self.prepay_debit_ledger.export_csv(self.prepay_debits_filepath)
+        # The debits stay available once the ledger is closed
+        self.prepay_debits = self.prepay_debit_ledger.to_dataframe()
 
     def _export_s3_prepay_debits(self):
         invoice_bucket = util.get_invoice_bucket()
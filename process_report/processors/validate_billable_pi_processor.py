@@ -4,6 +4,7 @@ import logging
 import pandas
 
 from process_report.loader import loader
+from process_report.nonbillable_matcher import NonbillableProjectMatcher
 from process_report.invoices import invoice
 from process_report.processors import processor
 from process_report import util
@@ -16,12 +17,12 @@ NONBILLABLE_CLUSTERS = ["ocp-test", "barcelona"]
 
 
 def find_billable_projects(
-    data: pandas.DataFrame, nonbillable_projects: pandas.DataFrame
+    data: pandas.DataFrame, nonbillable_project_matcher: NonbillableProjectMatcher
 ) -> pandas.Series:
     """
     Takes as input:
     - `data`: DataFrame containing invoice data with project and cluster columns
-    - `nonbillable_projects`: DataFrame output from `loader.get_nonbillable_projects()`
+    - `nonbillable_project_matcher`: Matcher built from `loader.get_nonbillable_projects()`
     Returns a boolean series indicating whether each project in `data` is billable
 
     `data` is searched for projects which are:
@@ -33,55 +34,24 @@ def find_billable_projects(
     There is a convoluted reason why the `Project - Allocation` column is checked:
     Input invoices to this pipeline are expected to have the `Project - Allocation`
     and `Project - Allocation ID` columns both populated by the project ID.
-    `nonbillable_projects` usually identify projects by names, which are more
+    Nonbillable projects are usually identified by names, which are more
     human-readable. However, we found it acceptable to use IDs for non-Coldfront projects
     `ColdfrontFetchProcessor` attempts to populate `Project - Allocation` with project
     names, then checks if all non-Coldfront projects are nonbillable
-    This check works because we allow `nonbillable_projects` to contain project IDs for non-Coldfront projects.
+    This check works because we allow nonbillable projects to be identified by project IDs for non-Coldfront projects.
 
     Ultimately, it is important to note that `Project - Allocation` may contain the project name or ID.
     """
-
-    def _apply_lowercase(data: pandas.DataFrame, col) -> pandas.DataFrame:
-        data_copy = data.copy()
-        data_copy[col] = data_copy[col].str.lower()
-        return data_copy
-
-    data_lower = _apply_lowercase(data, invoice.PROJECT_FIELD)
-    nonbillable_projects_lower = _apply_lowercase(
-        nonbillable_projects, invoice.NONBILLABLE_PROJECT_NAME
-    )
-
-    cluster_agnostic_projects = (
-        nonbillable_projects_lower[
-            nonbillable_projects_lower[invoice.NONBILLABLE_CLUSTER_NAME].isna()
-        ][invoice.NONBILLABLE_PROJECT_NAME]
-        .unique()
-        .tolist()
+    is_nonbillable_project, is_billable_override = nonbillable_project_matcher.match(
+        data[invoice.PROJECT_FIELD], data[invoice.CLUSTER_NAME_FIELD]
     )
-
-    # Use left join and filter on `source` column to find billable projects
-    # https://pandas.pydata.org/docs/reference/api/pandas.merge.html
-    merged_data = pandas.merge(
-        data_lower,
-        nonbillable_projects_lower,
-        how="left",
-        left_on=[invoice.PROJECT_FIELD, invoice.CLUSTER_NAME_FIELD],
-        right_on=[invoice.NONBILLABLE_PROJECT_NAME, invoice.NONBILLABLE_CLUSTER_NAME],
-        indicator="source",
-    )
-
-    cluster_agnostic_mask = ~merged_data[invoice.PROJECT_FIELD].isin(
-        cluster_agnostic_projects
+    is_nonbillable_cluster = (
+        data[invoice.CLUSTER_NAME_FIELD].isin(NONBILLABLE_CLUSTERS).to_numpy(dtype=bool)
     )
-    cluster_specific_mask = ~merged_data["source"].eq("both")
-    nonbillable_cluster_mask = ~merged_data[invoice.CLUSTER_NAME_FIELD].isin(
-        NONBILLABLE_CLUSTERS
+    return pandas.Series(
+        (~is_nonbillable_project & ~is_nonbillable_cluster) | is_billable_override,
+        index=data.index,
     )
-    billable_override_mask = merged_data[invoice.NONBILLABLE_IS_BILLABLE_OVERRIDE]
-    return (
-        cluster_agnostic_mask & cluster_specific_mask & nonbillable_cluster_mask
-    ) | billable_override_mask
 
 
 @dataclass
@@ -106,8 +76,8 @@ class ValidateBillablePIsProcessor(processor.Processor):
     )
 
     nonbillable_pis: list[str] = field(default_factory=loader.get_nonbillable_pis)
-    nonbillable_projects: pandas.DataFrame = field(
-        default_factory=loader.get_nonbillable_projects
+    nonbillable_project_matcher: NonbillableProjectMatcher = field(
+        default_factory=loader.get_nonbillable_project_matcher
     )
 
     @staticmethod
@@ -124,16 +94,16 @@ class ValidateBillablePIsProcessor(processor.Processor):
     def _get_billables(
         data: pandas.DataFrame,
         nonbillable_pis: list[str],
-        nonbillable_projects: pandas.DataFrame,
+        nonbillable_project_matcher: NonbillableProjectMatcher,
     ):
         institute_list = util.load_institute_list()
 
         pi_mask = ~data[invoice.PI_FIELD].isin(nonbillable_pis)
-        project_mask = find_billable_projects(data, nonbillable_projects)
+        project_mask = find_billable_projects(data, nonbillable_project_matcher)
         courses_mask = ~(
             data[invoice.IS_COURSE_FIELD]
             & data[invoice.INSTITUTION_FIELD].isin(
-                institute_list.nonbillable_course_list
+                institute_list.nonbillable_course_set
             )
         )
 
@@ -141,6 +111,6 @@ class ValidateBillablePIsProcessor(processor.Processor):
 
     def _process(self):
         self.data[invoice.IS_BILLABLE_FIELD] = self._get_billables(
-            self.data, self.nonbillable_pis, self.nonbillable_projects
+            self.data, self.nonbillable_pis, self.nonbillable_project_matcher
         )
         self.data[invoice.MISSING_PI_FIELD] = self._validate_pi_names(self.data)
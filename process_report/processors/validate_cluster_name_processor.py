@@ -1,5 +1,8 @@
 from dataclasses import dataclass
 
+import numpy
+import pandas
+
 from process_report.invoices import invoice
 from process_report.processors import processor
 
@@ -14,7 +17,31 @@ class ValidateClusterNameProcessor(processor.Processor):
 
     operates_on_columns = (invoice.CLUSTER_NAME_COLUMN,)
 
+    @classmethod
+    def get_canonical_cluster_name(cls, cluster_name):
+        return cls.CLUSTER_NAME_MAP.get(cluster_name, cluster_name)
+
+    @classmethod
+    def get_canonical_cluster_names(cls, cluster_names: pandas.Series) -> pandas.Series:
+        """Returns the canonical name of each cluster as a categorical column.
+
+        Its categories are `invoice.CLUSTER_NAMES`, followed by any other
+        cluster names in order of appearance. Names are factorized once, so
+        only the distinct names are canonicalized, not every row"""
+        codes, raw_names = pandas.factorize(cluster_names)
+        canonical_names = raw_names.map(cls.get_canonical_cluster_name)
+        categories = pandas.Index(
+            list(dict.fromkeys([*invoice.CLUSTER_NAMES, *canonical_names]))
+        )
+        # Missing names have code -1, which takes the appended -1
+        category_codes = numpy.append(categories.get_indexer(canonical_names), -1)
+        return pandas.Series(
+            pandas.Categorical.from_codes(category_codes[codes], categories),
+            index=cluster_names.index,
+            name=cluster_names.name,
+        )
+
     def _process(self):
-        self.data[invoice.CLUSTER_NAME_FIELD] = self.data[
-            invoice.CLUSTER_NAME_FIELD
-        ].apply(lambda x: self.CLUSTER_NAME_MAP.get(x, x))
+        self.data[invoice.CLUSTER_NAME_FIELD] = self.get_canonical_cluster_names(
+            self.data[invoice.CLUSTER_NAME_FIELD]
+        )
@@ -1,5 +1,6 @@
 from dataclasses import dataclass, field
 
+from process_report import util
 from process_report.loader import loader
 from process_report.invoices import invoice
 from process_report.processors import processor
@@ -11,11 +12,14 @@ class ValidatePIAliasProcessor(processor.Processor):
 
     operates_on_columns = (invoice.PI_COLUMN,)
 
+    def _prepare(self):
+        self.pi_by_alias = util.invert_alias_map(self.alias_map)
+
     def _validate_pi_aliases(self):
-        for pi, pi_aliases in self.alias_map.items():
-            self.data.loc[
-                self.data[invoice.PI_FIELD].isin(pi_aliases), invoice.PI_FIELD
-            ] = pi
+        pis = self.data[invoice.PI_FIELD]
+        canonical_pis = pis.map(self.pi_by_alias)
+        is_alias = canonical_pis.notna()
+        self.data.loc[is_alias, invoice.PI_FIELD] = canonical_pis[is_alias]
 
     def _process(self):
         self._validate_pi_aliases()
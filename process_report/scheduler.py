@@ -0,0 +1,166 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def get_declared_columns(processor) -> list[str]:
+    """Names of all columns a processor declares it initializes or operates on"""
+    declared_columns = dict.fromkeys(
+        column.name
+        for column in (*processor.initializes_columns, *processor.operates_on_columns)
+    )
+    return list(declared_columns)
+
+
+def validate_processing_order(processors: list):
+    """Checks that no column is initialized by more than one processor, and
+    that every column a processor operates on is initialized by itself or by
+    a previous processor"""
+    initialized_columns = dict()
+    for processor in processors:
+        for column in processor.initializes_columns:
+            if column.name in initialized_columns:
+                raise ValueError(
+                    f"Column '{column.name}' initialized by {processor.__name__} but already initialized by {initialized_columns[column.name]}"
+                )
+            initialized_columns[column.name] = processor.__name__
+
+        for column in processor.operates_on_columns:
+            if column.name not in initialized_columns:
+                raise ValueError(
+                    f"Column '{column.name}' operated on by {processor.__name__} but not initialized by itself or any previous processor"
+                )
+
+
+def get_processor_dependencies(processors: list) -> list[set[int]]:
+    """Returns, for each processor, the indices of the previous processors it depends on.
+
+    Since the declarations do not distinguish reading from writing a column, a
+    processor depends on every previous processor sharing any declared column"""
+    declared_columns = [
+        set(get_declared_columns(processor)) for processor in processors
+    ]
+    return [
+        {j for j in range(i) if declared_columns[i] & declared_columns[j]}
+        for i in range(len(processors))
+    ]
+
+
+class ProcessorScheduler:
+    """Runs processors as a dependency graph built from their declared columns.
+
+    Processors that share no declared columns with each other run concurrently,
+    up to `max_workers` at a time.
+    Each processor receives a copy of the data projected onto its declared
+    columns, and the columns of its result are merged back into the data.
+    Accessing a column that was not declared therefore fails.
+
+    In debug mode, processors run one at a time and their results are
+    compared against their inputs, logging which declared columns were
+    actually modified."""
+
+    def __init__(self, processors: list, max_workers=1, debug=False):
+        validate_processing_order(processors)
+        self.processors = processors
+        self.dependencies = get_processor_dependencies(processors)
+        self.max_workers = 1 if debug else max_workers
+        self.debug = debug
+
+    def _run_processor(
+        self, processor, invoice_month, projected_data, removed_columns: set[str]
+    ):
+        start_time = time.perf_counter()
+        proc_instance = processor(
+            name="", invoice_month=invoice_month, data=projected_data
+        )
+        try:
+            proc_instance.process()
+        except KeyError as e:
+            # Other KeyErrors are not caused by the projection
+            missing_key = e.args[0] if e.args else None
+            if not isinstance(missing_key, str) or missing_key not in removed_columns:
+                raise
+            raise KeyError(
+                f"{processor.__name__} accessed column {e} which it does not declare in initializes_columns or operates_on_columns"
+            ) from e
+
+        logger.info(
+            f"{processor.__name__} finished in {time.perf_counter() - start_time:.2f}s"
+        )
+        return proc_instance.data
+
+    def _check_result(self, processor, projected_data, result):
+        if not result.index.equals(projected_data.index):
+            raise ValueError(f"{processor.__name__} added, removed or reordered rows")
+
+        undeclared_columns = set(result.columns) - set(get_declared_columns(processor))
+        if undeclared_columns:
+            raise ValueError(
+                f"{processor.__name__} wrote undeclared columns {sorted(undeclared_columns)}"
+            )
+
+        if self.debug:
+            unmodified_columns = [
+                column
+                for column in projected_data.columns
+                if result[column].equals(projected_data[column])
+            ]
+            logger.info(
+                f"{processor.__name__} declared but did not modify columns {unmodified_columns}"
+            )
+
+    def run(self, invoice_month, data: pandas.DataFrame) -> pandas.DataFrame:
+        data = data.copy()
+        input_columns = list(data.columns)
+        new_columns = [[] for _ in self.processors]
+        pending = set(range(len(self.processors)))
+        finished = set()
+        running = dict()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # Processors are started in declared order once their dependencies finish
+                for i in sorted(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    if self.dependencies[i] <= finished:
+                        processor = self.processors[i]
+                        projected_data = data[
+                            [
+                                column
+                                for column in get_declared_columns(processor)
+                                if column in data.columns
+                            ]
+                        ].copy()
+                        future = executor.submit(
+                            self._run_processor,
+                            processor,
+                            invoice_month,
+                            projected_data,
+                            set(data.columns) - set(projected_data.columns),
+                        )
+                        running[future] = (i, projected_data)
+                        pending.remove(i)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, projected_data = running.pop(future)
+                    result = future.result()
+                    self._check_result(self.processors[i], projected_data, result)
+                    for column in result.columns:
+                        if column not in data.columns:
+                            new_columns[i].append(column)
+                        data[column] = result[column]
+                    finished.add(i)
+
+        # Keep the column order of running the processors one after another
+        column_order = input_columns + [
+            column for columns in new_columns for column in columns
+        ]
+        return data[column_order]
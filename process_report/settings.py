@@ -1,4 +1,5 @@
 import datetime
+from typing import Literal
 from decimal import Decimal
 
 from dateutil.relativedelta import relativedelta
@@ -10,6 +11,17 @@ class Settings(BaseSettings):
     coldfront_api_filepath: str | None = None
     keycloak_client_id: str | None = None
     keycloak_client_secret: str | None = None
+    # Allocations are fetched in pages fetched concurrently if a page size
+    # is set, otherwise in one streamed response
+    coldfront_page_size: int | None = None
+    coldfront_fetch_workers: int = 4
+    coldfront_timeout: float = 60
+    coldfront_max_attempts: int = 3
+    # Cache of fetched allocations, revalidated with conditional requests
+    # unless fetched less than `coldfront_cache_max_age` seconds ago
+    coldfront_cache_enabled: bool = False
+    coldfront_cache_dir: str = ".coldfront_cache"
+    coldfront_cache_max_age: float = 0
 
     invoice_path_template: str = "Invoices/{invoice_month}/Service Invoices/"
     invoice_month: str = (datetime.datetime.today() - relativedelta(months=1)).strftime(
@@ -17,6 +29,42 @@ class Settings(BaseSettings):
     )
     fetch_from_s3: bool = True
     upload_to_s3: bool = False
+    s3_download_workers: int = 8
+    s3_download_max_attempts: int = 3
+
+    # Cache of merged input invoices, keyed by the source files' ETags or hashes
+    input_cache_enabled: bool = False
+    input_cache_dir: str = ".input_cache"
+    input_cache_retention_months: int = 3
+
+    # With more than one worker, processors sharing no declared columns run
+    # concurrently. In debug mode, they run one at a time and log which
+    # declared columns they modified
+    processor_workers: int = 1
+    processor_debug: bool = False
+
+    # Invoices are processed and exported concurrently. PI invoices render
+    # and upload their PDFs with their own pool of workers
+    invoice_export_workers: int = 4
+    pi_invoice_export_workers: int = 8
+
+    # Money columns are stored as decimals, or as int64 minor units (i.e cents)
+    # between merging the input invoices and exporting the output invoices
+    money_representation: Literal["decimal", "minor_units"] = "decimal"
+
+    # PI invoice PDFs are rendered by a pool of long-lived Chromium instances,
+    # or by launching Chromium for every PDF if set to "subprocess"
+    pdf_renderer: Literal["chromium_pool", "subprocess"] = "chromium_pool"
+    chromium_pool_size: int = 4
+    chromium_page_timeout: float = 60
+
+    # If set, the validated institute list is pickled to this path, and
+    # loaded from it while the institute list file is unchanged
+    institute_list_snapshot_path: str | None = None
+
+    # If set, the prepay debit history is kept in a SQLite database at this
+    # path, and only reloaded from the debits CSV when the CSV changes
+    prepay_debits_ledger_filepath: str | None = None
 
     # S3 Files
     pi_remote_filepath: str = "PIs/PI.csv"
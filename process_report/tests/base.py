@@ -6,6 +6,9 @@ from unittest import TestCase
 import pandas
 import pyarrow
 
+from process_report import money
+from process_report.invoices import invoice
+
 
 BALANCE_FIELD_TYPE = pandas.ArrowDtype(pyarrow.decimal128(21, 2))
 RATE_FIELD_TYPE = pandas.ArrowDtype(pyarrow.decimal128(21, 13))
@@ -28,8 +31,8 @@ FIELD_DTYPES = {
     "Prepaid Group Used": BALANCE_FIELD_TYPE,
     "SU Hours (GBhr or SUhr)": INTEGER_FIELD_TYPE,
     "SU Type": STRING_FIELD_TYPE,
-    "SU Charge": BALANCE_FIELD_TYPE,
-    "Charge": BALANCE_FIELD_TYPE,
+    "SU Charge": RATE_FIELD_TYPE,
+    "Charge": RATE_FIELD_TYPE,
     "Rate": RATE_FIELD_TYPE,
     "Cost": BALANCE_FIELD_TYPE,
     "Credit": BALANCE_FIELD_TYPE,
@@ -53,6 +56,15 @@ class BaseTestCase(TestCase):
         }
         return pandas.DataFrame(data_dict).astype(present_cols)
 
+    def to_internal(self, dataframe: pandas.DataFrame) -> pandas.DataFrame:
+        """Converts the decimal money columns of a test invoice to the
+        internal representation processors work with"""
+        return money.dataframe_to_internal(dataframe, invoice.MONEY_FIELD_SCALES)
+
+    def to_decimal(self, dataframe: pandas.DataFrame) -> pandas.DataFrame:
+        """Converts the money columns of a processed invoice back to decimals"""
+        return money.dataframe_to_decimal(dataframe, invoice.MONEY_FIELD_SCALES)
+
 
 class BaseTestCaseWithTempDir(BaseTestCase):
     def setUp(self):
@@ -0,0 +1,33 @@
+import pandas
+
+from process_report.tests import util as test_utils
+from process_report.tests.base import BaseTestCase
+
+
+class TestBUInternalInvoice(BaseTestCase):
+    def test_sum_project_allocations(self):
+        test_invoice = self.create_test_invoice(
+            {
+                "Project": ["P2", "P1", "P2", "P3", "P1"],
+                "Manager (PI)": ["PI2", "PI1", "PI2b", "PI3", "PI1b"],
+                "Cost": [100, 10, 200, 5, 20],
+                "Credit": [None, 1, 50, None, 2],
+                "Subsidy": [0, 0, 10, 0, 0],
+                "PI Balance": [100, 9, 140, 5, 18],
+            }
+        ).set_index(pandas.Index([4, 3, 2, 1, 0]))
+
+        answer_invoice = self.create_test_invoice(
+            {
+                "Project": ["P2", "P1", "P3"],
+                "Manager (PI)": ["PI2", "PI1", "PI3"],
+                "Cost": [300, 30, 5],
+                "Credit": [50, 3, 0],
+                "Subsidy": [10, 0, 0],
+                "PI Balance": [240, 27, 5],
+            }
+        ).set_index(pandas.Index([4, 3, 1]))
+
+        bu_internal_inv = test_utils.new_bu_internal_invoice(data=test_invoice)
+        output_invoice = bu_internal_inv._sum_project_allocations(test_invoice)
+        assert output_invoice.equals(answer_invoice)
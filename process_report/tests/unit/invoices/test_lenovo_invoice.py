@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from process_report.invoices import lenovo_invoice
+from process_report.tests import util as test_utils
+from process_report.tests.base import BaseTestCaseWithTempDir
+
+
+class TestLenovoInvoice(BaseTestCaseWithTempDir):
+    def test_export_charges(self):
+        """Are SU charges written as configured, and charges with the decimals of their SU charge?"""
+        test_invoice = self.create_test_invoice(
+            {
+                "Invoice Month": ["2025-06"] * 4,
+                "Project - Allocation": ["P1", "P2", "P3", "P4"],
+                "Cluster Name": ["stack"] * 4,
+                "Institution": ["BU"] * 4,
+                "SU Type": ["OpenStack GPUA100SXM4"] * 2 + ["BM GPUH100"] * 2,
+                "SU Hours (GBhr or SUhr)": [280, 7, 10, None],
+            }
+        )
+        lenovo_proc = test_utils.new_lenovo_processor(
+            data=self.to_internal(test_invoice),
+            su_charge_info={"GPUA100SXM4": Decimal("1.803"), "GPUH100": 2},
+        )
+        lenovo_proc.process()
+
+        lenovo_inv = lenovo_invoice.LenovoInvoice(
+            name=str(self.tempdir / "Lenovo"),
+            invoice_month="2025-06",
+            data=lenovo_proc.data,
+        )
+        lenovo_inv.process()
+        lenovo_inv.export()
+
+        with open(lenovo_inv.output_path) as f:
+            exported_lines = f.read().splitlines()
+        assert [line.split(",")[-2:] for line in exported_lines[1:]] == [
+            ["1.803", "504.840"],
+            ["1.803", "12.621"],
+            ["2", "20"],
+            ["2", ""],
+        ]
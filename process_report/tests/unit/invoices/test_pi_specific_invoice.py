@@ -1,7 +1,9 @@
+import os
 import tempfile
 from unittest import TestCase, mock
 import pandas
 
+from process_report import chromium_pool
 from process_report.tests import util as test_utils
 from process_report.invoices.pi_specific_invoice import CHROME_BIN_PATH
 
@@ -123,6 +125,51 @@ class TestPISpecificInvoice(TestCase):
         output_invoice = pi_inv._get_pi_dataframe(test_invoice, "PI2")
         assert answer_invoice_pi2.equals(output_invoice)
 
+    def test_get_pi_dataframes(self):
+        test_invoice = self._get_test_invoice(
+            ["PI2", "PI1", None, "PI2", "PI1"],
+            ["HU", "BU", "BU", "HU", "BU"],
+            [100, 200, 300, 400, 500],
+            group_name=[None, "G1", None, None, None],
+        )
+        pi_inv = test_utils.new_pi_specific_invoice(data=test_invoice)
+
+        pi_dataframes = list(pi_inv._get_pi_dataframes(test_invoice))
+
+        # PIs are split in order of appearance, skipping missing PIs
+        assert [pi for pi, _ in pi_dataframes] == ["PI2", "PI1"]
+
+        # Prepay group columns are dropped for PIs without prepay groups
+        answer_invoice_pi2 = pandas.DataFrame(
+            {
+                "Manager (PI)": ["PI2", "PI2", ""],
+                "Institution": ["HU", "HU", ""],
+                "Is Billable": ["True", "True", ""],
+                "Missing PI": ["False", "False", ""],
+                "Balance": ["$100", "$400", "$500"],
+                "Invoice Month": ["", "", "Total"],
+            },
+            dtype=pandas.StringDtype(),
+        )
+        answer_invoice_pi1 = pandas.DataFrame(
+            {
+                "Manager (PI)": ["PI1", "PI1", ""],
+                "Institution": ["BU", "BU", ""],
+                "Is Billable": ["True", "True", ""],
+                "Missing PI": ["False", "False", ""],
+                "Prepaid Group Name": ["G1", "", ""],
+                "Prepaid Group Institution": ["", "", ""],
+                "Prepaid Group Balance": ["$0", "$0", "$"],
+                "Prepaid Group Used": ["$0", "$0", "$"],
+                "Balance": ["$200", "$500", "$700"],
+                "Invoice Month": ["", "", "Total"],
+            },
+            dtype=pandas.StringDtype(),
+        )
+
+        assert answer_invoice_pi2.equals(pi_dataframes[0][1])
+        assert answer_invoice_pi1.equals(pi_dataframes[1][1])
+
     @mock.patch("process_report.invoices.invoice.Invoice._filter_columns")
     @mock.patch("os.path.exists")
     @mock.patch("subprocess.run")
@@ -187,3 +234,85 @@ class TestPISpecificInvoice(TestCase):
             ):
                 pi_inv.process()
                 pi_inv.export()
+
+    @mock.patch("process_report.invoices.invoice.Invoice._filter_columns")
+    @mock.patch("os.path.exists")
+    @mock.patch("subprocess.run")
+    def test_export_pi_concurrent(
+        self, mock_subprocess_run, mock_path_exists, mock_filter_cols
+    ):
+        invoice_month = "2024-10"
+        pi_list = [f"PI{i}" for i in range(10)]
+        test_invoice = self._get_test_invoice(
+            pi_list, ["BU"] * len(pi_list), [100] * len(pi_list)
+        )
+        mock_path_exists.return_value = True
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            pi_inv = test_utils.new_pi_specific_invoice(
+                test_dir, invoice_month, data=test_invoice
+            )
+            pi_inv.export_workers = 4
+            pi_inv.process()
+            pi_inv.export()
+
+        pdf_paths = {
+            call_args[0][0][3] for call_args in mock_subprocess_run.call_args_list
+        }
+        assert pdf_paths == {
+            f"--print-to-pdf={test_dir}/BU_{pi}_{invoice_month}.pdf" for pi in pi_list
+        }
+
+    @mock.patch("process_report.invoices.invoice.Invoice._filter_columns")
+    @mock.patch("subprocess.run")
+    @mock.patch("process_report.chromium_pool.ChromiumPool")
+    def test_export_pi_chromium_pool(
+        self, mock_pool_class, mock_subprocess_run, mock_filter_cols
+    ):
+        invoice_month = "2024-10"
+        test_invoice = self._get_test_invoice(["PI1", "PI2"], ["BU", "HU"], [100, 200])
+        mock_pool = mock_pool_class.return_value
+        mock_pool.print_to_pdf.return_value = b"%PDF"
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            pi_inv = test_utils.new_pi_specific_invoice(
+                test_dir, invoice_month, data=test_invoice
+            )
+            pi_inv.pdf_renderer = "chromium_pool"
+            pi_inv.process()
+            pi_inv.export()
+
+            assert sorted(os.listdir(test_dir)) == [
+                f"BU_PI1_{invoice_month}.pdf",
+                f"HU_PI2_{invoice_month}.pdf",
+            ]
+
+        mock_subprocess_run.assert_not_called()
+        mock_pool.start.assert_called_once()
+        mock_pool.close.assert_called_once()
+
+    @mock.patch("process_report.invoices.invoice.Invoice._filter_columns")
+    @mock.patch("os.path.exists")
+    @mock.patch("subprocess.run")
+    @mock.patch("process_report.chromium_pool.ChromiumPool")
+    def test_export_pi_chromium_pool_fallback(
+        self, mock_pool_class, mock_subprocess_run, mock_path_exists, mock_filter_cols
+    ):
+        test_invoice = self._get_test_invoice(["PI1", "PI2"], ["BU", "HU"], [100, 200])
+        mock_path_exists.return_value = True
+        mock_pool = mock_pool_class.return_value
+        mock_pool.print_to_pdf.side_effect = [
+            b"%PDF",
+            chromium_pool.ChromiumError("Timed out"),
+        ]
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            pi_inv = test_utils.new_pi_specific_invoice(
+                test_dir, "2024-10", data=test_invoice
+            )
+            pi_inv.pdf_renderer = "chromium_pool"
+            pi_inv.process()
+            pi_inv.export()
+
+        # Only the page the pool failed to render falls back to a subprocess
+        assert mock_subprocess_run.call_count == 1
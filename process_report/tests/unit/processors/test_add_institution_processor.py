@@ -0,0 +1,58 @@
+from unittest import mock
+
+from process_report.institute_list_models import InstituteList
+from process_report.tests import util as test_utils
+from process_report.tests.base import BaseTestCase
+
+
+class TestAddInstitutionProcessor(BaseTestCase):
+    def test_add_institution(self):
+        test_institute_list = InstituteList.model_validate(
+            [
+                {"display_name": "Boston University", "domains": ["bu.edu"]},
+                {"display_name": "Harvard University", "domains": ["harvard.edu"]},
+                {"display_name": "McLean Hospital", "domains": ["mclean.harvard.edu"]},
+            ]
+        )
+        test_invoice = self.create_test_invoice(
+            {
+                "Manager (PI)": [
+                    "pi1@bu.edu",
+                    "pi2@a.mclean.harvard.edu",
+                    "pi1@bu.edu",
+                    None,
+                    "pi3@gmail.com",
+                    "pi4@harvard.edu",
+                    "pi3@gmail.com",
+                ],
+                "Project - Allocation": ["P1", "P2", "P3", "P4", "P5", "P6", "P7"],
+                "Institution": ["", "", "", "Old", "", "", ""],
+            }
+        )
+        answer_institutions = [
+            "Boston University",
+            "McLean Hospital",
+            "Boston University",
+            "Old",
+            "",
+            "Harvard University",
+            "",
+        ]
+
+        add_institution_proc = test_utils.new_add_institution_processor(
+            data=test_invoice
+        )
+        with (
+            mock.patch(
+                "process_report.util.load_institute_list",
+                return_value=test_institute_list,
+            ),
+            self.assertLogs("process_report.institute_list_models") as cm,
+        ):
+            add_institution_proc.process()
+
+        assert list(add_institution_proc.data["Institution"]) == answer_institutions
+        # Unmatched PIs are reported once, in a single warning
+        assert cm.output == [
+            "WARNING:process_report.institute_list_models:1 PI names do not match any institution: ['pi3@gmail.com']"
+        ]
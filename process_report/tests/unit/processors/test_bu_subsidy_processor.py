@@ -12,11 +12,11 @@ class TestBUSubsidyProcessor(BaseTestCase):
     ):
         new_bu_subsidy_proc = test_utils.new_bu_subsidy_processor(
             invoice_month=invoice_month,
-            data=test_invoice,
+            data=self.to_internal(test_invoice),
             subsidy_amount=subsidy_amount,
         )
         new_bu_subsidy_proc.process()
-        output_invoice = new_bu_subsidy_proc.data
+        output_invoice = self.to_decimal(new_bu_subsidy_proc.data)
         answer_invoice = answer_invoice.astype(output_invoice.dtypes)
 
         assert output_invoice.equals(answer_invoice)
@@ -260,3 +260,42 @@ class TestColdfrontFetchProcessor(BaseTestCase):
         assert str(cm.value) == (
             f"Projects {expected_missing} not found in Coldfront and are billable! Please check the project names"
         )
+
+    @mock.patch(
+        "process_report.processors.coldfront_fetch_processor.ColdfrontFetchProcessor._fetch_coldfront_allocation_api",
+    )
+    def test_unmatched_rows_reported_once(self, mock_get_allocation_data):
+        mock_get_allocation_data.return_value = self._get_mock_allocation_data(
+            ["P1", "P2"],
+            ["PI1", "PI2"],
+            ["IC1", "IC2"],
+            ["stack", "stack"],
+        )
+        test_invoice = self._get_test_invoice(
+            ["P1", "P3", "P3", "P4", "P2"],
+            cluster_name=["stack", "ocp-test", "ocp-test", "ocp-test", "ocp-test"],
+        )
+        answer_invoice = self._get_test_invoice(
+            ["P1", "P3", "P3", "P4", "P2"],
+            ["P1-name", "P3", "P3", "P4", "P2"],
+            ["PI1", "", "", "", ""],
+            ["IC1", "", "", "", ""],
+            ["stack", "ocp-test", "ocp-test", "ocp-test", "ocp-test"],
+            [False] * 5,
+        )
+        test_coldfront_fetch_proc = test_utils.new_coldfront_fetch_processor(
+            data=test_invoice
+        )
+
+        with self.assertLogs(
+            "process_report.processors.coldfront_fetch_processor"
+        ) as cm:
+            test_coldfront_fetch_proc.process()
+
+        assert test_coldfront_fetch_proc.data.equals(answer_invoice)
+        unmatched_logs = [log for log in cm.output if "not found in Coldfront" in log]
+        assert len(unmatched_logs) == 1
+        assert (
+            "4 rows of 3 project allocations not found in Coldfront: "
+            "[('P2', 'ocp-test'), ('P3', 'ocp-test'), ('P4', 'ocp-test')]"
+        ) in unmatched_logs[0]
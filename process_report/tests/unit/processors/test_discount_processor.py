@@ -51,12 +51,12 @@ class TestDiscountProcessor(BaseTestCase):
 
         processor = PISUCreditProcessor(
             invoice_month="2024-06",
-            data=invoice_data,
+            data=self.to_internal(invoice_data),
             name="test",
             pi_su_mapping={"PI": ["Openstack Storage"]},
         )
         processor.process()
-        output_invoice = processor.data
+        output_invoice = self.to_decimal(processor.data)
 
         expected_invoice = self._get_test_invoice(
             pi=["PI"],
@@ -80,14 +80,14 @@ class TestDiscountProcessor(BaseTestCase):
 
         processor = PISUCreditProcessor(
             invoice_month="2024-06",
-            data=invoice_data,
+            data=self.to_internal(invoice_data),
             name="test",
             pi_su_mapping={
                 "PI": ["Openstack Storage"]
             },  # Only Openstack Storage SU type is eligible for credit, not HPC
         )
         processor.process()
-        output_invoice = processor.data
+        output_invoice = self.to_decimal(processor.data)
 
         expected_invoice = self._get_test_invoice(
             pi=["PI", "PI"],
@@ -112,14 +112,14 @@ class TestDiscountProcessor(BaseTestCase):
 
         processor = PISUCreditProcessor(
             invoice_month="2024-06",
-            data=invoice_data,
+            data=self.to_internal(invoice_data),
             name="test",
             pi_su_mapping={
                 "PI": ["Openstack Storage", "Openstack Compute"]
             },  # Both SU types are eligible for credit
         )
         processor.process()
-        output_invoice = processor.data
+        output_invoice = self.to_decimal(processor.data)
 
         expected_invoice = self._get_test_invoice(
             pi=["PI", "PI"],
@@ -133,3 +133,101 @@ class TestDiscountProcessor(BaseTestCase):
 
         expected_invoice = expected_invoice.astype(output_invoice.dtypes)
         assert expected_invoice.equals(output_invoice)
+
+    def test_multiple_pis(self):
+        """Each PI is only credited for their own eligible SU types"""
+        invoice_data = self._get_test_invoice(
+            pi=["PI1", "PI2", "PI1", "PI2", "PI3"],
+            costs=[10, 20, 30, 40, 50],
+            su_type=["Storage", "Storage", "GPU", "GPU", "Storage"],
+            credit_code=[None, "0003", None, None, None],
+        )
+
+        processor = PISUCreditProcessor(
+            invoice_month="2024-06",
+            data=self.to_internal(invoice_data),
+            name="test",
+            pi_su_mapping={"PI1": ["Storage", "GPU"], "PI2": ["GPU"]},
+        )
+        processor.process()
+        output_invoice = self.to_decimal(processor.data)
+
+        expected_invoice = self._get_test_invoice(
+            pi=["PI1", "PI2", "PI1", "PI2", "PI3"],
+            costs=[10, 20, 30, 40, 50],
+            su_type=["Storage", "Storage", "GPU", "GPU", "Storage"],
+            credit=[10, None, 30, 40, None],
+            credit_code=["0005", "0003", "0005", "0005", None],
+            pi_balance=[0, 20, 0, 0, 50],
+            balance=[0, 20, 0, 0, 50],
+        )
+
+        expected_invoice = expected_invoice.astype(output_invoice.dtypes)
+        assert expected_invoice.equals(output_invoice)
+
+        # Eligible SUs with no cost are not credited
+        invoice_data = self._get_test_invoice(
+            pi=["PI1", "PI1", "PI2"],
+            costs=[10, 0, 0],
+            su_type=["Storage", "Storage", "GPU"],
+        )
+
+        processor = PISUCreditProcessor(
+            invoice_month="2024-06",
+            data=self.to_internal(invoice_data),
+            name="test",
+            pi_su_mapping={"PI1": ["Storage"], "PI2": ["GPU"]},
+        )
+        processor.process()
+        output_invoice = self.to_decimal(processor.data)
+
+        expected_invoice = self._get_test_invoice(
+            pi=["PI1", "PI1", "PI2"],
+            costs=[10, 0, 0],
+            su_type=["Storage", "Storage", "GPU"],
+            credit=[10, None, None],
+            credit_code=["0005", None, None],
+            pi_balance=[0, 0, 0],
+            balance=[0, 0, 0],
+        )
+
+        expected_invoice = expected_invoice.astype(output_invoice.dtypes)
+        assert expected_invoice.equals(output_invoice)
+
+    def test_grouped_flat_discount(self):
+        """Each group's discount is applied in row order until it runs out, and the amount used per group is returned"""
+        invoice_data = self._get_test_invoice(
+            pi=["PI1", "PI2", "PI1", "PI2", "PI1", "PI3"],
+            costs=[60, 10, 60, 20, 60, 30],
+            su_type=["CPU" for _ in range(6)],
+            credit_code=[None, "0003", None, None, None, None],
+        )
+        invoice_data = self.to_internal(invoice_data)
+
+        processor = PISUCreditProcessor(
+            invoice_month="2024-06", data=invoice_data, name="test", pi_su_mapping={}
+        )
+        discount_used = processor.apply_grouped_flat_discount(
+            invoice=invoice_data,
+            eligible_projects=invoice_data,
+            group_keys=invoice.PI_FIELD,
+            discount_amounts={"PI1": 100, "PI2": 1000, "PI3": 0, "PI4": 50},
+            pi_balance_field=invoice.PI_BALANCE_FIELD,
+            discount_field=invoice.CREDIT_FIELD,
+            balance_field=invoice.BALANCE_FIELD,
+            code_field=invoice.CREDIT_CODE_FIELD,
+            discount_code="0002",
+        )
+
+        expected_invoice = self._get_test_invoice(
+            pi=["PI1", "PI2", "PI1", "PI2", "PI1", "PI3"],
+            costs=[60, 10, 60, 20, 60, 30],
+            su_type=["CPU" for _ in range(6)],
+            credit=[60, 10, 40, 20, None, None],
+            credit_code=["0002", "0003,0002", "0002", "0002", None, None],
+            pi_balance=[0, 0, 20, 0, 60, 30],
+            balance=[0, 0, 20, 0, 60, 30],
+        )
+
+        assert expected_invoice.equals(self.to_decimal(invoice_data))
+        assert discount_used.to_dict() == {"PI1": 100, "PI2": 30, "PI3": 0, "PI4": 0}
@@ -1,28 +1,36 @@
-from unittest import TestCase
-import pandas
+from decimal import Decimal
 
+from process_report.tests.base import BaseTestCase
 from process_report.tests import util as test_utils
 
 
-class TestLenovoProcessor(TestCase):
+class TestLenovoProcessor(BaseTestCase):
     def test_process_lenovo(self):
-        test_su_charge_info = {"GPUA100SXM4": 1, "GPUH100": 2.5}
-        test_invoice = pandas.DataFrame(
+        test_su_charge_info = {
+            "GPUA100SXM4": 1,
+            "GPUH100": 2.5,
+            "GPUV100": Decimal("1.803"),
+        }
+        test_invoice = self.create_test_invoice(
             {
                 "SU Type": ["OpenStack GPUA100SXM4"] * 2
                 + ["OpenShift GPUA100SXM4"] * 2
-                + ["Not Lenovo SU", "Random GPUH100"],
-                "SU Hours (GBhr or SUhr)": [1, 10, 100, 4, 432, 10],
+                + ["Not Lenovo SU", "Random GPUH100", "OpenStack GPUV100", None],
+                "SU Hours (GBhr or SUhr)": [1, 10, 100, 4, 432, 10, 7, None],
             }
         )
         answer_invoice = test_invoice.copy()
-        answer_invoice["SU Charge"] = [1, 1, 1, 1, 0, 2.5]
-        answer_invoice["Charge"] = (
-            answer_invoice["SU Hours (GBhr or SUhr)"] * answer_invoice["SU Charge"]
-        )
+        answer_invoice["SU Charge"] = [
+            Decimal(charge) for charge in [1, 1, 1, 1, 0, "2.5", "1.803", 0]
+        ]
+        # Sub-cent SU charges and charges are kept exact
+        answer_invoice["Charge"] = [
+            Decimal(charge) for charge in [1, 10, 100, 4, 0, 25, "12.621"]
+        ] + [None]
+        answer_invoice = self.create_test_invoice(answer_invoice.to_dict("list"))
 
         lenovo_proc = test_utils.new_lenovo_processor(
-            data=test_invoice, su_charge_info=test_su_charge_info
+            data=self.to_internal(test_invoice), su_charge_info=test_su_charge_info
         )
         lenovo_proc.process()
-        assert lenovo_proc.data.equals(answer_invoice)
+        assert self.to_decimal(lenovo_proc.data).equals(answer_invoice)
@@ -70,13 +70,13 @@ class TestNewPICreditProcessor(BaseTestCaseWithTempDir):
     ):
         new_pi_credit_proc = test_utils.new_new_pi_credit_processor(
             invoice_month=invoice_month,
-            data=test_invoice,
+            data=self.to_internal(test_invoice),
             old_pi_filepath=test_old_pi_filepath,
             credit_amount=credit_amount,
             limit_new_pi_credit_to_partners=limit_new_pi_credit_to_partners,
         )
         new_pi_credit_proc.process()
-        output_invoice = new_pi_credit_proc.data
+        output_invoice = self.to_decimal(new_pi_credit_proc.data)
         output_old_pi_df = new_pi_credit_proc.updated_old_pi_df.sort_values(
             by="PI", ignore_index=True
         )
@@ -586,6 +586,57 @@ class TestNewPICreditProcessor(BaseTestCaseWithTempDir):
             answer_old_pi_df,
         )
 
+    def test_old_pi_file_format(self):
+        """Are credits used written to the old PI file with cents, except
+        when a PI's first project uses their whole credit, which is written
+        as the credit?"""
+        test_old_pi_file = self.tempdir / "old_pi.csv"
+        test_old_pi_file.write_text(
+            "PI,First Invoice Month,Initial Credits,1st Month Used,2nd Month Used\n"
+        )
+        new_pi_credit_proc = test_utils.new_new_pi_credit_processor(
+            invoice_month="2024-06",
+            data=self.to_internal(
+                self._get_test_invoice(
+                    ["PI1", "PI2", "PI3", "PI3"], [1500, "20.5", 400, 700]
+                )
+            ),
+            old_pi_filepath=str(test_old_pi_file),
+            credit_amount=1000,
+        )
+        new_pi_credit_proc.process()
+
+        assert set(test_old_pi_file.read_text().splitlines()[1:]) == {
+            "PI1,2024-06,1000,1000,0",
+            "PI2,2024-06,1000,20.50,0",
+            "PI3,2024-06,1000,1000.00,0",
+        }
+
+    def test_old_pi_file_format_second_month(self):
+        """Are existing entries rewritten in cents, as they were read?"""
+        test_old_pi_file = self.tempdir / "old_pi.csv"
+        test_old_pi_file.write_text(
+            "PI,First Invoice Month,Initial Credits,1st Month Used,2nd Month Used\n"
+            "PI1,2024-05,1000.00,200.00,0.00\n"
+            "PI2,2024-05,1000,900.5,0\n"
+            "PI3,2024-04,1000.00,1000.00,0.00\n"
+        )
+        new_pi_credit_proc = test_utils.new_new_pi_credit_processor(
+            invoice_month="2024-06",
+            data=self.to_internal(
+                self._get_test_invoice(["PI1", "PI2", "PI3"], [800, "30.25", 5])
+            ),
+            old_pi_filepath=str(test_old_pi_file),
+            credit_amount=1000,
+        )
+        new_pi_credit_proc.process()
+
+        assert test_old_pi_file.read_text().splitlines()[1:] == [
+            "PI1,2024-05,1000.00,200.00,800.00",
+            "PI2,2024-05,1000.00,900.50,30.25",
+            "PI3,2024-04,1000.00,1000.00,0.00",
+        ]
+
     def test_apply_credit_error(self):
         """Test faulty data"""
         old_pi_df = pandas.DataFrame(
@@ -594,4 +645,24 @@ class TestNewPICreditProcessor(BaseTestCaseWithTempDir):
         invoice_month = "2024-03"
         test_invoice = test_utils.new_new_pi_credit_processor()
         with pytest.raises(SystemExit):
-            test_invoice._get_pi_age(old_pi_df, "PI1", invoice_month)
+            test_invoice._get_pi_ages(
+                test_invoice._get_pi_ledger(old_pi_df),
+                pandas.Index(["PI1"]),
+                invoice_month,
+            )
+
+    def test_get_pi_ages(self):
+        old_pi_df = pandas.DataFrame(
+            {
+                "PI": ["PI1", "PI2", "PI2"],
+                "First Invoice Month": ["2023-11", "2024-02", "2024-03"],
+            }
+        )
+        test_invoice = test_utils.new_new_pi_credit_processor()
+        pi_ages = test_invoice._get_pi_ages(
+            test_invoice._get_pi_ledger(old_pi_df),
+            pandas.Index(["PI1", "PI2", "PI3"]),
+            "2024-03",
+        )
+        # PI3 is new, and only the first entry of PI2 is used
+        assert pi_ages.to_dict() == {"PI1": 4, "PI2": 1, "PI3": 0}
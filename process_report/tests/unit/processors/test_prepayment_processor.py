@@ -1,4 +1,7 @@
+import sqlite3
+
 import pandas
+import pytest
 
 from process_report.tests import util as test_utils
 from process_report.tests.base import BaseTestCaseWithTempDir
@@ -19,14 +22,14 @@ class TestPrepaymentProcessor(BaseTestCaseWithTempDir):
         new_prepayment_proc = test_utils.new_prepayment_processor(
             "",
             invoice_month,
-            test_invoice,
+            self.to_internal(test_invoice),
             test_prepay_credits,
             test_prepay_debits_filepath,
             test_prepay_projects,
             test_prepay_contacts,
         )
         new_prepayment_proc.process()
-        output_invoice = new_prepayment_proc.data
+        output_invoice = self.to_decimal(new_prepayment_proc.data)
         output_prepay_debits = new_prepayment_proc.prepay_debits.sort_values(
             by="Month", ignore_index=True
         )
@@ -423,3 +426,106 @@ class TestPrepaymentProcessor(BaseTestCaseWithTempDir):
             answer_prepay_debits,
             invoice_month,
         )
+
+    def test_project_in_several_groups(self):
+        """Is a project active in several groups attributed to the last of them,
+        and are projects of no group left untouched?"""
+        invoice_month = "2024-06"
+        test_invoice = self._get_test_invoice(["P1", "P2"], [1000, 2000])
+        test_prepay_debits_file = self.tempdir / "prepay_debits.csv"
+        test_prepay_credits = self._get_test_prepay_credits(
+            ["2024-01", "2024-01"], ["G1", "G2"], [5000, 3000]
+        )
+        test_prepay_debits = self._get_test_prepay_debits([], [], [])
+        test_prepay_debits.to_csv(test_prepay_debits_file, index=False)
+        test_prepay_projects = self._get_test_prepay_projects(
+            ["G1", "G2"], ["P1", "P1"], ["2024-01", "2024-01"], ["2024-12", "2024-12"]
+        )
+        test_prepay_contacts = self._get_test_prepay_contacts(
+            ["G1", "G2"], ["G1@bu.edu", "G2@harvard.edu"], ["Yes", "No"]
+        )
+
+        answer_invoice = test_invoice.copy()
+        answer_invoice["Prepaid Group Name"] = ["G2", None]
+        answer_invoice["Prepaid Group Institution"] = ["Harvard University", None]
+        answer_invoice["MGHPCC Managed"] = [False, None]
+        answer_invoice["Prepaid Group Balance"] = [2000, None]
+        answer_invoice["Prepaid Group Used"] = [1000, None]
+        answer_invoice["Invoice Email"] = ["G2@harvard.edu", None]
+        answer_invoice["PI Balance"] = [0, 2000]
+        answer_invoice["Balance"] = [0, 2000]
+
+        answer_prepay_debits = self._get_test_prepay_debits(
+            [invoice_month], ["G2"], [1000]
+        )
+
+        self._assert_result_invoice(
+            test_invoice,
+            test_prepay_credits,
+            str(test_prepay_debits_file),
+            test_prepay_projects,
+            test_prepay_contacts,
+            answer_invoice,
+            answer_prepay_debits,
+            invoice_month,
+        )
+
+    def test_no_prepay_groups(self):
+        """Is the invoice left untouched when there are no prepay groups?"""
+        invoice_month = "2024-06"
+        test_invoice = self._get_test_invoice(["P1"], [1000])
+        test_prepay_debits_file = self.tempdir / "prepay_debits.csv"
+        test_prepay_debits = self._get_test_prepay_debits([], [], [])
+        test_prepay_debits.to_csv(test_prepay_debits_file, index=False)
+
+        answer_invoice = test_invoice.copy()
+        answer_invoice["Prepaid Group Name"] = [None]
+        answer_invoice["Prepaid Group Institution"] = [None]
+        answer_invoice["MGHPCC Managed"] = [None]
+        answer_invoice["Prepaid Group Balance"] = [None]
+        answer_invoice["Prepaid Group Used"] = [None]
+
+        self._assert_result_invoice(
+            test_invoice,
+            self._get_test_prepay_credits([], [], []),
+            str(test_prepay_debits_file),
+            self._get_test_prepay_projects([], [], [], []),
+            # As read from a contacts file with only a header
+            self._get_test_prepay_contacts([], [], []).astype(object),
+            answer_invoice,
+            test_prepay_debits,
+            invoice_month,
+        )
+
+    def test_negative_balance(self):
+        """The group whose debits exceed its credits is reported"""
+        test_prepay_debits_file = self.tempdir / "prepay_debits.csv"
+        self._get_test_prepay_debits(
+            ["2024-02", "2024-03"], ["G2", "G2"], [300, 300]
+        ).to_csv(test_prepay_debits_file, index=False)
+        new_prepayment_proc = test_utils.new_prepayment_processor(
+            invoice_month="2024-04",
+            prepay_credits=self._get_test_prepay_credits(
+                ["2024-01", "2024-01"], ["G2", "G1"], [500, 100]
+            ),
+            prepay_debits_filepath=str(test_prepay_debits_file),
+            prepay_projects=self._get_test_prepay_projects([], [], [], []),
+            prepay_contacts=self._get_test_prepay_contacts(
+                ["G1", "G2"], ["G1@bu.edu", "G2@bu.edu"], ["Yes", "No"]
+            ),
+        )
+
+        with (
+            self.assertLogs(
+                "process_report.processors.prepayment_processor", "ERROR"
+            ) as logs,
+            pytest.raises(SystemExit),
+        ):
+            new_prepayment_proc._prepare()
+        assert logs.output == [
+            "ERROR:process_report.processors.prepayment_processor:Balance for prepay group G2 is negative!"
+        ]
+
+        # The debit ledger is closed even though processing stopped
+        with pytest.raises(sqlite3.ProgrammingError):
+            new_prepayment_proc.prepay_debit_ledger.to_dataframe()
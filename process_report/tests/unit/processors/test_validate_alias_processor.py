@@ -1,4 +1,6 @@
 from unittest import TestCase
+
+import pytest
 import pandas
 
 from process_report.tests import util as test_utils
@@ -23,3 +25,11 @@ class TestValidateAliasProcessor(TestCase):
         )
         validate_pi_alias_proc.process()
         assert answer_data.equals(validate_pi_alias_proc.data)
+
+    def test_conflicting_aliases(self):
+        alias_map = {"PI1": ["PI1_1", "PI_X"], "PI2": ["PI_X"]}
+        validate_pi_alias_proc = test_utils.new_validate_pi_alias_processor(
+            data=pandas.DataFrame({"Manager (PI)": ["PI1"]}), alias_map=alias_map
+        )
+        with pytest.raises(ValueError, match="PI_X belongs to more than one PI"):
+            validate_pi_alias_proc.process()
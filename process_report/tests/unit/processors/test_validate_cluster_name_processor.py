@@ -1,6 +1,7 @@
 from unittest import TestCase
 import pandas
 
+from process_report.invoices import invoice
 from process_report.tests import util as test_utils
 
 
@@ -11,13 +12,16 @@ class TestValidateClusterNameProcessor(TestCase):
         )
 
         answer_invoice = test_invoice.copy()
-        answer_invoice["Cluster Name"] = [
-            "stack",
-            "ocp-prod",
-            "bm",
-            "random",
-            "academic",
-        ]
+        answer_invoice["Cluster Name"] = pandas.Categorical(
+            [
+                "stack",
+                "ocp-prod",
+                "bm",
+                "random",
+                "academic",
+            ],
+            categories=[*invoice.CLUSTER_NAMES, "bm", "random"],
+        )
 
         validate_proc = test_utils.new_validate_cluster_name_processor(
             data=test_invoice
@@ -25,3 +29,21 @@ class TestValidateClusterNameProcessor(TestCase):
         validate_proc.process()
 
         assert validate_proc.data.equals(answer_invoice)
+
+    def test_cluster_name_codes(self):
+        # Raw and canonical names of a cluster share one code
+        test_invoice = pandas.DataFrame(
+            {"Cluster Name": ["random", None, "NERC", "stack", "ocp-test"]}
+        )
+
+        validate_proc = test_utils.new_validate_cluster_name_processor(
+            data=test_invoice
+        )
+        validate_proc.process()
+
+        cluster_names = validate_proc.data["Cluster Name"]
+        assert cluster_names.cat.codes.tolist() == [5, -1, 0, 0, 3]
+        assert cluster_names.cat.categories.tolist() == [
+            *invoice.CLUSTER_NAMES,
+            "random",
+        ]
@@ -27,12 +27,13 @@ class TestValidateInputColumnsProcessor(BaseTestCase):
         }
 
         processor = ValidateInputColumnsProcessor(
-            invoice_month=invoice_month, data=pandas.DataFrame(test_data_dict)
+            invoice_month=invoice_month,
+            data=self.to_internal(pandas.DataFrame(test_data_dict)),
         )
         processor.process()
 
         output_data = processor.data
-        expected_data = self.create_test_invoice(test_data_dict)
+        expected_data = self.to_internal(self.create_test_invoice(test_data_dict))
         assert output_data.equals(expected_data)
 
     def test_process_raises_error_when_required_columns_are_missing(self):
@@ -0,0 +1,97 @@
+import json
+
+import pandas
+import yaml
+
+from process_report.benchmarks import synthetic_month, run_benchmark, micro_benchmarks
+from process_report.processors import validate_cluster_name_processor
+from process_report.tests.base import BaseTestCaseWithTempDir
+
+
+class TestSyntheticMonth(BaseTestCaseWithTempDir):
+    def setUp(self):
+        super().setUp()
+        self.spec = synthetic_month.SyntheticMonthSpec(num_pis=20, num_projects=50)
+
+    def test_generate_month(self):
+        month_files = synthetic_month.generate_month(self.spec, self.tempdir)
+
+        invoices = pandas.concat(
+            pandas.read_csv(path, quotechar="|")
+            for path in (self.tempdir / "invoices").iterdir()
+        )
+        assert len(invoices) == month_files.num_rows
+        assert set(
+            validate_cluster_name_processor.ValidateClusterNameProcessor.CLUSTER_NAME_MAP
+        ) <= set(invoices["Cluster Name"])
+        assert invoices["SU Type"].str.contains("GPUH100").any()
+
+        # Every allocation in the invoices is in Coldfront
+        with open(month_files.coldfront_api_filepath) as f:
+            coldfront_data = json.load(f)
+        allocation_ids = {
+            allocation["attributes"]["Allocated Project ID"]
+            for allocation in coldfront_data
+        }
+        assert set(invoices["Project - Allocation ID"]) <= allocation_ids
+
+        with open(month_files.nonbillable_pis_filepath) as f:
+            assert isinstance(yaml.safe_load(f), list)
+
+    def test_same_seed_same_month(self):
+        synthetic_month.generate_month(self.spec, self.tempdir / "a")
+        synthetic_month.generate_month(self.spec, self.tempdir / "b")
+        for name in ["coldfront_api_data.json", "PI.csv", "prepay_projects.csv"]:
+            assert (self.tempdir / "a" / name).read_text() == (
+                self.tempdir / "b" / name
+            ).read_text()
+
+    def test_scaled(self):
+        scaled_spec = self.spec.scaled(10)
+        assert scaled_spec.num_pis == 200
+        assert scaled_spec.num_projects == 500
+        assert scaled_spec.seed == self.spec.seed
+
+
+class TestRunBenchmark(BaseTestCaseWithTempDir):
+    def test_run_benchmark(self):
+        spec = synthetic_month.SyntheticMonthSpec(num_pis=10, num_projects=20)
+        report = run_benchmark.run_benchmark(spec, [1], self.tempdir)
+
+        scale_report = report["scales"]["1"]
+        stage_names = [stage["stage"] for stage in scale_report["stages"]]
+        assert stage_names[:2] == [
+            "load_merged_input",
+            "ValidateInputColumnsProcessor",
+        ]
+        assert "PIInvoice.export" in stage_names
+        for stage in scale_report["stages"]:
+            assert stage["seconds"] >= 0
+            assert stage["peak_rss_mb"] > 0
+
+        # PDFs are stubbed, but still written for each PI
+        assert any((self.tempdir / "scale_1" / "output" / "pi_invoices").iterdir())
+
+    def test_compare_reports(self):
+        baseline = {
+            "commit": "a",
+            "scales": {
+                "1": {"stages": [{"stage": "s", "seconds": 2.0, "peak_rss_mb": 10}]}
+            },
+        }
+        report = {
+            "commit": "b",
+            "scales": {
+                "1": {"stages": [{"stage": "s", "seconds": 1.0, "peak_rss_mb": 10}]}
+            },
+        }
+        lines = run_benchmark.compare_reports(baseline, report)
+        assert "(0.50x)" in lines[-1]
+
+
+def test_micro_benchmarks():
+    results = micro_benchmarks.run_micro_benchmarks(1000)
+    assert set(results) == set(micro_benchmarks.MICRO_BENCHMARKS)
+    for result in results.values():
+        assert result["rows"] == 1000
+        assert result["vectorized_seconds"] >= 0
@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import stat
+import textwrap
+
+import pytest
+
+from process_report import chromium_pool
+from process_report.tests.base import BaseTestCaseWithTempDir
+
+
+# Stands in for Chromium by answering DevTools protocol commands on fds 3 and 4.
+# Printed "PDFs" contain the page's HTML, pages containing "hang" never print, and
+# pages containing "options" are printed as the printToPDF parameters
+FAKE_CHROMIUM_SCRIPT = textwrap.dedent(
+    """
+    import os
+    import json
+    import base64
+
+    html = ""
+    buffer = b""
+    while True:
+        chunk = os.read(3, 65536)
+        if not chunk:
+            break
+        buffer += chunk
+        while b"\\0" in buffer:
+            raw_message, buffer = buffer.split(b"\\0", 1)
+            message = json.loads(raw_message)
+            method, params = message["method"], message["params"]
+            result = {}
+            if method == "Target.createTarget":
+                result = {"targetId": "target"}
+            elif method == "Target.attachToTarget":
+                result = {"sessionId": "session"}
+            elif method == "Page.getFrameTree":
+                result = {"frameTree": {"frame": {"id": "frame"}}}
+            elif method == "Page.setDocumentContent":
+                html = params["html"]
+            elif method == "Page.printToPDF":
+                if "hang" in html:
+                    continue
+                pdf = json.dumps(params) if "options" in html else "%PDF " + html
+                result = {"data": base64.b64encode(pdf.encode()).decode()}
+
+            responses = [{"method": "Page.event", "params": {}}, {"id": message["id"], "result": result}]
+            for response in responses:
+                os.write(4, json.dumps(response).encode() + b"\\0")
+    """
+)
+
+
+class TestChromiumPool(BaseTestCaseWithTempDir):
+    def setUp(self):
+        super().setUp()
+        self.chrome_bin_path = str(self.tempdir / "fake_chromium")
+        with open(self.chrome_bin_path, "w") as f:
+            f.write(f"#!{sys.executable}\n{FAKE_CHROMIUM_SCRIPT}")
+        os.chmod(self.chrome_bin_path, stat.S_IRWXU)
+
+    def test_print_to_pdf(self):
+        with chromium_pool.ChromiumPool(self.chrome_bin_path, pool_size=2) as pool:
+            for i in range(3):
+                html = f"<p>Invoice {i}</p>"
+                assert pool.print_to_pdf(html) == f"%PDF {html}".encode()
+
+    def test_print_options(self):
+        with chromium_pool.ChromiumPool(self.chrome_bin_path, pool_size=1) as pool:
+            print_params = json.loads(pool.print_to_pdf("<p>options</p>"))
+
+        assert print_params == {
+            "displayHeaderFooter": False,
+            "printBackground": True,
+            "preferCSSPageSize": True,
+        }
+
+    def test_page_timeout(self):
+        with chromium_pool.ChromiumPool(
+            self.chrome_bin_path, pool_size=1, page_timeout=0.5
+        ) as pool:
+            with pytest.raises(chromium_pool.ChromiumError, match="Timed out"):
+                pool.print_to_pdf("<p>hang</p>")
+
+            # The instance that timed out is replaced
+            assert pool.print_to_pdf("<p>Invoice</p>") == b"%PDF <p>Invoice</p>"
+
+    def test_launch_failure(self):
+        pool = chromium_pool.ChromiumPool(str(self.tempdir / "missing_chromium"))
+        with pytest.raises(chromium_pool.ChromiumError, match="Could not launch"):
+            pool.start()
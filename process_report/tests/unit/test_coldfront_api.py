@@ -0,0 +1,157 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from process_report import coldfront_api
+from process_report.tests.base import BaseTestCaseWithTempDir
+
+
+class _ColdfrontStandIn(ThreadingHTTPServer):
+    """Serves allocations like the Coldfront API, paginated if a page size is
+    requested, and answers conditional requests with 304 Not Modified"""
+
+    def __init__(self, allocations):
+        super().__init__(("127.0.0.1", 0), _ColdfrontRequestHandler)
+        self.allocations = allocations
+        self.version = 1
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/allocations"
+
+
+class _ColdfrontRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        page = params.get("page", [None])[0]
+        etag = f'"{self.server.version}-{page}"'
+        not_modified = self.headers.get("If-None-Match") == etag
+        self.server.requests.append((page, 304 if not_modified else 200))
+        if not_modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        allocations = self.server.allocations
+        if "page_size" in params:
+            page, page_size = int(page), int(params["page_size"][0])
+            body = {
+                "count": len(allocations),
+                "results": allocations[(page - 1) * page_size : page * page_size],
+            }
+        else:
+            body = allocations
+
+        content = json.dumps(body, indent=2).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class TestColdfrontClient(BaseTestCaseWithTempDir):
+    def setUp(self):
+        super().setUp()
+        self.allocations = [
+            {
+                "id": i,
+                "project": {"pi": f"pi{i}@bu.edu"},
+                "resource": {"name": "stack"},
+                "attributes": {"Allocated Project ID": f"P{i}", "Note": "café"},
+            }
+            for i in range(5)
+        ]
+        self.server = _ColdfrontStandIn(self.allocations)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.cache = coldfront_api.ColdfrontCache(str(self.tempdir), "2025-06")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def _get_client(self, **kwargs):
+        return coldfront_api.ColdfrontClient(
+            self.server.url, coldfront_api.get_session(), **kwargs
+        )
+
+    def test_paginated(self):
+        client = self._get_client(page_size=2)
+        assert client.get_allocations() == self.allocations
+        assert sorted(self.server.requests) == [
+            ("1", 200),
+            ("2", 200),
+            ("3", 200),
+        ]
+
+    def test_streamed(self):
+        # A small chunk size splits the response mid-value, and mid-character
+        client = self._get_client(chunk_size=7)
+        assert client.get_allocations() == self.allocations
+        assert self.server.requests == [(None, 200)]
+
+    def test_conditional_requests(self):
+        client = self._get_client(page_size=2, cache=self.cache)
+        assert client.get_allocations() == self.allocations
+
+        # Unchanged pages are read from the cache
+        self.server.requests.clear()
+        assert client.get_allocations() == self.allocations
+        assert sorted(self.server.requests) == [
+            ("1", 304),
+            ("2", 304),
+            ("3", 304),
+        ]
+
+        # Changed pages are fetched again
+        self.server.requests.clear()
+        self.server.version = 2
+        self.allocations[4]["project"]["pi"] = "new_pi@bu.edu"
+        allocations = client.get_allocations()
+        assert allocations[4]["project"]["pi"] == "new_pi@bu.edu"
+        assert sorted(self.server.requests) == [
+            ("1", 200),
+            ("2", 200),
+            ("3", 200),
+        ]
+
+    def test_cache_max_age(self):
+        self._get_client(cache=self.cache).get_allocations()
+        self.server.requests.clear()
+
+        client = self._get_client(cache=self.cache, cache_max_age=3600)
+        assert client.get_allocations() == self.allocations
+        assert self.server.requests == []
+
+
+def test_iter_json_array():
+    document = json.dumps([{"a": [1, 2]}, 12345, "x", None, []]).encode()
+    for chunk_size in [1, 2, 3, len(document)]:
+        chunks = [
+            document[i : i + chunk_size] for i in range(0, len(document), chunk_size)
+        ]
+        assert list(coldfront_api.iter_json_array(chunks)) == [
+            {"a": [1, 2]},
+            12345,
+            "x",
+            None,
+            [],
+        ]
+
+    assert list(coldfront_api.iter_json_array([b" [ ", b"] "])) == []
+
+    with pytest.raises(ValueError):
+        list(coldfront_api.iter_json_array([b'{"a": 1}']))
+    with pytest.raises(ValueError):
+        list(coldfront_api.iter_json_array([b"[1, 2"]))
+    with pytest.raises(ValueError):
+        list(coldfront_api.iter_json_array([b"[1, }]"]))
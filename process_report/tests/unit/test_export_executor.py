@@ -0,0 +1,67 @@
+from unittest import TestCase, mock
+
+import pytest
+
+from process_report import export_executor
+
+
+class TestExportInvoices(TestCase):
+    def _get_mock_invoice(self, export_side_effect=None):
+        inv_instance = mock.MagicMock()
+        inv_instance.export.side_effect = export_side_effect
+        return inv_instance
+
+    def test_export_invoices(self):
+        invoices = [self._get_mock_invoice() for _ in range(3)]
+        s3_bucket = mock.MagicMock()
+
+        timings = export_executor.export_invoices(invoices, s3_bucket, max_workers=2)
+
+        # Invoices of the same class each have their own timings
+        assert len(timings) == len(invoices)
+        for inv_instance in invoices:
+            inv_instance.process.assert_called_once()
+            inv_instance.export.assert_called_once()
+            inv_instance.export_s3.assert_called_once_with(s3_bucket)
+
+    def test_export_invoices_no_upload(self):
+        inv_instance = self._get_mock_invoice()
+
+        timings = export_executor.export_invoices([inv_instance])
+
+        inv_instance.export_s3.assert_not_called()
+        [(invoice_name, invoice_timings)] = timings
+        assert invoice_name == "MagicMock"
+        assert list(invoice_timings) == ["process", "export"]
+
+    def test_export_failures_aggregated(self):
+        class FailingInvoice(mock.MagicMock):
+            pass
+
+        failing_invoice = FailingInvoice()
+        failing_invoice.export.side_effect = ValueError("Bad export")
+        working_invoice = self._get_mock_invoice()
+
+        with pytest.raises(export_executor.InvoiceExportError) as e:
+            export_executor.export_invoices([failing_invoice, working_invoice])
+
+        # The other invoices are still exported
+        working_invoice.export.assert_called_once()
+        assert [name for name, _ in e.value.failures] == ["FailingInvoice"]
+        assert "FailingInvoice: ValueError: Bad export" in str(e.value)
+
+    def test_export_failures_same_class(self):
+        """Are failures of invoices of the same class all reported?"""
+        invoices = [
+            self._get_mock_invoice(ValueError("First bad export")),
+            self._get_mock_invoice(ValueError("Second bad export")),
+        ]
+
+        with pytest.raises(export_executor.InvoiceExportError) as e:
+            export_executor.export_invoices(invoices)
+
+        assert [str(error) for _, error in e.value.failures] == [
+            "First bad export",
+            "Second bad export",
+        ]
+        assert "2 invoice(s) failed to export" in str(e.value)
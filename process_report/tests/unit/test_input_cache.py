@@ -0,0 +1,85 @@
+from unittest import mock
+import os
+
+import pyarrow
+
+from process_report import input_cache, process_report
+from process_report.loader import Loader
+from process_report.settings import invoice_settings
+from process_report.tests.base import BaseTestCaseWithTempDir
+
+
+class TestInputCache(BaseTestCaseWithTempDir):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = str(self.tempdir / "cache")
+        self.table = pyarrow.table({"Cost": [1, 2], "Manager (PI)": ["PI1", None]})
+
+    def test_save_load(self):
+        cache = input_cache.InputCache(self.cache_dir, "2025-01")
+        cache_key = cache.get_cache_key({"invoice.csv": "etag"}, [("Cost", "int")])
+
+        assert cache.load(cache_key) is None
+        cache.save(cache_key, self.table)
+        assert cache.load(cache_key).equals(self.table)
+
+        # Only one entry is kept per month
+        new_cache_key = cache.get_cache_key({"invoice.csv": "etag2"}, [("Cost", "int")])
+        cache.save(new_cache_key, self.table)
+        assert os.listdir(cache.month_dir) == [f"{new_cache_key}.parquet"]
+        assert cache.load(cache_key) is None
+
+    def test_cache_key(self):
+        fingerprints = {"a.csv": "1", "b.csv": "2"}
+        schema = [("Cost", "decimal")]
+        cache_key = input_cache.InputCache.get_cache_key(fingerprints, schema)
+
+        assert cache_key == input_cache.InputCache.get_cache_key(
+            {"b.csv": "2", "a.csv": "1"}, schema
+        )
+        assert cache_key != input_cache.InputCache.get_cache_key(
+            {"a.csv": "1", "b.csv": "3"}, schema
+        )
+        assert cache_key != input_cache.InputCache.get_cache_key(
+            fingerprints, [("Cost", "int")]
+        )
+
+    def test_evict(self):
+        for month in ["2024-09", "2024-10", "2025-01"]:
+            input_cache.InputCache(self.cache_dir, month).save("key", self.table)
+
+        input_cache.InputCache(self.cache_dir, "2025-01").evict(retention_months=3)
+
+        assert sorted(os.listdir(self.cache_dir)) == ["2024-10", "2025-01"]
+
+    def test_load_merged_input_cached(self):
+        invoice_dir = self.tempdir / "invoices"
+        invoice_dir.mkdir()
+        invoice_path = invoice_dir / "invoice.csv"
+        invoice_path.write_text("Manager (PI),Cost\nPI1,10.5\n")
+
+        with (
+            mock.patch.multiple(
+                invoice_settings,
+                fetch_from_s3=False,
+                invoice_path_template=str(invoice_dir),
+                input_cache_enabled=True,
+                input_cache_dir=self.cache_dir,
+            ),
+            mock.patch("process_report.process_report.loader", Loader()),
+            mock.patch(
+                "process_report.process_report._merge_csv_tables",
+                wraps=process_report._merge_csv_tables,
+            ) as mock_merge,
+        ):
+            merged_dataframe = process_report.load_merged_input("2025-01")
+            cached_dataframe = process_report.load_merged_input("2025-01")
+            assert mock_merge.call_count == 1
+            assert cached_dataframe.equals(merged_dataframe)
+
+            # Changing an input invoice invalidates the cache
+            invoice_path.write_text("Manager (PI),Cost\nPI1,11.5\n")
+            with mock.patch("process_report.process_report.loader", Loader()):
+                updated_dataframe = process_report.load_merged_input("2025-01")
+            assert mock_merge.call_count == 2
+            assert str(self.to_decimal(updated_dataframe)["Cost"].iloc[0]) == "11.50"
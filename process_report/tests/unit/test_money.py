@@ -0,0 +1,74 @@
+from decimal import Decimal
+from unittest import TestCase, mock
+
+import pandas
+import pyarrow
+
+from process_report import money
+
+
+class TestMoney(TestCase):
+    def setUp(self):
+        self.table = pyarrow.table(
+            {
+                "Cost": pyarrow.array(
+                    [Decimal("10.50"), None, Decimal("-0.01")],
+                    pyarrow.decimal128(21, 2),
+                ),
+                "Rate": pyarrow.array(
+                    [Decimal("0.0000000000001"), Decimal("12.5"), None],
+                    pyarrow.decimal128(21, 13),
+                ),
+                "SU Hours": [1, 2, 3],
+            }
+        )
+        self.scales = {"Cost": money.BALANCE_SCALE, "Rate": money.RATE_SCALE}
+
+    @mock.patch("process_report.money.USE_MINOR_UNITS", True)
+    def test_minor_units_round_trip(self):
+        internal_table = money.table_to_internal(self.table, self.scales)
+
+        assert internal_table.column("Cost").to_pylist() == [1050, None, -1]
+        assert internal_table.column("Rate").to_pylist() == [1, 125 * 10**12, None]
+        assert internal_table.column("SU Hours").equals(self.table.column("SU Hours"))
+
+        dataframe = internal_table.to_pandas(types_mapper=pandas.ArrowDtype)
+        decimal_dataframe = money.dataframe_to_decimal(dataframe, self.scales)
+        assert pyarrow.Table.from_pandas(decimal_dataframe).equals(self.table)
+
+    @mock.patch("process_report.money.USE_MINOR_UNITS", False)
+    def test_decimal_representation_unchanged(self):
+        assert money.table_to_internal(self.table, self.scales) is self.table
+
+        dataframe = self.table.to_pandas(types_mapper=pandas.ArrowDtype)
+        assert money.dataframe_to_decimal(dataframe, self.scales) is dataframe
+
+    @mock.patch("process_report.money.USE_MINOR_UNITS", False)
+    def test_to_minor_units(self):
+        values = pandas.Series(
+            [Decimal("1.25"), Decimal("-3")], dtype=money.DECIMAL_BALANCE_FIELD_TYPE
+        )
+        minor_units = money.to_minor_units(values)
+        assert list(minor_units) == [125, -300]
+        assert money.from_minor_units(minor_units, values.index).equals(values)
+        assert money.to_internal(Decimal("1.25")) == Decimal("1.25")
+
+        with mock.patch("process_report.money.USE_MINOR_UNITS", True):
+            internal_values = money.from_minor_units(minor_units, values.index)
+            assert internal_values.dtype == money.MINOR_UNITS_FIELD_TYPE
+            assert list(money.to_minor_units(internal_values)) == [125, -300]
+            assert money.to_internal(Decimal("1.25")) == 125
+            assert money.minor_units_to_decimal(minor_units, values.index).equals(
+                values
+            )
+
+    def test_amount_to_minor_units(self):
+        assert money.amount_to_minor_units(Decimal("12.34")) == 1234
+        assert money.amount_to_minor_units(2.5) == 250
+        # Precision finer than the scale is rounded, not truncated
+        assert money.amount_to_minor_units(Decimal("12.345")) == 1235
+        assert money.amount_to_minor_units(Decimal("12.344")) == 1234
+        assert money.amount_to_minor_units(Decimal("-1.005")) == -101
+        assert money.amount_to_minor_units("1.803", money.RATE_SCALE) == (
+            18030000000000
+        )
@@ -0,0 +1,36 @@
+import pandas
+
+from process_report.nonbillable_matcher import NonbillableProjectMatcher
+
+
+def test_match():
+    matcher = NonbillableProjectMatcher(
+        pandas.DataFrame(
+            {
+                "Project Name": ["P1", "p2", "P3", "P3"],
+                "Cluster": [None, "stack", "bm", "bm"],
+                "Is Timed": [False, False, False, False],
+                "Is Billable Override": [False, False, True, False],
+            }
+        )
+    )
+
+    is_nonbillable, is_billable_override = matcher.match(
+        pandas.Series(["p1", "P1", "P2", "P2", "p3", None, "P4"], dtype="string"),
+        pandas.Series(
+            pandas.Categorical(
+                ["stack", None, "stack", "bm", "bm", "stack", "stack"],
+                categories=["stack", "bm"],
+            )
+        ),
+    )
+    assert is_nonbillable.tolist() == [True, True, True, False, True, False, False]
+    assert is_billable_override.tolist() == [
+        False,
+        False,
+        False,
+        False,
+        True,
+        False,
+        False,
+    ]
@@ -0,0 +1,109 @@
+import sqlite3
+from decimal import Decimal
+
+import pytest
+
+from process_report.prepay_debit_ledger import PrepayDebitLedger
+from process_report.tests.base import BaseTestCaseWithTempDir
+
+
+class TestPrepayDebitLedger(BaseTestCaseWithTempDir):
+    def setUp(self):
+        super().setUp()
+        self.csv_filepath = self.tempdir / "prepay_debits.csv"
+        self.csv_filepath.write_text(
+            "Month,Group Name,Debit\n"
+            "2024-01,G1,1000.00\n"
+            "2024-02,G2,20.50\n"
+            "2024-02,G1,300.00\n"
+        )
+
+    def test_upsert_and_export(self):
+        ledger = PrepayDebitLedger.from_csv(self.csv_filepath)
+        assert ledger.get_group_debits_before("2024-02").to_dict() == {"G1": 100000}
+        assert ledger.get_group_debits_before("2024-03").to_dict() == {
+            "G1": 130000,
+            "G2": 2050,
+        }
+
+        # Existing debits are overwritten in place, new ones are appended
+        ledger.upsert_debits("2024-02", {"G1": Decimal("250.25")})
+        ledger.upsert_debits("2024-03", {"G2": Decimal("5.00"), "G3": Decimal(7)})
+        ledger.export_csv(self.csv_filepath)
+        assert self.csv_filepath.read_text() == (
+            "Month,Group Name,Debit\n"
+            "2024-01,G1,1000.00\n"
+            "2024-02,G2,20.50\n"
+            "2024-02,G1,250.25\n"
+            "2024-03,G2,5.00\n"
+            "2024-03,G3,7.00\n"
+        )
+
+        # Upserting the same debits again changes nothing
+        ledger.upsert_debits("2024-03", {"G2": Decimal("5.00"), "G3": Decimal(7)})
+        assert len(ledger.to_dataframe()) == 5
+
+    def test_ledger_on_disk(self):
+        db_filepath = self.tempdir / "ledger.sqlite"
+        ledger = PrepayDebitLedger.from_csv(self.csv_filepath, db_filepath)
+        ledger.upsert_debits("2024-03", {"G1": Decimal(1)})
+        ledger.export_csv(self.csv_filepath)
+
+        # The ledger is not reloaded while the CSV is unchanged
+        with self.assertLogs("process_report.prepay_debit_ledger") as logs:
+            ledger = PrepayDebitLedger.from_csv(self.csv_filepath, db_filepath)
+        assert "is up to date" in logs.output[0]
+        assert len(ledger.to_dataframe()) == 4
+
+        self.csv_filepath.write_text("Month,Group Name,Debit\n2024-01,G1,1.00\n")
+        ledger = PrepayDebitLedger.from_csv(self.csv_filepath, db_filepath)
+        assert ledger.to_dataframe().values.tolist() == [
+            ["2024-01", "G1", Decimal("1.00")]
+        ]
+
+    def test_duplicate_debits(self):
+        """Is the last of several debits for a month and group kept?"""
+        with open(self.csv_filepath, "a") as f:
+            f.write("2024-01,G1,1.00\n")
+        with self.assertLogs("process_report.prepay_debit_ledger", "WARNING") as logs:
+            ledger = PrepayDebitLedger.from_csv(self.csv_filepath)
+        assert "more than one debit" in logs.output[0]
+        assert "['2024-01', 'G1']" in logs.output[0]
+        assert ledger.to_dataframe().values.tolist() == [
+            ["2024-01", "G1", Decimal("1.00")],
+            ["2024-02", "G2", Decimal("20.50")],
+            ["2024-02", "G1", Decimal("300.00")],
+        ]
+
+    def test_extra_columns(self):
+        """Are other columns of the debits CSV kept?"""
+        self.csv_filepath.write_text(
+            "Note,Month,Group Name,Debit\nfirst,2024-01,G1,1000.00\n,2024-02,G2,20.50\n"
+        )
+        ledger = PrepayDebitLedger.from_csv(self.csv_filepath)
+        ledger.upsert_debits("2024-01", {"G1": Decimal(900)})
+        ledger.upsert_debits("2024-03", {"G1": Decimal(1)})
+        ledger.export_csv(self.csv_filepath)
+        assert self.csv_filepath.read_text() == (
+            "Note,Month,Group Name,Debit\n"
+            "first,2024-01,G1,900.00\n"
+            ",2024-02,G2,20.50\n"
+            ",2024-03,G1,1.00\n"
+        )
+
+    def test_sub_cent_debits(self):
+        """Are debits finer than a cent rejected rather than rounded?"""
+        ledger = PrepayDebitLedger.from_csv(self.csv_filepath)
+        with pytest.raises(ValueError, match="12.345"):
+            ledger.upsert_debits("2024-03", {"G1": Decimal("12.345")})
+
+        with open(self.csv_filepath, "a") as f:
+            f.write("2024-03,G1,12.345\n")
+        with pytest.raises(ValueError, match="12.345"):
+            PrepayDebitLedger.from_csv(self.csv_filepath)
+
+    def test_close(self):
+        with PrepayDebitLedger.from_csv(self.csv_filepath) as ledger:
+            assert len(ledger.to_dataframe()) == 3
+        with pytest.raises(sqlite3.ProgrammingError):
+            ledger.to_dataframe()
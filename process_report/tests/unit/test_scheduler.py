@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+
+import pytest
+
+from process_report import scheduler
+from process_report.invoices import invoice
+from process_report.process_report import PROCESSING_ORDER
+from process_report.processors import processor, lenovo_processor
+from process_report.tests.base import BaseTestCase
+
+
+@dataclass
+class _InputProcessor(processor.Processor):
+    initializes_columns = (invoice.COST_COLUMN, invoice.SU_TYPE_COLUMN)
+
+
+@dataclass
+class _AddCostProcessor(processor.Processor):
+    initializes_columns = (invoice.BALANCE_COLUMN,)
+    operates_on_columns = (invoice.COST_COLUMN,)
+
+    def _process(self):
+        self.data[invoice.BALANCE_FIELD] = self.data[invoice.COST_FIELD] + 1
+
+
+@dataclass
+class _SUTypeProcessor(processor.Processor):
+    initializes_columns = (invoice.SU_CHARGE_COLUMN,)
+    operates_on_columns = (invoice.SU_TYPE_COLUMN,)
+
+    def _process(self):
+        self.data[invoice.SU_CHARGE_FIELD] = 1
+
+
+@dataclass
+class _CreditProcessor(processor.Processor):
+    initializes_columns = (invoice.CREDIT_COLUMN,)
+    operates_on_columns = (invoice.BALANCE_COLUMN,)
+
+    def _process(self):
+        self.data[invoice.CREDIT_FIELD] = self.data[invoice.BALANCE_FIELD]
+
+
+@dataclass
+class _UndeclaredReadProcessor(processor.Processor):
+    initializes_columns = (invoice.COST_COLUMN,)
+
+    def _process(self):
+        self.data[invoice.SU_TYPE_FIELD]
+
+
+@dataclass
+class _MissingKeyProcessor(processor.Processor):
+    initializes_columns = (invoice.COST_COLUMN,)
+
+    def _process(self):
+        {}["Missing PI"]
+
+
+class TestProcessorScheduler(BaseTestCase):
+    def setUp(self):
+        self.test_invoice = self.create_test_invoice(
+            {
+                "Cost": [1, 2, 3],
+                "SU Type": ["CPU", "GPU", "CPU"],
+            }
+        )
+
+    def test_processing_order_dependencies(self):
+        dependencies = scheduler.get_processor_dependencies(PROCESSING_ORDER)
+        lenovo_index = PROCESSING_ORDER.index(lenovo_processor.LenovoProcessor)
+
+        # Lenovo charges only depend on the input columns being validated
+        assert dependencies[lenovo_index] == {0}
+        assert all(0 in deps for deps in dependencies[1:])
+
+    def test_validate_processing_order(self):
+        scheduler.validate_processing_order(PROCESSING_ORDER)
+
+        with pytest.raises(ValueError):
+            scheduler.validate_processing_order(
+                [_InputProcessor, _CreditProcessor, _AddCostProcessor]
+            )
+        with pytest.raises(ValueError):
+            scheduler.validate_processing_order([_InputProcessor, _InputProcessor])
+
+    def test_run_matches_sequential(self):
+        processors = [
+            _InputProcessor,
+            _AddCostProcessor,
+            _SUTypeProcessor,
+            _CreditProcessor,
+        ]
+        assert scheduler.get_processor_dependencies(processors) == [
+            set(),
+            {0},
+            {0},
+            {1},
+        ]
+
+        expected_invoice = self.test_invoice.copy()
+        for processor_class in processors:
+            proc = processor_class(invoice_month="2025-01", data=expected_invoice)
+            proc.process()
+            expected_invoice = proc.data
+
+        for debug in (False, True):
+            output_invoice = scheduler.ProcessorScheduler(
+                processors, max_workers=2, debug=debug
+            ).run("2025-01", self.test_invoice)
+            assert output_invoice.equals(expected_invoice)
+
+    def test_undeclared_column(self):
+        with pytest.raises(KeyError, match="does not declare"):
+            scheduler.ProcessorScheduler([_UndeclaredReadProcessor]).run(
+                "2025-01", self.test_invoice
+            )
+
+    def test_other_key_error(self):
+        """Are KeyErrors for keys other than projected out columns raised unchanged?"""
+        with pytest.raises(KeyError) as e:
+            scheduler.ProcessorScheduler([_MissingKeyProcessor]).run(
+                "2025-01", self.test_invoice
+            )
+        assert e.value.args == ("Missing PI",)
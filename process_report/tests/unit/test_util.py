@@ -1,13 +1,20 @@
 from unittest import TestCase, mock
+from decimal import Decimal
 import tempfile
 import pandas
 import os
 import pytest
 import yaml
 
+import boto3
+import botocore.exceptions
+import moto
+
 from process_report.settings import invoice_settings
-from process_report.loader import loader
-from process_report import process_report, util
+from process_report.loader import loader, Loader
+from process_report import money, process_report, util
+from process_report.invoices import invoice
+from process_report.tests.base import BaseTestCaseWithTempDir
 
 
 class TestMonthUtils(TestCase):
@@ -23,6 +30,27 @@ class TestMonthUtils(TestCase):
         with pytest.raises(ValueError):
             util.get_month_diff("2024-16", "2025-03")
 
+    def test_get_month_ordinals(self):
+        months = pandas.Series(["2024-12", "2023-03", None])
+        ordinals = util.get_month_ordinals(months)
+        assert ordinals.tolist() == [
+            util.get_month_ordinal("2024-12"),
+            util.get_month_ordinal("2023-03"),
+            pandas.NA,
+        ]
+        assert (
+            util.get_month_ordinal("2024-12") - util.get_month_ordinal("2023-03")
+        ) == util.get_month_diff("2024-12", "2023-03")
+
+
+def test_get_project_names():
+    project_allocations = pandas.Series(
+        ["P1-a1", "P-2-a2", "P3", "-a4", "P5-", None], index=[5, 4, 3, 2, 1, 0]
+    )
+    project_names = util.get_project_names(project_allocations)
+    assert project_names.index.equals(project_allocations.index)
+    assert project_names.tolist() == ["P1", "P-2", "P3", "", "P5", pandas.NA]
+
 
 class TestMergeCSV(TestCase):
     def setUp(self):
@@ -63,6 +91,31 @@ class TestMergeCSV(TestCase):
 
         assert merged_dataframe["Name"].iloc[0] == "Alice, Allison"
 
+    def test_merge_csv_invoice_column_types(self):
+        """Are invoice columns cast to their types, with string columns read verbatim?"""
+        csv_file = tempfile.NamedTemporaryFile(delete=False, mode="w", suffix=".csv")
+        self.csv_files.append(csv_file)
+        csv_file.write(
+            "Project - Allocation ID,SU Hours (GBhr or SUhr),Cost,Manager (PI)\n"
+            "007,2.0,10.5,\n"
+        )
+        csv_file.close()
+
+        merged_dataframe = process_report.merge_csv(
+            [csv_file.name for csv_file in self.csv_files]
+        )
+
+        assert len(merged_dataframe) == len(self.data) * 3 + 1
+        assert merged_dataframe.dtypes["Cost"] == invoice.BALANCE_FIELD_TYPE
+        assert merged_dataframe.dtypes["SU Hours (GBhr or SUhr)"] == (
+            invoice.INTEGER_FIELD_TYPE
+        )
+        assert merged_dataframe.dtypes["Manager (PI)"] == invoice.STRING_FIELD_TYPE
+        assert merged_dataframe["Project - Allocation ID"].iloc[-1] == "007"
+        assert merged_dataframe["SU Hours (GBhr or SUhr)"].iloc[-1] == 2
+        assert merged_dataframe["Cost"].iloc[-1] == money.to_internal(Decimal("10.50"))
+        assert pandas.isna(merged_dataframe["Manager (PI)"].iloc[-1])
+
 
 class TestTimedProjects(TestCase):
     def setUp(self):
@@ -140,6 +193,78 @@ class TestTimedProjects(TestCase):
         assert nonbillable_projects.equals(expected_projects)
 
 
+class TestLoadInstituteList(BaseTestCaseWithTempDir):
+    def setUp(self):
+        super().setUp()
+        self.institute_list_path = str(self.tempdir / "institute_list.yaml")
+        self._write_institute_list("Boston University")
+
+    def _write_institute_list(self, display_name):
+        with open(self.institute_list_path, "w") as f:
+            yaml.dump(
+                [
+                    {
+                        "display_name": display_name,
+                        "domains": ["bu.edu"],
+                        "mghpcc_partnership_start_date": "2013-06",
+                        "include_in_nerc_total_invoice": True,
+                        "courses_nonbillable": True,
+                    }
+                ],
+                f,
+            )
+
+    def test_cached(self):
+        institute_list = util.load_institute_list(self.institute_list_path)
+        assert util.load_institute_list(self.institute_list_path) is institute_list
+        assert institute_list.partnership_start_months == {
+            "Boston University": 2013 * 12 + 5
+        }
+        assert institute_list.get_active_partners("2013-05") == []
+        assert institute_list.get_active_partners("2013-06") == ["Boston University"]
+        assert institute_list.nonbillable_course_set == {"Boston University"}
+        assert institute_list.nerc_total_invoice_institutions == {"Boston University"}
+
+        # A new modification time with the same content keeps the cached list
+        os.utime(self.institute_list_path, ns=(0, 0))
+        assert util.load_institute_list(self.institute_list_path) is institute_list
+
+        # Changed content is reloaded
+        self._write_institute_list("BU")
+        os.utime(self.institute_list_path, ns=(1, 1))
+        reloaded_institute_list = util.load_institute_list(self.institute_list_path)
+        assert reloaded_institute_list.root[0].display_name == "BU"
+
+    def test_snapshot(self):
+        snapshot_path = str(self.tempdir / "institute_list.pickle")
+        with mock.patch.object(
+            invoice_settings, "institute_list_snapshot_path", snapshot_path
+        ):
+            institute_list = util.load_institute_list(self.institute_list_path)
+            assert os.path.exists(snapshot_path)
+
+            # A new process loads the snapshot without validating the file again
+            with (
+                mock.patch.dict(util._institute_list_cache, clear=True),
+                mock.patch.object(
+                    util.InstituteList, "model_validate"
+                ) as mock_validate,
+            ):
+                snapshot_institute_list = util.load_institute_list(
+                    self.institute_list_path
+                )
+                mock_validate.assert_not_called()
+                assert snapshot_institute_list == institute_list
+
+            # The snapshot is not used once the file changes
+            self._write_institute_list("BU")
+            with mock.patch.dict(util._institute_list_cache, clear=True):
+                reloaded_institute_list = util.load_institute_list(
+                    self.institute_list_path
+                )
+            assert reloaded_institute_list.root[0].display_name == "BU"
+
+
 class TestValidateRequiredEnvVars(TestCase):
     @mock.patch.dict(
         "os.environ", {"KEYCLOAK_CLIENT_ID": "test", "KEYCLOAK_CLIENT_SECRET": "test"}
@@ -155,3 +280,110 @@ class TestValidateRequiredEnvVars(TestCase):
             process_report.validate_required_env_vars(
                 ["KEYCLOAK_CLIENT_ID", "KEYCLOAK_CLIENT_SECRET"]
             )
+
+
+@moto.mock_aws
+class TestDownloadS3Files(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.bucket = boto3.resource("s3", region_name="us-east-1").create_bucket(
+            Bucket="test-bucket"
+        )
+        self.s3_files = {f"Invoices/file{i}.csv": f"data {i}" for i in range(5)}
+        for s3_filepath, content in self.s3_files.items():
+            self.bucket.put_object(Key=s3_filepath, Body=content)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _local_path(self, s3_filepath):
+        return os.path.join(self.tempdir.name, os.path.basename(s3_filepath))
+
+    def test_download_s3_files(self):
+        s3_local_filepaths = {
+            s3_filepath: self._local_path(s3_filepath) for s3_filepath in self.s3_files
+        }
+        output = util.download_s3_files(self.bucket, s3_local_filepaths, max_workers=3)
+
+        assert output == s3_local_filepaths
+        for s3_filepath, content in self.s3_files.items():
+            with open(self._local_path(s3_filepath)) as f:
+                assert f.read() == content
+
+    def test_download_retry(self):
+        s3_client = self.bucket.meta.client
+        download_file = s3_client.download_file
+        local_path = self._local_path("Invoices/file0.csv")
+
+        def _fail_once(*args):
+            mock_download.side_effect = download_file
+            raise botocore.exceptions.EndpointConnectionError(endpoint_url="test")
+
+        with mock.patch.object(
+            s3_client, "download_file", side_effect=_fail_once
+        ) as mock_download:
+            util.download_s3_file(
+                s3_client,
+                "test-bucket",
+                "Invoices/file0.csv",
+                local_path,
+                retry_delay=0,
+            )
+            assert mock_download.call_count == 2
+
+        with open(local_path) as f:
+            assert f.read() == "data 0"
+
+    def test_missing_file_not_retried(self):
+        s3_client = self.bucket.meta.client
+        with mock.patch.object(
+            s3_client, "download_file", wraps=s3_client.download_file
+        ) as mock_download:
+            with pytest.raises(botocore.exceptions.ClientError):
+                util.download_s3_files(
+                    self.bucket, {"missing.csv": self._local_path("missing.csv")}
+                )
+            assert mock_download.call_count == 1
+
+    @mock.patch("process_report.util.get_invoice_bucket")
+    def test_loader_prefetch(self, mock_get_bucket):
+        mock_get_bucket.return_value = self.bucket
+        invoice_month = "2025-01"
+        s3_filepaths = [
+            f"Invoices/{invoice_month}/Service Invoices/{name.format(invoice_month=invoice_month)}"
+            for name in ["ocp-test {invoice_month}.csv", "ocp-prod {invoice_month}.csv"]
+        ] + ["PIs/PI.csv", "PIs/alias.csv", "Prepay/prepay_debits.csv"]
+        for s3_filepath in s3_filepaths:
+            self.bucket.put_object(Key=s3_filepath, Body=s3_filepath)
+
+        cwd = os.getcwd()
+        os.chdir(self.tempdir.name)
+        try:
+            with (
+                mock.patch.object(invoice_settings, "fetch_from_s3", True),
+                mock.patch.object(invoice_settings, "invoice_month", invoice_month),
+                mock.patch(
+                    "process_report.loader.S3_SERVICE_INVOICE_LIST",
+                    ["ocp-test {invoice_month}.csv", "ocp-prod {invoice_month}.csv"],
+                ),
+                mock.patch(
+                    "process_report.util.download_s3_files",
+                    wraps=util.download_s3_files,
+                ) as mock_download,
+            ):
+                test_loader = Loader()
+                test_loader.prefetch_s3_files()
+                invoice_filepaths = test_loader.get_csv_invoice_filepath_list()
+                pi_filepath = test_loader.get_remote_filepath("PIs/PI.csv")
+
+                assert mock_download.call_count == 1
+        finally:
+            os.chdir(cwd)
+
+        assert invoice_filepaths == [
+            f"ocp-test {invoice_month}.csv",
+            f"ocp-prod {invoice_month}.csv",
+        ]
+        assert pi_filepath == "PI.csv"
+        with open(os.path.join(self.tempdir.name, "PI.csv")) as f:
+            assert f.read() == "PIs/PI.csv"
@@ -5,9 +5,11 @@ from process_report.invoices import (
     pi_specific_invoice,
     prepay_credits_snapshot,
     NERC_total_invoice,
+    bu_internal_invoice,
 )
 
 from process_report.processors import (
+    add_institution_processor,
     coldfront_fetch_processor,
     validate_pi_alias_processor,
     lenovo_processor,
@@ -17,6 +19,7 @@ from process_report.processors import (
     prepayment_processor,
     validate_cluster_name_processor,
 )
+from process_report.nonbillable_matcher import NonbillableProjectMatcher
 
 
 def new_base_invoice(
@@ -40,6 +43,7 @@ def new_pi_specific_invoice(
         invoice_month,
         data,
         name,
+        pdf_renderer="subprocess",
     )
 
 
@@ -57,6 +61,20 @@ def new_nerc_total_invoice(
     )
 
 
+def new_bu_internal_invoice(
+    name="",
+    invoice_month="0000-00",
+    data=None,
+):
+    if data is None:
+        data = pandas.DataFrame()
+    return bu_internal_invoice.BUInternalInvoice(
+        invoice_month,
+        data,
+        name,
+    )
+
+
 def new_coldfront_fetch_processor(
     name="",
     invoice_month="0000-00",
@@ -71,7 +89,11 @@ def new_coldfront_fetch_processor(
             columns=["Project Name", "Cluster", "Is Timed", "Is Billable Override"]
         )
     return coldfront_fetch_processor.ColdfrontFetchProcessor(
-        invoice_month, data, name, nonbillable_projects, coldfront_data_filepath
+        invoice_month,
+        data,
+        name,
+        NonbillableProjectMatcher(nonbillable_projects),
+        coldfront_data_filepath,
     )
 
 
@@ -118,7 +140,7 @@ def new_validate_billable_pi_processor(
         data,
         name,
         nonbillable_pis,
-        nonbillable_projects,
+        NonbillableProjectMatcher(nonbillable_projects),
     )
 
 
@@ -205,3 +227,11 @@ def new_validate_cluster_name_processor(
     return validate_cluster_name_processor.ValidateClusterNameProcessor(
         invoice_month, data, name
     )
+
+
+def new_add_institution_processor(
+    name="",
+    invoice_month="0000-00",
+    data=None,
+):
+    return add_institution_processor.AddInstitutionProcessor(invoice_month, data, name)
@@ -1,14 +1,34 @@
 import os
 import datetime
+import logging
+import time
 import yaml
+import pickle
+import hashlib
 import functools
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
+import botocore.exceptions
+import pandas
+import pyarrow
+import pyarrow.compute
 
 from process_report.institute_list_models import InstituteList
+from process_report.settings import invoice_settings
 
 
 DEFAULT_INSTITUTE_LIST = "process_report/institute_list.yaml"
+# Bump to invalidate existing snapshots if the InstituteList model changes
+INSTITUTE_LIST_SNAPSHOT_VERSION = 1
+
+S3_NOT_FOUND_ERROR_CODES = ("404", "NoSuchKey")
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
 
 
 @functools.lru_cache
@@ -29,10 +49,82 @@ def get_invoice_bucket():
     return s3_resource.Bucket(os.environ.get("S3_BUCKET_NAME", "nerc-invoicing"))
 
 
-def load_institute_list() -> InstituteList:
-    with open(DEFAULT_INSTITUTE_LIST, "r") as f:
-        institute_list = yaml.safe_load(f)
-        return InstituteList.model_validate(institute_list)
+@dataclass
+class _CachedInstituteList:
+    mtime_ns: int
+    file_hash: str
+    institute_list: InstituteList
+
+
+_institute_list_cache: dict[str, _CachedInstituteList] = dict()
+_institute_list_lock = threading.Lock()
+
+
+def _load_institute_list_snapshot(snapshot_path, file_hash) -> InstituteList | None:
+    try:
+        with open(snapshot_path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+    if snapshot.get("version") != INSTITUTE_LIST_SNAPSHOT_VERSION:
+        return None
+    if snapshot.get("file_hash") != file_hash:
+        return None
+    return snapshot["institute_list"]
+
+
+def _save_institute_list_snapshot(snapshot_path, file_hash, institute_list):
+    snapshot = {
+        "version": INSTITUTE_LIST_SNAPSHOT_VERSION,
+        "file_hash": file_hash,
+        "institute_list": institute_list,
+    }
+    # Written under a temporary name so an interrupted write is never read back
+    with open(f"{snapshot_path}.tmp", "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{snapshot_path}.tmp", snapshot_path)
+
+
+def _parse_institute_list(file_content: bytes, file_hash) -> InstituteList:
+    snapshot_path = invoice_settings.institute_list_snapshot_path
+    if snapshot_path:
+        institute_list = _load_institute_list_snapshot(snapshot_path, file_hash)
+        if institute_list is not None:
+            logger.info(f"Loaded institute list snapshot {snapshot_path}")
+            return institute_list
+
+    institute_list = InstituteList.model_validate(yaml.safe_load(file_content))
+    if snapshot_path:
+        _save_institute_list_snapshot(snapshot_path, file_hash, institute_list)
+    return institute_list
+
+
+def load_institute_list(filepath=DEFAULT_INSTITUTE_LIST) -> InstituteList:
+    """Returns the institute list, parsed and validated once per process.
+
+    The cached list is reused until the file's modification time changes and
+    its content hash differs. If the `institute_list_snapshot_path` setting is
+    set, validated lists are also pickled there, so a new process whose file
+    has the same hash skips parsing and validation"""
+    with _institute_list_lock:
+        cached = _institute_list_cache.get(filepath)
+        mtime_ns = os.stat(filepath).st_mtime_ns
+        if cached and cached.mtime_ns == mtime_ns:
+            return cached.institute_list
+
+        with open(filepath, "rb") as f:
+            file_content = f.read()
+        file_hash = hashlib.sha256(file_content).hexdigest()
+        if cached and cached.file_hash == file_hash:
+            cached.mtime_ns = mtime_ns
+            return cached.institute_list
+
+        institute_list = _parse_institute_list(file_content, file_hash)
+        _institute_list_cache[filepath] = _CachedInstituteList(
+            mtime_ns, file_hash, institute_list
+        )
+        return institute_list
 
 
 def get_iso8601_time():
@@ -46,8 +138,122 @@ def get_month_diff(month_1, month_2):
     return (dt1.year - dt2.year) * 12 + (dt1.month - dt2.month)
 
 
+def get_month_ordinal(month: str) -> int:
+    """Number of months since year 0 of a YYYY-MM string"""
+    dt = datetime.datetime.strptime(month, "%Y-%m")
+    return dt.year * 12 + dt.month - 1
+
+
+def get_month_ordinals(months: pandas.Series) -> pandas.Series:
+    """Returns the number of months since year 0 of each YYYY-MM string, so
+    that month differences can be computed for a whole column at once.
+    Missing months stay missing"""
+    dates = pandas.to_datetime(months, format="%Y-%m")
+    return (dates.dt.year * 12 + dates.dt.month - 1).astype("Int64")
+
+
+def get_project_names(project_allocations: pandas.Series) -> pandas.Series:
+    """Returns the project name of each "Project - Allocation", which is the
+    part before its last "-", or the whole name if it has no "-". This runs
+    as one Arrow string kernel rather than a Python call per row"""
+    splits = pyarrow.compute.split_pattern(
+        pyarrow.array(project_allocations.array, pyarrow.string()),
+        "-",
+        max_splits=1,
+        reverse=True,
+    )
+    return pandas.Series(
+        pyarrow.compute.list_element(splits, 0),
+        index=project_allocations.index,
+        dtype=pandas.StringDtype(),
+    )
+
+
 def fetch_s3(s3_filepath):
     local_name = os.path.basename(s3_filepath)
     invoice_bucket = get_invoice_bucket()
     invoice_bucket.download_file(s3_filepath, local_name)
     return local_name
+
+
+def download_s3_file(
+    s3_client, bucket_name, s3_filepath, local_path, max_attempts=3, retry_delay=1
+):
+    """Downloads a single S3 object, retrying transient failures.
+    Returns the local path of the file"""
+    start_time = time.perf_counter()
+    for attempt in range(1, max_attempts + 1):
+        try:
+            s3_client.download_file(bucket_name, s3_filepath, local_path)
+            break
+        except (
+            botocore.exceptions.BotoCoreError,
+            botocore.exceptions.ClientError,
+        ) as e:
+            if (
+                isinstance(e, botocore.exceptions.ClientError)
+                and e.response["Error"]["Code"] in S3_NOT_FOUND_ERROR_CODES
+            ) or attempt == max_attempts:
+                logger.error(f"Failed to download {s3_filepath} from S3: {e}")
+                raise
+            logger.warning(
+                f"Attempt {attempt} to download {s3_filepath} failed, retrying: {e}"
+            )
+            time.sleep(retry_delay * attempt)
+
+    logger.info(
+        f"Downloaded {s3_filepath} ({os.path.getsize(local_path)} bytes) in {time.perf_counter() - start_time:.2f}s"
+    )
+    return local_path
+
+
+def download_s3_files(
+    s3_bucket, s3_local_filepaths: dict[str, str], max_workers=8, max_attempts=3
+) -> dict[str, str]:
+    """Downloads many S3 objects concurrently through one shared S3 client.
+
+    `s3_local_filepaths` maps S3 keys to the local paths they are downloaded to.
+    Returns the same mapping once all downloads have finished. Boto3 clients,
+    unlike resources, are thread-safe, so the bucket's client is shared between
+    workers"""
+    s3_client = s3_bucket.meta.client
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                download_s3_file,
+                s3_client,
+                s3_bucket.name,
+                s3_filepath,
+                local_path,
+                max_attempts,
+            )
+            for s3_filepath, local_path in s3_local_filepaths.items()
+        ]
+        for future in futures:
+            future.result()
+
+    return s3_local_filepaths
+
+
+def get_s3_etags(s3_bucket, s3_filepaths: list[str], max_workers=8) -> dict[str, str]:
+    """Returns the ETags of S3 objects, fetched concurrently without downloading the objects"""
+    s3_client = s3_bucket.meta.client
+
+    def _get_etag(s3_filepath):
+        return s3_client.head_object(Bucket=s3_bucket.name, Key=s3_filepath)["ETag"]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(s3_filepaths, executor.map(_get_etag, s3_filepaths)))
+
+
+def invert_alias_map(alias_map: dict[str, list[str]]) -> dict[str, str]:
+    """Returns the canonical PI of each alias in an alias map, which maps each
+    PI to their aliases. Raises an error if an alias belongs to more than one PI"""
+    pi_by_alias = dict()
+    for pi, pi_aliases in alias_map.items():
+        for alias in pi_aliases:
+            if pi_by_alias.setdefault(alias, pi) != pi:
+                raise ValueError(
+                    f"Alias {alias} belongs to more than one PI: {pi_by_alias[alias]} and {pi}"
+                )
+    return pi_by_alias